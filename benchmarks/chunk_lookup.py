@@ -0,0 +1,38 @@
+"""
+Microbenchmark for terrain_generation.chunk_anchor, the closed form hex to chunk lookup, against the old find_chunk_parent. Its properties are checked in tests/test_chunk_lookup.py.
+Run from the repo root with: python -m benchmarks.chunk_lookup
+"""
+from opensimplex import OpenSimplex
+
+import terrain_generation
+from benchmarks.timing import best_of
+from hex_math import Hexagon
+
+chunk_sizes = (11, 31, 63)
+
+
+def find_chunk_parent(cell, chunk_size, chunk_list, noise):
+    """
+    The old Terrain.find_chunk_parent: generate a chunk around the cell and look for an anchor in it.
+    """
+    q, r, _ = terrain_generation.chunk_terrain(cell, chunk_size, noise)
+    for qq, rr in zip(q.tolist(), r.tolist()):
+        h = Hexagon(qq, rr, -qq - rr)
+        if h in chunk_list:
+            return h
+    return cell
+
+
+def main():
+    noise = OpenSimplex(seed=42)
+    print(f"{'size':>5} {'old lookups/s':>14} {'closed form lookups/s':>22}")
+    for chunk_size in chunk_sizes:
+        chunk_list = {terrain_generation.chunk_anchor(Hexagon(q, -q, 0), chunk_size) for q in range(-200, 200, chunk_size)}
+        cell = Hexagon(7, -3, -4)
+        old = best_of(lambda: find_chunk_parent(cell, chunk_size, chunk_list, noise), repeat=3)
+        new = best_of(lambda: terrain_generation.chunk_anchor(cell, chunk_size), number=10000)
+        print(f"{chunk_size:>5} {1 / old:>14.1f} {1 / new:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
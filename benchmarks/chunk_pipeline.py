@@ -0,0 +1,109 @@
+"""
+Headless scroll test for the background chunk pipeline. Scrolls 1,000 steps and records the worst frame, with chunks generated on the frame (the old way) and by the pipeline.
+That the pipeline makes the same terrain is checked in tests/test_chunk_pipeline.py.
+Run from the repo root with: python -m benchmarks.chunk_pipeline
+"""
+import time
+
+import numpy as np
+from opensimplex import OpenSimplex
+
+import settings
+import terrain_generation
+from hex_math import Hexagon
+
+random_seed = 42
+chunk_size = 11
+steps = 1000
+# Roughly a 1920x1200 window, in hexes, plus a safety margin.
+view_columns = 36
+view_rows = 30
+
+
+def anchor(i, j):
+    """
+    Anchor of the chunk in column i, row j of the chunk tiling that Terrain.chunk_get_next walks.
+    """
+    r = j * (chunk_size + 1)
+    q = i * chunk_size - r // 2
+    return Hexagon(q, r, -q - r)
+
+
+def visible_anchors(column, row):
+    """
+    Anchors of the chunks covering the view, centered on the given offset column and row.
+    """
+    i_min = (column - view_columns // 2 + chunk_size // 2) // chunk_size
+    i_max = (column + view_columns // 2 + chunk_size // 2) // chunk_size
+    j_min = (row - view_rows // 2 + chunk_size // 2 + 1) // (chunk_size + 1)
+    j_max = (row + view_rows // 2 + chunk_size // 2 + 1) // (chunk_size + 1)
+    return sorted(anchor(i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1))
+
+
+def merge(chunks, center, terrain_types):
+    """
+    Stand in for Terrain.add_chunk, building one entry per hex like the map does.
+    """
+    q, r = terrain_generation.chunk_coordinates(center, chunk_size)
+    chunks[center] = {Hexagon(a, b, -a - b): str(t) for a, b, t in zip(q.tolist(), r.tolist(), terrain_types.tolist())}
+
+
+def scroll_path():
+    """
+    Scrolls right two hexes a step and drifts up and down, which is faster than anyone holds an arrow key.
+    """
+    for step in range(steps):
+        yield step * 2, 10 * np.sin(step / 50.0)
+
+
+def run_synchronous():
+    noise = OpenSimplex(seed=random_seed)
+    chunks = {}
+    frames = []
+    for column, row in scroll_path():
+        start = time.perf_counter()
+        for a in visible_anchors(column, int(row)):
+            if a not in chunks:
+                merge(chunks, a, terrain_generation.chunk_terrain(a, chunk_size, noise)[2])
+        frames.append(time.perf_counter() - start)
+    return frames, 0, chunks
+
+
+def run_pipeline():
+    pipeline = terrain_generation.ChunkPipeline(random_seed, chunk_size, settings.chunk_workers)
+    chunks = {}
+    frames = []
+    holes = 0
+    # Fill the first screen before we start, the same as the game does.
+    pipeline.request(visible_anchors(0, 0))
+    for a, terrain_types in pipeline.ready(wait=True):
+        merge(chunks, a, terrain_types)
+    for column, row in scroll_path():
+        start = time.perf_counter()
+        visible = visible_anchors(column, int(row))
+        # Queue what we can see, and the next column of chunks over.
+        ahead = visible_anchors(column + chunk_size, int(row))
+        pipeline.request([a for a in visible + ahead if a not in chunks])
+        for a, terrain_types in pipeline.ready(settings.chunk_merge_budget):
+            if a not in chunks:
+                merge(chunks, a, terrain_types)
+        frames.append(time.perf_counter() - start)
+        holes += any(a not in chunks for a in visible)
+        # Pretend the rest of the frame is spent drawing.
+        time.sleep(1 / 120)
+    for a, terrain_types in pipeline.ready(wait=True):
+        if a not in chunks:
+            merge(chunks, a, terrain_types)
+    pipeline.shutdown()
+    return frames, holes, chunks
+
+
+def main():
+    print(f"{'mode':>12} {'worst frame':>12} {'mean frame':>11} {'frames with holes':>18}")
+    for name, run in (("synchronous", run_synchronous), ("pipeline", run_pipeline)):
+        frames, holes, _ = run()
+        print(f"{name:>12} {max(frames) * 1000:>10.2f}ms {np.mean(frames) * 1000:>9.2f}ms {holes:>18}")
+
+
+if __name__ == "__main__":
+    main()
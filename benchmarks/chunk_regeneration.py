@@ -0,0 +1,116 @@
+"""
+Throwing chunks away and regenerating them from the noise, with only the cells that changed kept (settings.terrain_delta_overlay).
+Explores a whole map with buildings, safe areas, a scout's vision and city cores on it, throws every chunk out of memory, and times reading them all back.
+tests/test_terrain_paging.py checks they come back exactly as they were.
+Then compares the memory for the whole map kept in memory against the same map with the delta overlay, at the default limit and a small one.
+Unchanged chunks go as soon as they're out of view, so even at the default limit only the ones with changes stay.
+Run from the repo root with: python -m benchmarks.chunk_regeneration
+"""
+import time
+import tracemalloc
+
+import settings
+from hex_math import Hexagon
+from terrain_generation import CachedChunkGenerator
+from world import Building, Terrain
+
+seed = 42
+chunk_size = 31
+# The map is this many chunks across and down.
+side = 16
+# A building and protection tower every this many chunks.
+building_every = 7
+max_resident_mb = 0.5
+
+
+def anchors():
+    for i in range(side):
+        for j in range(side):
+            r = j * (chunk_size + 1)
+            q = i * chunk_size - r // 2
+            yield Hexagon(q, r, -q - r)
+
+
+def explore(limit):
+    """
+    Generates every chunk on the map, leaving buildings and safe areas behind, with a scout watching the middle of it.
+    Args:
+        limit (float): most MB of chunks in memory, None for no limit.
+    Returns:
+        The Terrain.
+    """
+    terrain = Terrain(chunk_size, seed)
+    terrain.hexagon_map.max_resident_mb = limit
+    for n, c in enumerate(anchors()):
+        terrain.hexagon_map.touch((c,))
+        terrain.generate_chunk(c)
+        site = Hexagon(c.q + 2, c.r + 3, c.s - 5)
+        if n % building_every == 0 and site not in terrain.buildings:
+            terrain.add_building(site, Building(3))
+            terrain.add_safe_area(("tower", site), site, 3)
+    middle = list(anchors())[side * side // 2 + side // 2]
+    terrain.add_vision("scout", middle, 9)
+    return terrain
+
+
+def delta_memory(store):
+    """
+    Bytes kept for the chunks that were thrown away.
+    """
+    return sum(indices.nbytes + cells.nbytes for indices, cells in store.deltas.values())
+
+
+def chunk_memory(store):
+    """
+    Bytes taken by the chunks in memory, the deltas and the generator's cache.
+    """
+    total = len(store.last_used) * store.chunk_bytes + delta_memory(store)
+    if store.generator is not None:
+        total += sum(t.nbytes for t in store.generator.cache.values())
+    return total
+
+
+def measured(limit):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    terrain = explore(limit)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return terrain, after - before
+
+
+def regenerate():
+    terrain = explore(None)
+    store = terrain.hexagon_map
+    # In case settings.terrain_delta_overlay is off.
+    store.generator = store.generator or CachedChunkGenerator(chunk_size, terrain.terrain_noise)
+    anchors = list(terrain.chunk_list)
+    # Throw everything out. Nothing's in view, so every chunk can go.
+    store.max_resident_mb = 0
+    store.touch(())
+    store._shrink()
+    stats = store.stats()
+    deltas = delta_memory(store)
+    start = time.perf_counter()
+    for c in anchors:
+        # Reading a cell regenerates the chunk.
+        store[c]
+    elapsed = time.perf_counter() - start
+    print(f"{len(anchors)} chunks thrown away and regenerated in {elapsed / len(anchors) * 1000:.2f}ms each, {stats['deltas']} with changes kept ({stats['delta_cells']} cells), "
+          f"{len(anchors) - stats['deltas']} with nothing kept at all")
+    print(f"{stats['paged'] * store.chunk_bytes / 2 ** 20:.2f}MB of chunks kept as {deltas / 2 ** 10:.1f}KB of deltas")
+    print(f"{len(terrain.buildings)} buildings, {len(terrain.city_cores)} cores, {len(terrain.vision.counts)} hexes seen, {len(terrain.safety.counts)} safe")
+
+
+def main():
+    regenerate()
+    print(f"{'mode':>14} {'chunks in memory':>17} {'chunk memory':>13} {'whole terrain':>14}")
+    for name, limit in (("all in memory", None), (f"delta {settings.max_resident_terrain_mb}MB", settings.max_resident_terrain_mb),
+                        (f"delta {max_resident_mb}MB", max_resident_mb)):
+        terrain, whole = measured(limit)
+        store = terrain.hexagon_map
+        print(f"{name:>14} {len(store.last_used):>17} {chunk_memory(store) / 2 ** 20:>11.2f}MB {whole / 2 ** 20:>12.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
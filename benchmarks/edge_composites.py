@@ -0,0 +1,97 @@
+"""
+Checks the composited edge sprites headlessly, times building them, and counts sprites per hex with and without them.
+Run from the repo root with: python -m benchmarks.edge_composites
+"""
+import random
+import time
+
+import numpy as np
+import pyglet
+
+pyglet.options["shadow_window"] = False  # No window here, the composites are built on the CPU.
+
+import hex_math
+import sprite_composite
+from hex_math import Hexagon
+
+styles = {
+    "safe": (None, [f"safe {e}" for e in sprite_composite.edge_names]),
+    "energy network on": ("energy network center on", [f"energy network {e} on" for e in sprite_composite.edge_names]),
+    "energy network off": ("energy network center off", [f"energy network {e} off" for e in sprite_composite.edge_names]),
+}
+
+
+def same_pixels(a, b):
+    """
+    Compares two RGBA images, ignoring the colour of fully transparent pixels.
+    """
+    shown = a[..., 3] > 0
+    return np.array_equal(a[..., 3], b[..., 3]) and np.array_equal(a[shown], b[shown])
+
+
+def check(composites):
+    for style, (center, edges) in styles.items():
+        for idx, edge in enumerate(edges):
+            pixels = composites.composite(style, 1 << idx)
+            expected = np.rint(composites._pixels(edge) * 255).astype(np.uint8)
+            if center is None:
+                assert same_pixels(pixels, expected), f"{style} edge {idx} on its own should be the edge sprite."
+            else:
+                # An edge over the center should only change pixels where the edge is.
+                base = np.rint(composites._pixels(center) * 255).astype(np.uint8)
+                untouched = expected[..., 3] == 0
+                assert same_pixels(pixels[untouched], base[untouched]), f"{style} edge {idx} changed pixels outside the edge."
+                opaque = expected[..., 3] == 255
+                assert np.array_equal(pixels[opaque], expected[opaque]), f"{style} edge {idx} isn't on top."
+        if center is not None:
+            assert same_pixels(composites.composite(style, 0), np.rint(composites._pixels(center) * 255).astype(np.uint8)), f"{style} with no edges should be the center."
+
+
+def sprite_counts():
+    """
+    Sprites needed for a few protection towers' safe areas and a branching network, one per edge the old way and one per hex now.
+    """
+    rng = random.Random(42)
+    safe = set()
+    for _ in range(20):
+        center = Hexagon(rng.randint(-40, 40), rng.randint(-40, 40), 0)
+        center = Hexagon(center.q, center.r, -center.q - center.r)
+        safe.update(hex_math.get_hex_chunk(center, 3))
+    network = {Hexagon(0, 0, 0)}
+    frontier = [Hexagon(0, 0, 0)]
+    while len(network) < 2000:
+        h = rng.choice(frontier)
+        n = hex_math.hex_neighbor(h, rng.randrange(6))
+        if n not in network:
+            network.add(n)
+            frontier.append(n)
+    safe_edges = sum(hex_math.hex_neighbor(h, idx) not in safe for h in safe for idx in range(6))
+    safe_hexes = sum(any(hex_math.hex_neighbor(h, idx) not in safe for idx in range(6)) for h in safe)
+    network_edges = sum(hex_math.hex_neighbor(h, idx) in network for h in network for idx in range(6))
+    return (safe_edges, safe_hexes), (network_edges + len(network), len(network))
+
+
+def main():
+    composites = sprite_composite.EdgeComposites("sprites/", styles, {})
+    check(composites)
+    start = time.perf_counter()
+    for style, (center, _) in styles.items():
+        for mask in range(center is None, 64):  # Without a center, no edges means no sprite.
+            composites.sprite_id(style, mask)
+    built = time.perf_counter() - start
+    # Asking again shouldn't build anything.
+    start = time.perf_counter()
+    for style, (center, _) in styles.items():
+        for mask in range(center is None, 64):  # Without a center, no edges means no sprite.
+            composites.sprite_id(style, mask)
+    cached = time.perf_counter() - start
+    print(f"{len(composites)} composites built in {built * 1000:.1f}ms ({built / len(composites) * 1000:.2f}ms each), cached lookups {cached / len(composites) * 1e6:.2f}us each, checks ok")
+
+    (safe_old, safe_new), (network_old, network_new) = sprite_counts()
+    print(f"{'layer':>8} {'sprites before':>15} {'sprites after':>14} {'reduction':>10}")
+    print(f"{'safe':>8} {safe_old:>15} {safe_new:>14} {safe_old / safe_new:>9.2f}x")
+    print(f"{'network':>8} {network_old:>15} {network_new:>14} {network_old / network_new:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
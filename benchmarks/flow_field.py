@@ -0,0 +1,102 @@
+"""
+10,000 simulated enemies finding their way to the nearest network node or building, with an A* per enemy and with the flow field.
+Also times adding and removing targets one at a time, against building the field from scratch. tests/test_flow_field.py checks they come out the same.
+Run from the repo root with: python -m benchmarks.flow_field
+"""
+import random
+import time
+
+import hex_math
+import pathfinding
+from hex_math import Hexagon
+
+enemies = 10_000
+# A* per enemy is slow enough that it's timed on a sample and scaled up.
+a_star_sample = 500
+network_nodes = 500
+buildings = 50
+spawn_radius = 70
+edits = 200
+
+
+def make_targets(rng):
+    network = {Hexagon(0, 0, 0)}
+    frontier = [Hexagon(0, 0, 0)]
+    while len(network) < network_nodes:
+        n = hex_math.hex_neighbor(rng.choice(frontier), rng.randrange(6))
+        if n not in network:
+            network.add(n)
+            frontier.append(n)
+    spread = hex_math.get_hex_chunk(Hexagon(0, 0, 0), 40)
+    return network | set(rng.sample(spread, buildings))
+
+
+def nearest_target_path(position, targets):
+    """
+    The old way: pick the closest target, then A* to it.
+    """
+    target = min(targets, key=lambda t: hex_math.hex_distance(t, position))
+    return pathfinding.find_path(position, target, include_start=True)
+
+
+def main():
+    rng = random.Random(7)
+    targets = make_targets(rng)
+    target_list = list(targets)
+    spawn = hex_math.get_hex_chunk(Hexagon(0, 0, 0), spawn_radius)
+    positions = [rng.choice(spawn) for _ in range(enemies)]
+
+    start = time.perf_counter()
+    for p in positions[:a_star_sample]:
+        nearest_target_path(p, target_list)
+    a_star = (time.perf_counter() - start) / a_star_sample * enemies
+
+    start = time.perf_counter()
+    field = pathfinding.FlowField(max_distance=64)
+    field.add_sources(hex_math.hex_key(t) for t in targets)
+    build = time.perf_counter() - start
+
+    keys = [hex_math.hex_key(p) for p in positions]
+    start = time.perf_counter()
+    for k in keys:
+        field.next_step(k)
+    steps = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in positions:
+        field.path(p, True)
+    full_paths = time.perf_counter() - start
+
+    print(f"{len(targets)} targets, {enemies} enemies, field covers {len(field)} hexes")
+    print(f"{'A* per enemy':>28} {a_star * 1000:>10.1f}ms (timed on {a_star_sample}, scaled up)")
+    print(f"{'flow field build':>28} {build * 1000:>10.1f}ms")
+    print(f"{'next step for every enemy':>28} {steps * 1000:>10.1f}ms ({steps / enemies * 1e6:.2f}us each)")
+    print(f"{'full path for every enemy':>28} {full_paths * 1000:>10.1f}ms")
+
+    # Plop and remove targets, and time a field built from scratch every so often.
+    incremental = 0.0
+    rebuild = 0.0
+    edit_spots = hex_math.get_hex_chunk(Hexagon(0, 0, 0), 50)
+    for n in range(edits):
+        if rng.random() < 0.5 and len(target_list) > 1:
+            t = target_list.pop(rng.randrange(len(target_list)))
+            start = time.perf_counter()
+            field.remove_sources([hex_math.hex_key(t)])
+        else:
+            t = rng.choice(edit_spots)
+            if t in target_list:
+                continue
+            target_list.append(t)
+            start = time.perf_counter()
+            field.add_sources([hex_math.hex_key(t)])
+        incremental += time.perf_counter() - start
+        if n % 20 == 0:
+            start = time.perf_counter()
+            fresh = pathfinding.FlowField(max_distance=64)
+            fresh.add_sources(hex_math.hex_key(t) for t in target_list)
+            rebuild += time.perf_counter() - start
+    print(f"{'incremental target change':>28} {incremental / edits * 1000:>10.2f}ms each, against {rebuild / (edits // 20) * 1000:.1f}ms for a rebuild")
+
+
+if __name__ == "__main__":
+    main()
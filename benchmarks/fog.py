@@ -0,0 +1,126 @@
+"""
+Per frame cost of keeping the fog of war drawn while lots of units walk around and the view scrolls, with a stubbed batch instead of cocos2d.
+Compares the old draw_fog, which synced every hex in view every time anything moved, against map_views.FogView redrawing only the hexes in the vision flips and the scroll deltas.
+tests/test_fog_view.py checks the incremental redraw ends up the same as a full one.
+Run from the repo root with: python -m benchmarks.fog
+"""
+import random
+import time
+
+import helpers
+import hex_math
+from benchmarks.terrain_sprites import FakeScroller, StubBatch, StubSprite, layout, sprite_height, sprite_width
+from coverage import Coverage
+from hex_math import Hexagon
+from map_views import FogView
+from pixel_cache import PixelCache
+from sprite_cache import SpritePool, SpriteReconciler
+
+map_radius = 200
+chunk_size = 11
+unit_counts = (100, 1000, 5000)
+vision_range = 3
+frames = 30
+# Units step every few frames, like UnitMover does, so only some of them move each frame.
+steps_per_frame = 0.25
+
+
+class Cell:
+    __slots__ = ("visible",)
+
+    def __init__(self):
+        self.visible = 0
+
+
+def fog_sprite(k):
+    return "fog", hex_math.hex_to_pixel(layout, k, False), -k.r
+
+
+def old_draw_fog(sprites, hexagon_map, visible_hexes):
+    wanted = {}
+    for k in visible_hexes:
+        try:
+            h = hexagon_map[k]
+        except KeyError:
+            continue
+        if h.visible == 0:
+            wanted[f"{k.q}_{k.r}_{k.s}"] = fog_sprite(k)
+    sprites.sync(wanted)
+
+
+def mirror(hexagon_map, flips):
+    for value, hexes in zip((1, 0), flips):
+        for h in hexes:
+            cell = hexagon_map.get(h)
+            if cell is not None:
+                cell.visible = value
+    return flips
+
+
+def plan(rng, units):
+    """
+    Where every unit starts, and which units step where on each frame, so both ways get the same moves.
+    """
+    # Spread them over a few screens around the view, so some of the moves are in view and some aren't.
+    start = [hex_math.pixel_to_hex(layout, hex_math.Point(rng.randint(-1920, 3840), rng.randint(-1200, 2400))) for _ in range(units)]
+    positions = list(start)
+    moves = []
+    for _ in range(frames):
+        frame = []
+        for i in rng.sample(range(units), int(units * steps_per_frame)):
+            positions[i] = hex_math.hex_neighbor(positions[i], rng.randrange(6))
+            frame.append((i, positions[i]))
+        moves.append(frame)
+    return start, moves
+
+
+def run(units):
+    rng = random.Random(units)
+    start, moves = plan(rng, units)
+    images = {"fog": "fog"}
+    anchor = (sprite_width / 2, sprite_height / 2)
+    results = []
+    for incremental in (False, True):
+        hexagon_map = {h: Cell() for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), map_radius)}
+        vision = Coverage()
+        for i, p in enumerate(start):
+            mirror(hexagon_map, vision.add(i, p, vision_range))
+        scroller = FakeScroller()
+        tracker = helpers.VisibleHexTracker(layout, sprite_width)
+        tracker.update(scroller)
+        batch = StubBatch()
+        sprites = SpriteReconciler(batch, SpritePool(images, StubSprite), anchor, opacity=223)
+        view = FogView(sprites, hexagon_map, vision, PixelCache(layout, chunk_size), tracker.hexes)
+        old_draw_fog(sprites, hexagon_map, tracker.hexes)
+        elapsed = 0.0
+        for n, frame in enumerate(moves):
+            begin = time.perf_counter()
+            for i, p in frame:
+                seen, fogged = mirror(hexagon_map, vision.move(i, p))
+                # The old way redrew everything in view every time a unit stepped.
+                if incremental:
+                    view.draw(seen | fogged)
+                else:
+                    old_draw_fog(sprites, hexagon_map, tracker.hexes)
+            if n % 3 == 0:
+                scroller.fx += 32
+                entering, leaving = tracker.update(scroller)
+                if incremental:
+                    view.draw(entering | leaving)
+                else:
+                    old_draw_fog(sprites, hexagon_map, tracker.hexes)
+            elapsed += time.perf_counter() - begin
+        results.append((elapsed / frames, len(batch.children)))
+    return results
+
+
+def main():
+    print(f"{vision_range} hex vision, {frames} frames, {steps_per_frame:.0%} of units stepping each frame, scrolling every third")
+    print(f"{'units':>6} {'old per frame':>14} {'incremental per frame':>22} {'speedup':>8} {'fog sprites':>12}")
+    for units in unit_counts:
+        (old, _), (new, shown) = run(units)
+        print(f"{units:>6} {old * 1000:>12.2f}ms {new * 1000:>20.3f}ms {old / new:>7.0f}x {shown:>12}")
+
+
+if __name__ == "__main__":
+    main()
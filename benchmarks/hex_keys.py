@@ -0,0 +1,100 @@
+"""
+Memory and lookup speed of a dictionary over 1,000,000 and 10,000,000 hexes, keyed by Hexagon namedtuples, by packed hex keys, and through hex_keys.HexKeyDict.
+Each map is built in its own process, and its memory is how much that process grew by.
+Also times stepping to a neighbour with hex_math.hex_neighbor against adding to a hex key.
+Needs about 3GB of free memory for the 10,000,000 hex Hexagon map.
+Run from the repo root with: python -m benchmarks.hex_keys
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import hex_math
+from hex_keys import HexKeyDict
+from hex_math import Hexagon, key_directions, key_stride
+
+map_sizes = (1_000_000, 10_000_000)
+lookups = 1_000_000
+kinds = ("Hexagon", "hex key", "HexKeyDict")
+
+
+def resident_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def coordinates(size):
+    """
+    A hexagon shaped map of at least size hexes around the origin, as (q, r) pairs.
+    """
+    radius = math.ceil(math.sqrt(size / 3))
+    for q in range(-radius, radius + 1):
+        for r in range(max(-radius, -q - radius), min(radius, -q + radius) + 1):
+            yield q, r
+
+
+def measure(kind, size):
+    """
+    Builds one map and looks things up in it. Runs in a fresh process, so the memory numbers aren't muddled by the other maps.
+    Returns:
+        Tuple of (hexes, bytes per hex, lookups per second).
+    """
+    rng = random.Random(size)
+    radius = math.ceil(math.sqrt(size / 3))
+    queries = []
+    while len(queries) < lookups:
+        q, r = rng.randint(-radius, radius), rng.randint(-radius, radius)
+        if abs(q + r) <= radius:
+            queries.append(Hexagon(q, r, -q - r))
+    if kind == "hex key":
+        queries = [hex_math.hex_key(h) for h in queries]
+    before = resident_bytes()
+    if kind == "Hexagon":
+        hexes = {Hexagon(q, r, -q - r): 1 for q, r in coordinates(size)}
+    elif kind == "hex key":
+        hexes = {q * key_stride + r: 1 for q, r in coordinates(size)}
+    else:
+        hexes = HexKeyDict()
+        hexes.data = {q * key_stride + r: 1 for q, r in coordinates(size)}
+    grown = resident_bytes() - before
+    start = time.perf_counter()
+    for h in queries:
+        hexes[h]
+    elapsed = time.perf_counter() - start
+    return len(hexes), grown / len(hexes), lookups / elapsed
+
+
+def neighbours():
+    """
+    Neighbour steps per second, with namedtuples and with hex keys.
+    """
+    h = Hexagon(3, -7, 4)
+    k = hex_math.hex_key(h)
+    start = time.perf_counter()
+    for _ in range(lookups // 6):
+        for n in range(6):
+            hex_math.hex_neighbor(h, n)
+    old = lookups / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(lookups // 6):
+        for d in key_directions:
+            k + d
+    new = lookups / (time.perf_counter() - start)
+    return old, new
+
+
+def main():
+    print(f"{'hexes':>11} {'keyed by':>11} {'bytes per hex':>14} {'map size':>10} {'lookups per second':>19}")
+    for size in map_sizes:
+        for kind in kinds:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                count, per_hex, rate = executor.submit(measure, kind, size).result()
+            print(f"{count:>11} {kind:>11} {per_hex:>14.0f} {per_hex * count / 2 ** 20:>8.0f}MB {rate:>19,.0f}")
+    old, new = neighbours()
+    print(f"Neighbour steps per second, hex_neighbor: {old:,.0f}, hex key + key_directions: {new:,.0f}, {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Scalar hex_math against hex_math_batch, from 1,000 to 10,000,000 hexes.
+tests/test_hex_math_batch.py checks the batch results are exactly the same as the scalar ones.
+The scalar functions are only timed on up to scalar_limit hexes, and scaled up from there, since 10,000,000 namedtuples one at a time takes minutes. Those are marked with a *.
+Run from the repo root with: python -m benchmarks.hex_math_batch
+"""
+import math
+import time
+
+import numpy as np
+
+import hex_math
+import hex_math_batch
+from hex_math import Hexagon, Point
+
+sizes = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+scalar_limit = 100_000
+# Lines are this many steps long, so every line is line_length + 1 hexes and linedraw gets a tenth as many lines as the other functions get hexes.
+line_length = 9
+layout = hex_math.Layout(hex_math.layout_pointy, Point(round(64 / math.sqrt(3)), 32), Point(960, 600))
+
+
+def random_hexes(rng, n):
+    q = rng.integers(-5000, 5000, n)
+    r = rng.integers(-5000, 5000, n)
+    return np.stack((q, r, -q - r), axis=-1)
+
+
+def random_points(rng, n):
+    # Whole and half pixels, so plenty of them land right on the edges between hexes.
+    return (rng.integers(-200_000, 200_000, (n, 2)) / 2.0,)
+
+
+def random_fractional(rng, n):
+    # Quarters, so there are ties for hex_round to break.
+    qr = rng.integers(-4000, 4000, (n, 2)) / 4.0
+    return (np.column_stack((qr, -qr[:, 0] - qr[:, 1])),)
+
+
+def random_lines(rng, n):
+    starts = random_hexes(rng, n // (line_length + 1))
+    ends = starts + np.array(hex_math.hex_directions)[rng.integers(0, 6, len(starts))] * line_length
+    return starts, ends
+
+
+def scalar_input(a):
+    """
+    An input array as the scalar functions take it, a list of Hexagons or of Points.
+    """
+    if a.shape[1] == 2:
+        return [Point(*p) for p in a.tolist()]
+    return [Hexagon(*h) for h in a.tolist()]
+
+
+# Name, how to make the inputs, the scalar version over lists of Hexagons or Points, and the batch version over arrays.
+cases = [
+    ("hex_to_pixel", lambda rng, n: (random_hexes(rng, n),),
+     lambda hexes: [tuple(hex_math.hex_to_pixel(layout, h)) for h in hexes],
+     lambda hexes: hex_math_batch.hex_to_pixel(layout, hexes)),
+    ("pixel_to_hex", random_points,
+     lambda points: [tuple(hex_math.pixel_to_hex(layout, p)) for p in points],
+     lambda points: hex_math_batch.pixel_to_hex(layout, points)),
+    ("hex_round", random_fractional,
+     lambda fractional: [tuple(hex_math.hex_round(h)) for h in fractional],
+     hex_math_batch.hex_round),
+    ("hex_distance", lambda rng, n: (random_hexes(rng, n), random_hexes(rng, n)),
+     lambda a, b: [hex_math.hex_distance(x, y) for x, y in zip(a, b)],
+     hex_math_batch.hex_distance),
+    ("hex_linedraw", random_lines,
+     lambda starts, ends: [tuple(h) for a, b in zip(starts, ends) for h in hex_math.hex_linedraw(a, b)],
+     hex_math_batch.hex_linedraw),
+    ("polygon_corners", lambda rng, n: (random_hexes(rng, n),),
+     lambda hexes: [tuple(map(tuple, hex_math.polygon_corners(layout, h))) for h in hexes],
+     lambda hexes: hex_math_batch.polygon_corners(layout, hexes)),
+]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(1)
+    print(f"{'function':>16} {'hexes':>9} {'scalar':>11} {'batch':>11} {'speedup':>8}")
+    for name, make, scalar, batch in cases:
+        for n in sizes:
+            arrays = make(rng, n)
+            count = len(arrays[0])
+            sample = min(count, scalar_limit * count // n)
+            scalar_time = timed(scalar, *(scalar_input(a[:sample]) for a in arrays))
+            batch_time = timed(batch, *arrays)
+            scaled = scalar_time * count / sample
+            mark = "*" if sample < count else " "
+            print(f"{name:>16} {n:>9} {scaled * 1000:>9.1f}ms{mark}{batch_time * 1000:>9.1f}ms {scaled / batch_time:>7.0f}x")
+            del arrays
+
+
+if __name__ == "__main__":
+    main()
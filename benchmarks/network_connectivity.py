@@ -0,0 +1,108 @@
+"""
+Stress test for connectivity.Connectivity on 100k node networks, a single long line and a filled in hexagon.
+Times the edits against flooding the whole network from the core. tests/test_connectivity.py checks they agree.
+Run from the repo root with: python -m benchmarks.network_connectivity
+"""
+import random
+import sys
+import time
+
+import hex_math
+from benchmarks.timing import best_of
+from connectivity import Connectivity
+from hex_math import Hexagon, hex_key, key_directions
+
+nodes = 100_000
+edits = 1000
+
+
+def flood(network, root):
+    """
+    Everything connected to the root, the way update_powered used to find it, but without recursion.
+    """
+    seen = {root}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        for d in key_directions:
+            n = current + d
+            if n in network and n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return seen
+
+
+def recursive_flood(network, start, visited):
+    """
+    Network.find_all_connected_inner as it was.
+    """
+    if start in visited:
+        return visited
+    visited.add(start)
+    for n in [start + d for d in key_directions if start + d in network]:
+        if n not in visited:
+            visited.union(recursive_flood(network, n, visited))
+    return visited
+
+
+def line():
+    return [hex_key(Hexagon(q, 0, -q)) for q in range(nodes)]
+
+
+def hexagon():
+    radius = 1
+    while 3 * radius * (radius + 1) + 1 < nodes:
+        radius += 1
+    hexes = sorted(hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius), key=hex_math.hex_length)
+    return [hex_key(h) for h in hexes]
+
+
+def run(name, keys, rng):
+    root = keys[0]
+    start = time.perf_counter()
+    c = Connectivity(root)
+    for k in keys[1:]:
+        c.add(k)
+    build = time.perf_counter() - start
+    network = set(keys)
+
+    try:
+        recursive = "ok"
+        recursive_flood(network, root, set())
+    except RecursionError:
+        recursive = "RecursionError"
+
+    removed = []
+    edit_time = 0.0
+    changed_total = 0
+    for n in range(edits):
+        if removed and rng.random() < 0.5:
+            k = removed.pop(rng.randrange(len(removed)))
+            start = time.perf_counter()
+            changed = c.add(k)
+            edit_time += time.perf_counter() - start
+            network.add(k)
+        else:
+            k = rng.choice(keys[1:])
+            if k not in network:
+                continue
+            start = time.perf_counter()
+            changed = c.remove(k)
+            edit_time += time.perf_counter() - start
+            network.discard(k)
+            removed.append(k)
+        changed_total += len(changed)
+    full = best_of(lambda: flood(network, root), repeat=3)
+    print(f"{name:>8} {len(keys):>8} {build:>9.2f}s {edit_time / edits * 1000:>12.3f}ms {changed_total / edits:>14.1f} {full * 1000:>16.1f}ms {recursive:>16}")
+
+
+def main():
+    rng = random.Random(3)
+    print(f"Recursion limit is {sys.getrecursionlimit()}.")
+    print(f"{'network':>8} {'nodes':>8} {'build':>10} {'per edit':>14} {'changed/edit':>14} {'full flood':>18} {'old recursion':>16}")
+    run("line", line(), rng)
+    run("hexagon", hexagon(), rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Placing 10k network tiles in a line and in a grid, one at a time like clicking them down.
+The old way ran an A* back to the core for every new tile, then flooded the whole network to update powered states.
+Now a tile checks its neighbours' groups in the connectivity index. tests/test_connectivity.py checks the powered states against a flood.
+The connectivity index is only part of what a click costs, so the first couple of thousand tiles of each shape also go down through Simulation.plop_network,
+with the flow field and everything else a click does.
+Run from the repo root with: python -m benchmarks.network_placement
+"""
+import time
+
+import headless
+import hex_math
+import pathfinding
+from benchmarks.network_connectivity import flood
+from benchmarks.timing import best_of
+from connectivity import Connectivity
+from hex_math import Hexagon, hex_key, key_directions
+
+tiles = 10_000
+# The old way is quadratic, so only time single placements onto networks of these sizes.
+old_checkpoints = (1000, 5000, 10_000)
+# Tiles placed through the simulation. It doesn't get slower as the network grows, but it isn't quick.
+click_tiles = 2000
+
+
+def line():
+    return [Hexagon(q, 0, -q) for q in range(tiles + 1)]
+
+
+def grid():
+    radius = 1
+    while 3 * radius * (radius + 1) + 1 < tiles + 1:
+        radius += 1
+    return sorted(hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius), key=lambda h: (hex_math.hex_length(h), h))[:tiles + 1]
+
+
+def old_place(network, cell, core):
+    """
+    plop_network and draw_network as they were: A* to the core, then flood the lot.
+    """
+    network_keys = set(network)
+    powered = pathfinding.find_path(cell, core, network_keys.__contains__) is not None
+    network.add(hex_key(cell))
+    flood(network, hex_key(core))
+    return powered
+
+
+def new_place(c, cell):
+    key = hex_key(cell)
+    powered = c.touches_root(key + d for d in key_directions)
+    c.add(key)
+    return powered
+
+
+def click(cells):
+    """
+    Places tiles the way clicking them down in the game does.
+    Returns:
+        Seconds per tile.
+    """
+    simulation = headless.new_game(42, 11, 0)
+    start = time.perf_counter()
+    for cell in cells:
+        simulation.plop_network(cell)
+    return (time.perf_counter() - start) / len(cells)
+
+
+def run(name, cells):
+    core = cells[0]
+    c = Connectivity(hex_key(core))
+    start = time.perf_counter()
+    for cell in cells[1:]:
+        new_place(c, cell)
+    new = time.perf_counter() - start
+    clicked = click(cells[1:click_tiles + 1])
+
+    old = []
+    for size in old_checkpoints:
+        network = {hex_key(h) for h in cells[:size]}
+        cell = cells[size]
+        old.append(best_of(lambda: old_place(set(network), cell, core), repeat=3))
+    old_text = " ".join(f"{t * 1000:>8.2f}ms" for t in old)
+    print(f"{name:>6} {new * 1000:>10.1f}ms {new / tiles * 1e6:>9.2f}us {clicked * 1000:>10.2f}ms {old_text}")
+
+
+def main():
+    checkpoints = " ".join(f"{'old @' + str(n):>10}" for n in old_checkpoints)
+    print(f"{'shape':>6} {'new total':>12} {'new each':>11} {'click each':>12} {checkpoints}")
+    run("line", line())
+    run("grid", grid())
+
+
+if __name__ == "__main__":
+    main()
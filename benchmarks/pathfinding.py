@@ -0,0 +1,109 @@
+"""
+Paths per second over random obstacle maps, for the old PriorityQueue A* and pathfinding.search.
+Both have to find paths of the same length, and every new path has to be a real path around the obstacles.
+Run from the repo root with: python -m benchmarks.pathfinding
+"""
+import random
+import time
+from queue import PriorityQueue
+
+import hex_math
+import pathfinding
+from hex_math import Hexagon
+
+map_radius = 60
+obstacle_densities = (0.1, 0.25, 0.35)
+paths = 200
+
+
+def legacy_a_star(start_cell, end_cell, blocked):
+    """
+    UnitLayer.a_star as it was, with the map edge added as an obstacle so it can't wander off forever.
+    """
+    q = PriorityQueue()
+    q.put((0, start_cell))
+    visited = {}
+    total_cost = {}
+    visited[start_cell] = None
+    total_cost[start_cell] = 0
+
+    while not q.empty():
+        _, current = q.get()
+        if current == end_cell:
+            return visited
+        neighbours = [hex_math.hex_neighbor(current, x) for x in range(6)]
+        for next_cell in neighbours:
+            new_cost = total_cost[current] + 1
+            if next_cell not in total_cost.keys() or new_cost < total_cost[next_cell]:
+                if next_cell in blocked or hex_math.hex_length(next_cell) > map_radius:
+                    continue
+                total_cost[next_cell] = new_cost
+                next_priority = new_cost + hex_math.hex_distance(end_cell, next_cell)
+                q.put((next_priority, next_cell))
+                visited[next_cell] = current
+    return None
+
+
+def legacy_path_length(start_cell, end_cell, blocked):
+    visited = legacy_a_star(start_cell, end_cell, blocked)
+    if visited is None:
+        return None
+    length = 0
+    current = end_cell
+    while current != start_cell:
+        length += 1
+        current = visited[current]
+    return length
+
+
+def make_map(density, rng):
+    hexes = hex_math.get_hex_chunk(Hexagon(0, 0, 0), map_radius)
+    blocked = {h for h in hexes if rng.random() < density}
+    open_hexes = [h for h in hexes if h not in blocked]
+    pairs = [tuple(rng.sample(open_hexes, 2)) for _ in range(paths)]
+    return blocked, pairs
+
+
+def check_path(path, start, end, blocked):
+    assert path[0] == start and path[-1] == end, "Path doesn't join the ends."
+    for a, b in zip(path, path[1:]):
+        assert hex_math.hex_distance(a, b) == 1, "Path jumps."
+    assert not any(h in blocked for h in path), "Path goes through an obstacle."
+
+
+def main():
+    print(f"{'obstacles':>10} {'legacy paths/s':>15} {'new paths/s':>12} {'speedup':>8} {'unreachable':>12}")
+    for density in obstacle_densities:
+        rng = random.Random(int(density * 100))
+        blocked, pairs = make_map(density, rng)
+        blocked_keys = {hex_math.hex_key(h) for h in blocked}
+        map_keys = {hex_math.hex_key(h) for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), map_radius)} - blocked_keys
+        passable = map_keys.__contains__
+
+        start = time.perf_counter()
+        legacy = [legacy_path_length(a, b, blocked) for a, b in pairs]
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = [pathfinding.find_path(a, b, passable, include_start=True, max_expansions=len(map_keys)) for a, b in pairs]
+        new_time = time.perf_counter() - start
+
+        for (a, b), old, path in zip(pairs, legacy, new):
+            if old is None:
+                assert path is None, "Found a path the old A* couldn't."
+                continue
+            check_path(path, a, b, blocked)
+            assert len(path) - 1 == old, "Path isn't the shortest."
+        unreachable = sum(p is None for p in new)
+        print(f"{density:>10.0%} {paths / legacy_time:>15.1f} {paths / new_time:>12.1f} {legacy_time / new_time:>7.1f}x {unreachable:>12}")
+
+    # With a small expansion cap a walled off goal gives up quickly, instead of searching everything it can reach.
+    inside = set(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 2))
+    wall = {hex_math.hex_key(h) for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), 3) if h not in inside}
+    start = time.perf_counter()
+    assert pathfinding.find_path(Hexagon(40, 0, -40), Hexagon(0, 0, 0), lambda key: key not in wall, max_expansions=2000) is None
+    print(f"walled off goal gave up after 2000 expansions in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Cost of working out the pixel position of every hex in view, the way the layers do on a full redraw, with hex_to_pixel and with pixel_cache.PixelCache.
+The view scrolls right then back, so some chunks come back after they've gone out of view. Run with a few cache sizes, to show the hit rate falling as it starts evicting.
+tests/test_pixel_cache.py checks the cached positions are exactly what hex_to_pixel gives.
+Run from the repo root with: python -m benchmarks.pixel_cache
+"""
+import time
+
+import helpers
+import hex_math
+from benchmarks.terrain_sprites import FakeScroller, layout, sprite_width
+from pixel_cache import PixelCache
+
+chunk_size = 11
+frames = 200
+scroll_step = 32
+cache_sizes = (256, 32, 8)
+
+
+def views():
+    """
+    The visible hexes for every frame, scrolling right for half of them and back for the rest.
+    """
+    scroller = FakeScroller()
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    tracker.update(scroller)
+    for n in range(frames):
+        scroller.fx += scroll_step if n < frames // 2 else -scroll_step
+        tracker.update(scroller)
+        yield list(tracker.hexes)
+
+
+def run(frame_hexes, max_chunks):
+    start = time.perf_counter()
+    for hexes in frame_hexes:
+        for h in hexes:
+            hex_math.hex_to_pixel(layout, h, False)
+    old = (time.perf_counter() - start) / frames
+
+    cache = PixelCache(layout, chunk_size, max_chunks)
+    start = time.perf_counter()
+    for hexes in frame_hexes:
+        for h in hexes:
+            cache.position(h)
+    new = (time.perf_counter() - start) / frames
+    return old, new, cache.stats()
+
+
+def main():
+    frame_hexes = list(views())
+    print(f"{frames} full redraws of {len(frame_hexes[0])} hexes, scrolling {scroll_step}px a frame")
+    print(f"{'max chunks':>11} {'hex_to_pixel per frame':>23} {'cache per frame':>16} {'speedup':>8} {'hit rate':>9} {'misses':>7} {'evictions':>10}")
+    for max_chunks in cache_sizes:
+        old, new, stats = run(frame_hexes, max_chunks)
+        print(f"{max_chunks:>11} {old * 1000:>21.2f}ms {new * 1000:>14.2f}ms {old / new:>7.1f}x {stats['hit_rate']:>9.2%} {stats['misses']:>7} {stats['evictions']:>10}")
+
+
+if __name__ == "__main__":
+    main()
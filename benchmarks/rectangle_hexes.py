@@ -0,0 +1,20 @@
+"""
+Time for hex_math.rectangle_hex_ranges to cover a whole screen at 1080p, 4K and 8K. Its exactness is checked in tests/test_rectangle_hexes.py.
+Run from the repo root with: python -m benchmarks.rectangle_hexes
+"""
+import hex_math
+from benchmarks.timing import best_of
+from hex_math import Point
+
+layout = hex_math.Layout(hex_math.layout_pointy, Point(37, 32), Point(960, 600))
+
+
+def main():
+    for name, (width, height) in {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}.items():
+        seconds = best_of(lambda: hex_math.rectangle_hex_ranges(layout, 0, 0, width, height), number=20)
+        rows = hex_math.rectangle_hex_ranges(layout, 0, 0, width, height)
+        print(f"{name:>6}: {len(rows)} rows, {sum(b - a + 1 for _, a, b in rows)} hexes in {seconds * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
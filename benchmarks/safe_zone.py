@@ -0,0 +1,118 @@
+"""
+Cost of a protection tower powering on or off, on a map with 1,000,000 explored hexes.
+Compares the old way, adding or taking away 2 from every hex in the tower's area and then working out the edges of every hex on the map,
+against coverage.Coverage, which only works out the edges on or next to the hexes that changed.
+tests/test_safe_edge_view.py checks redrawing only those edges ends up the same as redrawing everything.
+Run from the repo root with: python -m benchmarks.safe_zone
+"""
+import random
+import time
+
+import hex_math
+from coverage import Coverage
+from hex_math import Hexagon
+
+map_radius = 577  # 3 * 577 * 578 + 1 is just over a million hexes.
+towers = 300
+tower_radius = 3
+core_radius = 7
+old_toggles = 3
+new_toggles = 1000
+
+
+class Cell:
+    __slots__ = ("safe",)
+
+    def __init__(self):
+        self.safe = 0
+
+
+def old_add_safe_area(hexagon_map, center, safe_type, radius):
+    for h in hex_math.get_hex_chunk(center, radius):
+        if hexagon_map[h].safe == 1:
+            continue
+        hexagon_map[h].safe += safe_type
+
+
+def old_edges(hexagon_map):
+    """
+    What OverlayLayer.draw_safe used to do, for every hex on the map.
+    """
+    masks = {}
+    for k, h in hexagon_map.items():
+        if h.safe != 0:
+            mask = 0
+            for idx in range(6):
+                n = hexagon_map.get(hex_math.hex_neighbor(k, idx))
+                if n is None or n.safe == 0:
+                    mask |= 1 << idx
+            if mask:
+                masks[k] = mask
+    return masks
+
+
+def new_edges(masks, safety, hexes):
+    for k in hexes:
+        mask = safety.edge_mask(k)
+        if mask:
+            masks[k] = mask
+        else:
+            masks.pop(k, None)
+
+
+def main():
+    rng = random.Random(1)
+    start = time.perf_counter()
+    hexagon_map = {h: Cell() for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), map_radius)}
+    print(f"{len(hexagon_map)} explored hexes, {towers} towers, made in {time.perf_counter() - start:.1f}s")
+    spread = map_radius - tower_radius - 1
+    sites = set()
+    while len(sites) < towers:
+        q = rng.randint(-spread, spread)
+        r = rng.randint(max(-spread, -q - spread), min(spread, -q + spread))
+        sites.add(Hexagon(q, r, -q - r))
+    sites = sorted(sites)
+    toggles = [rng.choice(sites) for _ in range(new_toggles)]
+
+    # The old way. The core is safe_type 1, and the towers start off powered.
+    old_add_safe_area(hexagon_map, Hexagon(0, 0, 0), 1, core_radius)
+    powered = set()
+    for site in sites:
+        old_add_safe_area(hexagon_map, site, 2, tower_radius)
+        powered.add(site)
+    start = time.perf_counter()
+    for site in toggles[:old_toggles]:
+        if site in powered:
+            old_add_safe_area(hexagon_map, site, -2, tower_radius)
+            powered.discard(site)
+        else:
+            old_add_safe_area(hexagon_map, site, 2, tower_radius)
+            powered.add(site)
+        old_edges(hexagon_map)
+    old = (time.perf_counter() - start) / old_toggles
+
+    # And with coverage. The core is just a source that never goes away.
+    safety = Coverage()
+    masks = {}
+    new_edges(masks, safety, safety.border(safety.add(("core", Hexagon(0, 0, 0)), Hexagon(0, 0, 0), core_radius)[0]))
+    for site in sites:
+        new_edges(masks, safety, safety.border(safety.add(("protection tower", site), site, tower_radius)[0]))
+    start = time.perf_counter()
+    touched = 0
+    for site in toggles:
+        source = ("protection tower", site)
+        if source in safety:
+            flips = safety.remove(source)
+        else:
+            flips = safety.add(source, site, tower_radius)
+        border = safety.border(flips[0] | flips[1])
+        touched += len(border)
+        new_edges(masks, safety, border)
+    new = (time.perf_counter() - start) / new_toggles
+
+    print(f"{'old per toggle':>15} {'coverage per toggle':>20} {'speedup':>8} {'edges redone per toggle':>24}")
+    print(f"{old * 1000:>13.1f}ms {new * 1000:>18.3f}ms {old / new:>7.0f}x {touched / new_toggles:>24.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Runs the simulation headless as fast as it'll go: a few hundred units being sent around a small base, with enemies spawning and attacking.
+tests/test_simulation.py checks the same game comes out the same every time.
+Run from the repo root with: python -m benchmarks.simulation
+"""
+import random
+import time
+
+import headless
+from hex_math import Hexagon
+from world import Building
+
+seed = 42
+map_radius = 40
+units = 300
+ticks = 4000
+# Every this many ticks, a few units get sent somewhere new.
+orders_every = 20
+orders = 10
+
+
+def build(terrain_seed):
+    sim = headless.new_game(terrain_seed, 11, map_radius)
+    # A line of network out from the core, with towers along it.
+    for q in range(1, 12):
+        sim.plop_network(Hexagon(q, 0, -q))
+    sim.plop_building(Hexagon(4, -1, -3), Building(3))
+    sim.plop_building(Hexagon(8, -1, -7), Building(4))
+    sim.plop_building(Hexagon(12, 0, -12), Building(5))
+    return sim
+
+
+def free_hex(rng, sim):
+    while True:
+        q = rng.randint(-map_radius // 2, map_radius // 2)
+        r = rng.randint(-map_radius // 2, map_radius // 2)
+        h = Hexagon(q, r, -q - r)
+        if h not in sim.units and h not in sim.terrain.buildings:
+            return h
+
+
+def play(terrain_seed):
+    """
+    Plays a game with the same orders every time.
+    Returns:
+        Tuple of (the simulation, seconds spent ticking, how many hexes changed visibility).
+    """
+    sim = build(terrain_seed)
+    rng = random.Random(terrain_seed)
+    for _ in range(units):
+        sim.add_unit(free_hex(rng, sim), 1)
+    sim.publish()
+    flips = 0
+    elapsed = 0.0
+    for n in range(ticks):
+        if n % orders_every == 0:
+            # Cut the network now and then, so power and the towers' areas go on and off.
+            cut = Hexagon(6, 0, -6)
+            if cut in sim.network.network:
+                sim.remove_network(cut)
+            else:
+                sim.plop_network(cut)
+            for start in rng.sample(sorted(sim.units.keys()), orders):
+                sim.move_unit(start, free_hex(rng, sim))
+        begin = time.perf_counter()
+        sim.tick()
+        elapsed += time.perf_counter() - begin
+        diff = sim.publish()
+        flips += len(diff.seen) + len(diff.fogged)
+    return sim, elapsed, flips
+
+
+def main():
+    sim, elapsed, flips = play(seed)
+    moved = sum(1 for u in sim.units.values() if u.move_path)
+    print(f"{units} units, {len(sim.enemies)} enemies, {ticks} ticks of {sim.tick_length * 1000:.0f}ms")
+    print(f"{ticks / elapsed:.0f} ticks per second, {elapsed / ticks * 1000:.3f}ms per tick, {flips / ticks:.1f} visibility flips per tick, {moved} units still walking")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Times nearest and within-radius queries on spatial.SpatialIndex against scanning everything.
+tests/test_spatial.py checks they give the same answers as the scan.
+Run from the repo root with: python -m benchmarks.spatial_index
+"""
+import random
+import time
+
+import hex_math
+from hex_math import Hexagon
+from spatial import SpatialIndex
+
+sizes = (100, 1000, 10_000)
+queries = 1000
+spread = 300
+
+
+def random_hex(rng, radius):
+    q = rng.randint(-radius, radius)
+    r = rng.randint(max(-radius, -q - radius), min(radius, -q + radius))
+    return Hexagon(q, r, -q - r)
+
+
+def main():
+    rng = random.Random(11)
+    print(f"{'keys':>7} {'scan nearest':>13} {'index nearest':>14} {'index nearest 5':>16} {'index within 10':>16}")
+    for size in sizes:
+        index = SpatialIndex()
+        contents = {}
+        while len(contents) < size:
+            h = random_hex(rng, spread)
+            index[h] = contents[h] = True
+        points = [random_hex(rng, spread) for _ in range(queries)]
+        start = time.perf_counter()
+        for h in points:
+            min(contents, key=lambda key: hex_math.hex_distance(key, h))
+        scan = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        for h in points:
+            index.nearest(h)
+        nearest = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        for h in points:
+            index.nearest(h, 5)
+        nearest_5 = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        for h in points:
+            index.within(h, 10)
+        within = (time.perf_counter() - start) / queries
+        print(f"{size:>7} {scan * 1e6:>11.1f}us {nearest * 1e6:>12.1f}us {nearest_5 * 1e6:>14.1f}us {within * 1e6:>14.1f}us")
+
+
+if __name__ == "__main__":
+    main()
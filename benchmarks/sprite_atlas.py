@@ -0,0 +1,51 @@
+"""
+Startup time of the packed sprite atlas, against loading each sprite on its own. The atlas itself is checked in tests/test_sprite_atlas.py.
+Run from the repo root with: python -m benchmarks.sprite_atlas
+"""
+import os
+import tempfile
+import time
+
+import pyglet
+
+pyglet.options["shadow_window"] = False  # No window here, the atlas is packed on the CPU.
+
+import settings
+import sprite_atlas
+from benchmarks.timing import best_of
+
+sprite_path = "sprites/"
+
+
+def load_separately():
+    return {os.path.splitext(f)[0]: pyglet.image.load(os.path.join(sprite_path, f)) for f in os.listdir(sprite_path)}
+
+
+def load_cached(cache_path):
+    """
+    Everything load_atlas does except the texture upload, which needs a GL context.
+    """
+    manifest = sprite_atlas.cached_manifest(sprite_path, cache_path, settings.sprite_atlas_size)
+    assert manifest is not None, "Cached atlas should be current."
+    return [pyglet.image.load(os.path.join(cache_path, f)) for f in manifest["atlases"]]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_path:
+        start = time.perf_counter()
+        manifest = sprite_atlas.build_atlas(sprite_path, cache_path, settings.sprite_atlas_size)
+        cold = time.perf_counter() - start
+        area = sum(w * h for _, _, _, w, h in manifest["regions"].values())
+        atlas_area = sum(settings.sprite_atlas_size * pyglet.image.load(os.path.join(cache_path, f)).height for f in manifest["atlases"])
+        print(f"{len(manifest['regions'])} sprites packed into {len(manifest['atlases'])} atlas(es), {area / atlas_area:.0%} of the atlas area used")
+
+        separate = best_of(load_separately)
+        cached = best_of(lambda: load_cached(cache_path))
+        print(f"{'load':>28} {'time':>9} {'textures':>9}")
+        print(f"{'separate images':>28} {separate * 1000:>7.1f}ms {len(manifest['regions']):>9}")
+        print(f"{'atlas, building the cache':>28} {cold * 1000:>7.1f}ms {len(manifest['atlases']):>9}")
+        print(f"{'atlas, from the cache':>28} {cached * 1000:>7.1f}ms {len(manifest['atlases']):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Times the game's hot spots headless, with pytest-benchmark (pip install pytest-benchmark).
+Each fixture sets its case up, then the test hands the benchmark only the bit we care about.
+The fog and overlay cases drive the same map_views classes the cocos2d layers draw with, on a stub batch.
+Run from the repo root with: python -m pytest benchmarks/suite.py
+Pass -k to only run some, e.g. python -m pytest benchmarks/suite.py -k "pathfinding or visibility"
+
+Timings only mean anything against ones from the same machine, so they aren't kept in the repo. Save a run before changing anything:
+    python -m pytest benchmarks/suite.py --benchmark-autosave
+then compare against it afterwards, which fails if any case's median got more than 25% slower:
+    python -m pytest benchmarks/suite.py --benchmark-compare --benchmark-compare-fail=median:25%
+"""
+import random
+
+import pytest
+
+import headless
+import helpers
+import hex_math
+import pathfinding
+from benchmarks.terrain_sprites import FakeScroller, StubBatch, StubSprite, layout, sprite_height, sprite_width
+from coverage import Coverage
+from hex_math import Hexagon
+from map_views import FogView, SafeEdgeView
+from pixel_cache import PixelCache
+from sprite_cache import SpritePool, SpriteReconciler
+from world import Building, Network, Terrain, TerrainChunk
+
+
+class EdgeSprites:
+    """
+    Stands in for sprite_composite.EdgeComposites, which needs the images loaded.
+    """
+    images = {f"safe {mask}": f"safe {mask}" for mask in range(64)}
+
+    @staticmethod
+    def sprite_id(style, mask):
+        return f"{style} {mask}"
+
+
+def reconciler(images, opacity=255):
+    return SpriteReconciler(StubBatch(), SpritePool(images, StubSprite), (sprite_width / 2, sprite_height / 2), opacity)
+
+
+def visible_hexes():
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    tracker.update(FakeScroller())
+    return tracker.hexes
+
+
+def test_chunk_generation(benchmark):
+    """
+    Generating the terrain for 16 chunks of 31x31 hexes.
+    """
+    terrain = Terrain(31, 42)
+    # Next to each other, the way Terrain.chunk_get_next tiles them.
+    anchors = []
+    for i in range(4):
+        for j in range(4):
+            r = j * 32
+            q = i * 31 - r // 2
+            anchors.append(Hexagon(q, r, -q - r))
+
+    def run():
+        for anchor in anchors:
+            TerrainChunk(anchor, 31, terrain.terrain_noise)
+    benchmark(run)
+
+
+def test_visibility(benchmark):
+    """
+    500 units with 3 hex vision each taking a step.
+    """
+    rng = random.Random(1)
+    vision = Coverage()
+    positions = []
+    for _ in range(500):
+        q, r = rng.randint(-100, 100), rng.randint(-50, 50)
+        positions.append(Hexagon(q, r, -q - r))
+    for i, p in enumerate(positions):
+        vision.add(i, p, 3)
+    steps = [rng.randrange(6) for _ in positions]
+
+    def run():
+        for i, p in enumerate(positions):
+            # Back and forth, so every run does the same moves.
+            positions[i] = p = hex_math.hex_neighbor(p, steps[i])
+            steps[i] = (steps[i] + 3) % 6
+            vision.move(i, p)
+    benchmark(run)
+
+
+def test_pathfinding(benchmark):
+    """
+    50 A* paths across a 60 hex radius map with a quarter of it blocked.
+    """
+    rng = random.Random(2)
+    hexes = hex_math.get_hex_chunk(Hexagon(0, 0, 0), 60)
+    # Off the map counts as blocked too, so nothing wanders off forever.
+    open_keys = {hex_math.hex_key(h) for h in hexes if rng.random() >= 0.25}
+    trips = []
+    while len(trips) < 50:
+        start, end = rng.sample(hexes, 2)
+        if hex_math.hex_key(start) in open_keys and hex_math.hex_key(end) in open_keys:
+            trips.append((start, end))
+
+    def run():
+        for start, end in trips:
+            pathfinding.find_path(start, end, open_keys.__contains__)
+    benchmark(run)
+
+
+def test_flow_field(benchmark):
+    """
+    An enemy flow field out to 60 hexes being moved between two sets of targets.
+    """
+    targets = ([hex_math.hex_key(Hexagon(q, 0, -q)) for q in range(0, 20, 4)], [hex_math.hex_key(Hexagon(0, r, -r)) for r in range(0, 20, 4)])
+    field = pathfinding.FlowField(max_distance=60)
+    flip = [0]
+
+    def run():
+        flip[0] ^= 1
+        field.set_sources(targets[flip[0]])
+    benchmark(run)
+
+
+def test_network_power(benchmark):
+    """
+    Cutting and mending a 5,000 node network line halfway along, with towers past the cut.
+    """
+    # No terrain generated out there, the towers only need to be in the buildings index.
+    terrain = Terrain(11, 42)
+    network = Network(terrain)
+    for q in range(1, 5000):
+        network.add_node(Hexagon(q, 0, -q), "energy", False)
+    for q in range(2600, 5000, 200):
+        terrain.buildings[Hexagon(q, -1, 1 - q)] = Building(3)
+        network.add_node(Hexagon(q, -1, 1 - q), "energy", False)
+    cut = Hexagon(2500, 0, -2500)
+
+    def run():
+        network.remove_node(cut)
+        network.add_node(cut, "energy", False)
+    benchmark(run)
+
+
+@pytest.fixture
+def game():
+    return headless.new_game(42, 11, 40)
+
+
+def test_fog_update(benchmark, game):
+    """
+    20 ticks of a headless game with 200 units walking around, with FogView redrawing from each tick's diff the way FogLayer does.
+    """
+    view = FogView(reconciler({"fog": "fog"}, 223), game.terrain.hexagon_map, game.terrain.vision, PixelCache(layout, game.terrain.chunk_size), visible_hexes())
+    game.listeners.append(lambda diff: view.draw(diff.seen | diff.fogged))
+    view.draw()
+    rng = random.Random(3)
+    headless.add_units(game, 200, rng)
+    benchmark(headless.soak, game, 20, rng)
+
+
+def test_overlay_update(benchmark, game):
+    """
+    A protection tower near the core powering on and off, with SafeEdgeView redrawing the edges the way OverlayLayer does.
+    """
+    terrain = game.terrain
+    view = SafeEdgeView(reconciler(EdgeSprites.images), terrain.hexagon_map, terrain.safety, EdgeSprites, PixelCache(layout, terrain.chunk_size),
+                        visible_hexes())
+    game.listeners.append(lambda diff: view.draw(terrain.safety.border(diff.safe | diff.unsafe)))
+    view.draw()
+    for q in range(1, 12):
+        game.plop_network(Hexagon(q, 0, -q))
+    game.plop_building(Hexagon(12, -1, -11), Building(3))
+    game.publish()
+    cut = Hexagon(6, 0, -6)
+
+    def run():
+        game.remove_network(cut)
+        game.publish()
+        game.plop_network(cut)
+        game.publish()
+    benchmark(run)
+
+
+def test_simulation_tick(benchmark, game):
+    """
+    100 ticks of a headless game with 300 units being sent around.
+    """
+    rng = random.Random(4)
+    headless.add_units(game, 300, rng)
+    benchmark(headless.soak, game, 100, rng)
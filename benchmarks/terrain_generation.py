@@ -0,0 +1,37 @@
+"""
+Chunks per second for the batched and scalar terrain generation.
+Run from the repo root with: python -m benchmarks.terrain_generation
+"""
+from opensimplex import OpenSimplex
+
+import terrain_generation
+from benchmarks.timing import best_of
+from hex_math import Hexagon
+
+chunk_sizes = (11, 31, 63)
+anchors = [Hexagon(0, 0, 0), Hexagon(16, -32, 16), Hexagon(-31, 0, 31), Hexagon(1000, -2000, 1000)]
+
+
+def check_matches_scalar(noise, chunk_size):
+    """
+    The batched path has to give the same terrain as the scalar one, or it isn't the same map.
+    """
+    for anchor in anchors:
+        q, r, terrain_types = terrain_generation.chunk_terrain(anchor, chunk_size, noise)
+        batched = {Hexagon(a, b, -a - b): str(t) for a, b, t in zip(q.tolist(), r.tolist(), terrain_types.tolist())}
+        scalar = terrain_generation.chunk_terrain_scalar(anchor, chunk_size, noise)
+        assert list(batched.items()) == list(scalar.items()), f"Terrain mismatch for chunk at {anchor}, size {chunk_size}."
+
+
+def main():
+    noise = OpenSimplex(seed=42)
+    print(f"{'size':>5} {'scalar chunks/s':>16} {'batched chunks/s':>17} {'speedup':>8}")
+    for chunk_size in chunk_sizes:
+        check_matches_scalar(noise, chunk_size)
+        scalar = best_of(lambda: terrain_generation.chunk_terrain_scalar(anchors[0], chunk_size, noise), repeat=3)
+        batched = best_of(lambda: terrain_generation.chunk_terrain(anchors[0], chunk_size, noise), repeat=3)
+        print(f"{chunk_size:>5} {1 / scalar:>16.1f} {1 / batched:>17.1f} {scalar / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
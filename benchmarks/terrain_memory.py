@@ -0,0 +1,81 @@
+"""
+Memory per hex for the terrain, with a TerrainCell object per hex (the old way) and with terrain_store.
+Run from the repo root with: python -m benchmarks.terrain_memory
+"""
+import tracemalloc
+
+import numpy as np
+
+import terrain_generation
+import terrain_store
+from hex_math import Hexagon
+
+chunk_size = 31
+chunk_counts = (16, 64, 256)
+
+
+class LegacyTerrainCell:
+    """
+    What every hex used to be.
+    """
+    def __init__(self, terrain_type=0, sprite_id=None, building=None):
+        self.terrain_type = terrain_type
+        self.sprite_id = sprite_id
+        self.building = building
+        self.safe = 0
+        self.visible = 0
+
+
+def anchors(count):
+    side = int(np.ceil(np.sqrt(count)))
+    for n in range(count):
+        i, j = divmod(n, side)
+        r = j * (chunk_size + 1)
+        q = i * chunk_size - r // 2
+        yield Hexagon(q, r, -q - r)
+
+
+def build_legacy(count, terrain_types):
+    chunk_list = {}
+    hexagon_map = {}
+    for anchor in anchors(count):
+        q, r = terrain_generation.chunk_coordinates(anchor, chunk_size)
+        cells = {}
+        for qq, rr, t in zip(q.tolist(), r.tolist(), terrain_types.tolist()):
+            cells[Hexagon(qq, rr, -qq - rr)] = LegacyTerrainCell(str(t), str(t))
+        chunk_list[anchor] = [k for k in cells.keys()]
+        hexagon_map.update(cells)
+    return chunk_list, hexagon_map
+
+
+def build_store(count, terrain_types):
+    store = terrain_store.TerrainStore(chunk_size, {})
+    for anchor in anchors(count):
+        store.add_chunk(anchor, terrain_store.new_cells(terrain_types))
+    return store
+
+
+def bytes_per_hex(build, count, terrain_types):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    terrain = build(count, terrain_types)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    hexes = count * len(terrain_types)
+    del terrain
+    return (after - before) / hexes
+
+
+def main():
+    # The terrain itself doesn't change the memory use, so skip the noise.
+    rng = np.random.default_rng(42)
+    terrain_types = rng.integers(0, 14, size=len(terrain_generation.chunk_coordinates(Hexagon(0, 0, 0), chunk_size)[0]))
+    print(f"{'chunks':>7} {'hexes':>9} {'legacy bytes/hex':>17} {'store bytes/hex':>16}")
+    for count in chunk_counts:
+        legacy = bytes_per_hex(build_legacy, count, terrain_types)
+        store = bytes_per_hex(build_store, count, terrain_types)
+        print(f"{count:>7} {count * len(terrain_types):>9} {legacy:>17.1f} {store:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
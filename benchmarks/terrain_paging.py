@@ -0,0 +1,107 @@
+"""
+A long scroll across the map and back, with a scout's vision following the view and buildings and safe areas dropped along the way, on a terrain with a small memory limit.
+Plays it with chunks paged out to disk, and with them thrown away and regenerated with only their changes kept (settings.terrain_delta_overlay).
+Plays the same session on a terrain with no limit too, for comparison. tests/test_terrain_paging.py checks every chunk comes back the same.
+Then times the page file on its own, writing and reading back a few thousand chunks.
+Run from the repo root with: python -m benchmarks.terrain_paging
+"""
+import time
+
+import numpy as np
+
+from hex_math import Hexagon
+from terrain_store import PageFile, new_cells
+from world import Building, Terrain
+
+seed = 42
+chunk_size = 11
+# A view this many chunks across and down, moving a chunk every frame.
+view_columns = 5
+view_rows = 5
+frames = 150
+max_resident_mb = 0.2
+page_file_chunks = 5000
+
+
+def anchor(i, j):
+    r = j * (chunk_size + 1)
+    q = i * chunk_size - r // 2
+    return Hexagon(q, r, -q - r)
+
+
+def view(column):
+    return {anchor(i, j) for i in range(column - view_columns // 2, column + view_columns // 2 + 1) for j in range(-(view_rows // 2), view_rows // 2 + 1)}
+
+
+def play(limit, delta=False):
+    """
+    Scrolls right for frames chunks and back again.
+    Args:
+        limit (float): most MB of chunks in memory, None for no limit.
+        delta (bool): if True, regenerate chunks instead of paging them out.
+    Returns:
+        Tuple of (the terrain, seconds per frame).
+    """
+    terrain = Terrain(chunk_size, seed)
+    terrain.hexagon_map.max_resident_mb = limit
+    if not delta:
+        terrain.hexagon_map.generator = None
+    path = list(range(frames)) + list(range(frames, -1, -1))
+    start = time.perf_counter()
+    for n, column in enumerate(path):
+        chunks = view(column)
+        terrain.hexagon_map.touch(chunks)
+        for c in sorted(chunks):
+            terrain.generate_chunk(c)
+        center = anchor(column, 0)
+        if n == 0:
+            terrain.add_vision("scout", center, 9)
+        else:
+            terrain.move_vision("scout", center)
+        # Leave something behind every few chunks on the way out, and take some of it away on the way back.
+        if n < frames and n % 4 == 0:
+            site = Hexagon(center.q + 2, center.r + 3, -center.q - center.r - 5)
+            terrain.add_building(site, Building(3))
+            terrain.add_safe_area(("tower", site), site, 3)
+        elif n > frames and column % 8 == 0:
+            site = Hexagon(center.q + 2, center.r + 3, -center.q - center.r - 5)
+            if site in terrain.buildings:
+                terrain.remove_building(site)
+                terrain.remove_safe_area(("tower", site))
+    return terrain, (time.perf_counter() - start) / len(path)
+
+
+def page_file_speed(record_length):
+    """
+    Returns:
+        Tuple of (seconds per chunk written, seconds per chunk read back), through a PageFile with nothing else going on.
+    """
+    page_file = PageFile(record_length)
+    cells = new_cells(np.arange(record_length, dtype=np.uint8) % 14)
+    anchors = [Hexagon(n, 0, -n) for n in range(page_file_chunks)]
+    start = time.perf_counter()
+    for a in anchors:
+        page_file.write(a, cells)
+    write = (time.perf_counter() - start) / page_file_chunks
+    start = time.perf_counter()
+    for a in anchors:
+        page_file.read(a)
+    return write, (time.perf_counter() - start) / page_file_chunks
+
+
+def main():
+    reference, reference_frame = play(None)
+    runs = [("none", reference.hexagon_map.stats(), reference_frame)]
+    for name, delta in (("page file", False), ("delta", True)):
+        terrain, frame = play(max_resident_mb, delta)
+        runs.append((name, terrain.hexagon_map.stats(), frame))
+    print(f"{len(reference.chunk_list)} chunks, {len(reference.buildings)} buildings left, {len(reference.vision.counts)} hexes seen, {len(reference.safety.counts)} safe, limit {max_resident_mb}MB")
+    print(f"{'paging':>10} {'in memory':>10} {'paged out':>10} {'page file':>10} {'deltas':>7} {'page ins':>9} {'page outs':>10} {'per frame':>10}")
+    for name, s, frame in runs:
+        print(f"{name:>10} {s['resident_mb']:>8.2f}MB {s['paged']:>10} {s['page_file_mb']:>8.2f}MB {s['deltas']:>7} {s['page_ins']:>9} {s['page_outs']:>10} {frame * 1000:>8.2f}ms")
+    write, read = page_file_speed(reference.hexagon_map.cells_per_chunk)
+    print(f"Page file on its own, {page_file_chunks} chunks: {write * 1e6:.1f}us per chunk written, {read * 1e6:.1f}us per chunk read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Per frame cost of drawing the terrain while scrolling, with a stubbed batch instead of cocos2d.
+Compares the old draw_terrain, which walked the whole map, against the SpriteReconciler, for growing map sizes.
+Also reports how many sprites the SpritePool had to make, against how many it handed out again.
+Run from the repo root with: python -m benchmarks.terrain_sprites
+"""
+import math
+import time
+
+import helpers
+import hex_math
+from hex_math import Hexagon, Point
+from sprite_cache import SpritePool, SpriteReconciler
+
+sprite_width = 64
+sprite_height = 32
+window = (1920, 1200)
+layout = hex_math.Layout(hex_math.layout_pointy, Point(round(sprite_width / math.sqrt(3)), sprite_height), Point(window[0] // 2, window[1] // 2))
+map_sizes = (10_000, 100_000, 1_000_000)
+frames = 50
+
+
+class StubSprite:
+    def __init__(self, image, position=(0, 0), anchor=(0, 0), opacity=255):
+        self.image = image
+        self.position = position
+        self.image_anchor = anchor
+        self.opacity = opacity
+
+    def stop(self):
+        pass
+
+
+class StubBatch:
+    """
+    Behaves like a cocos2d BatchNode as far as names go: adding a name twice, or removing one that isn't there, raises.
+    """
+    def __init__(self):
+        self.children = {}
+        # Key is the name, value is the z order it was added with.
+        self.z = {}
+
+    def add(self, sprite, z=0, name=None):
+        if name in self.children:
+            raise Exception("Name already exists")
+        self.children[name] = sprite
+        self.z[name] = z
+
+    def remove(self, name):
+        del self.children[name]
+        del self.z[name]
+
+
+class FakeScroller:
+    def __init__(self):
+        self.view_w, self.view_h = window
+        self.fx, self.fy = window[0] // 2, window[1] // 2
+
+
+def make_map(size):
+    """
+    A square-ish map of hexes around the origin, with a sprite id for each.
+    """
+    radius = int(math.sqrt(size / 3))
+    return {h: str((h.q * 7 + h.r * 3) % 14) for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius)}
+
+
+def old_draw_terrain(batch, hexagon_map, visible_hexes):
+    for hexagon, sprite_id in hexagon_map.items():
+        if hexagon not in visible_hexes:
+            try:
+                batch.remove(f"{hexagon.q}_{hexagon.r}_{hexagon.s}")
+            except Exception:
+                pass
+            continue
+        position = hex_math.hex_to_pixel(layout, hexagon, False)
+        sprite = StubSprite(sprite_id, position=position)
+        try:
+            batch.add(sprite, z=-hexagon.r, name=f"{hexagon.q}_{hexagon.r}_{hexagon.s}")
+        except Exception:
+            pass
+
+
+def new_draw_terrain(sprites, hexagon_map, visible_hexes, hexes):
+    for hexagon in hexes:
+        name = f"{hexagon.q}_{hexagon.r}_{hexagon.s}"
+        if hexagon in visible_hexes and hexagon in hexagon_map:
+            sprites.show(name, hexagon_map[hexagon], hex_math.hex_to_pixel(layout, hexagon, False), -hexagon.r)
+        else:
+            sprites.hide(name)
+
+
+def run(size):
+    hexagon_map = make_map(size)
+    images = {str(t): str(t) for t in range(14)}
+
+    scroller = FakeScroller()
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    tracker.update(scroller)
+    batch = StubBatch()
+    start = time.perf_counter()
+    for _ in range(frames):
+        scroller.fx += 32
+        tracker.update(scroller)
+        old_draw_terrain(batch, hexagon_map, tracker.hexes)
+    old = (time.perf_counter() - start) / frames
+    old_count = len(batch.children)
+
+    scroller = FakeScroller()
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    batch = StubBatch()
+    pool = SpritePool(images, StubSprite)
+    sprites = SpriteReconciler(batch, pool, (sprite_width // 2, sprite_height // 2))
+    new_draw_terrain(sprites, hexagon_map, tracker.hexes, tracker.update(scroller)[0])
+    start = time.perf_counter()
+    for _ in range(frames):
+        scroller.fx += 32
+        entering, leaving = tracker.update(scroller)
+        new_draw_terrain(sprites, hexagon_map, tracker.hexes, entering | leaving)
+    new = (time.perf_counter() - start) / frames
+    assert len(batch.children) == old_count == len(tracker.hexes & hexagon_map.keys()), "Different sprites on screen."
+    stats = pool.stats()
+    assert stats["live"] == len(batch.children), "Pool lost track of a sprite."
+    return len(hexagon_map), old, new, stats
+
+
+def main():
+    print(f"{'map hexes':>10} {'old per frame':>14} {'reconciler per frame':>21} {'pool hits':>10} {'pool misses':>12} {'live':>6}")
+    for size in map_sizes:
+        hexes, old, new, stats = run(size)
+        print(f"{hexes:>10} {old * 1000:>12.2f}ms {new * 1000:>19.3f}ms {stats['hits']:>10} {stats['misses']:>12} {stats['live']:>6}")
+
+
+if __name__ == "__main__":
+    main()
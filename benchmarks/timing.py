@@ -0,0 +1,20 @@
+import time
+
+
+def best_of(func, repeat=5, number=1):
+    """
+    Times a function a few times and keeps the best run, which is the least disturbed by everything else on the machine.
+    Args:
+        func (callable): function to time, called with no arguments.
+        repeat (int): how many times to time it.
+        number (int): how many calls per timing.
+    Returns:
+        The best time for a single call, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
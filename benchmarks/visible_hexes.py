@@ -0,0 +1,67 @@
+"""
+Cost of keeping the visible hexes up to date while scrolling, recomputing them with find_visible_hexes against the incremental VisibleHexTracker.
+Run from the repo root with: python -m benchmarks.visible_hexes
+"""
+import math
+import time
+
+import helpers
+import hex_math
+from hex_math import Point
+
+sprite_width = 64
+sprite_height = 32
+resolutions = {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}
+steps = 200
+scroll_inc = 32
+
+
+class FakeScroller:
+    """
+    Just the bits of the ScrollingManager that the viewport helpers look at.
+    """
+    def __init__(self, width, height):
+        self.view_w = width
+        self.view_h = height
+        self.fx = width // 2
+        self.fy = height // 2
+
+
+def scroll(scroller, step):
+    # Mostly sideways, with the odd step up or down.
+    if step % 5 == 0:
+        scroller.fy += scroll_inc if step % 10 == 0 else -scroll_inc
+    else:
+        scroller.fx += scroll_inc
+
+
+def main():
+    print(f"{'view':>6} {'hexes':>7} {'find_visible_hexes':>19} {'tracker':>10} {'changed/step':>13}")
+    for name, (width, height) in resolutions.items():
+        layout = hex_math.Layout(hex_math.layout_pointy, Point(round(sprite_width / math.sqrt(3)), sprite_height), Point(width // 2, height // 2))
+        scroller = FakeScroller(width, height)
+        start = time.perf_counter()
+        for step in range(steps):
+            scroll(scroller, step)
+            helpers.find_visible_hexes(sprite_width, layout, scroller)
+        full = (time.perf_counter() - start) / steps
+
+        scroller = FakeScroller(width, height)
+        tracker = helpers.VisibleHexTracker(layout, sprite_width)
+        tracker.update(scroller)
+        changed = 0
+        start = time.perf_counter()
+        for step in range(steps):
+            scroll(scroller, step)
+            entering, leaving = tracker.update(scroller)
+            changed += len(entering) + len(leaving)
+        incremental = (time.perf_counter() - start) / steps
+
+        rows = helpers.viewport_rows(layout, sprite_width, scroller)
+        expected = {hex_math.Hexagon(q, r, -q - r) for r, (q_min, q_max) in rows.items() for q in range(q_min, q_max + 1)}
+        assert tracker.hexes == expected, "Tracker drifted away from the viewport."
+        print(f"{name:>6} {len(tracker.hexes):>7} {full * 1000:>17.2f}ms {incremental * 1000:>8.2f}ms {changed / steps:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
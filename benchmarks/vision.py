@@ -0,0 +1,69 @@
+"""
+1,000 units moving at once, one hex a step, with vision updated the old way (take the whole disc away, add the whole disc back) and with coverage.Coverage.
+Counts the flips each step reports as well, a hex covered by one move and uncovered by another in the same step counts twice. tests/test_coverage.py checks the counts and flips are right.
+Run from the repo root with: python -m benchmarks.vision
+"""
+import random
+import time
+
+import hex_math
+from coverage import Coverage
+from hex_math import Hexagon
+
+units = 1000
+steps = 50
+spread = 120
+vision_ranges = (3, 5, 9)
+
+
+def old_step(visible, positions, moves, radius):
+    for i, (old, new) in enumerate(zip(positions, moves)):
+        for h in hex_math.get_hex_chunk(old, radius):
+            visible[h] -= 2
+        for h in hex_math.get_hex_chunk(new, radius):
+            visible[h] = visible.get(h, 0) + 2
+
+
+def walk(rng, positions):
+    return [hex_math.hex_neighbor(p, rng.randrange(6)) for p in positions]
+
+
+def run(radius):
+    rng = random.Random(radius)
+    start_positions = [Hexagon(q, r, -q - r) for q, r in ((rng.randint(-spread, spread), rng.randint(-spread, spread)) for _ in range(units))]
+    paths = [start_positions]
+    for _ in range(steps):
+        paths.append(walk(rng, paths[-1]))
+
+    visible = {}
+    for p in start_positions:
+        for h in hex_math.get_hex_chunk(p, radius):
+            visible[h] = visible.get(h, 0) + 2
+    start = time.perf_counter()
+    for before, after in zip(paths, paths[1:]):
+        old_step(visible, before, after, radius)
+    old = (time.perf_counter() - start) / steps
+
+    vision = Coverage()
+    for i, p in enumerate(start_positions):
+        vision.add(i, p, radius)
+    flips = 0
+    elapsed = 0.0
+    for after in paths[1:]:
+        start = time.perf_counter()
+        results = [vision.move(i, p) for i, p in enumerate(after)]
+        elapsed += time.perf_counter() - start
+        flips += sum(len(a) + len(b) for a, b in results)
+    return old, elapsed / steps, flips / steps
+
+
+def main():
+    print(f"{units} units, {steps} steps")
+    print(f"{'vision':>7} {'old per step':>13} {'coverage per step':>18} {'speedup':>8} {'reported flips':>15}")
+    for radius in vision_ranges:
+        old, new, flips = run(radius)
+        print(f"{radius:>7} {old * 1000:>11.1f}ms {new * 1000:>16.1f}ms {old / new:>7.1f}x {flips:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from collections import deque
+
+from hex_math import key_directions
+
+
+class Connectivity:
+    """
+    Keeps track of which hexes in a set are connected to each other, and to a root hex, as hexes are added and removed.
+    Every connected group of hexes has an id. Adding a hex merges the groups around it, relabelling the smaller ones.
+    Removing a hex searches out from its neighbours at the same time, so only the pieces that split off get looked at, not the whole network.
+    Works on hex keys, see hex_math.hex_key.
+    """
+    def __init__(self, root):
+        """
+        Args:
+            root (int): hex key of the root, e.g. the city core. Everything connected to it is powered.
+        """
+        self.root = root
+        # Key is a hex key, value is the id of its group.
+        self.component = {}
+        # Key is a group id, value is the set of hex keys in it.
+        self.members = {}
+        self._next_id = 0
+        self.add(root)
+
+    def _new_component(self, keys):
+        component_id = self._next_id
+        self._next_id += 1
+        self.members[component_id] = keys
+        for key in keys:
+            self.component[key] = component_id
+        return component_id
+
+    def powered(self, key):
+        """
+        Returns:
+            True if the hex is connected to the root.
+        """
+        return self.component.get(key) == self.component[self.root]
+
+    def touches_root(self, keys):
+        """
+        Returns:
+            True if any of the given hex keys are connected to the root.
+        """
+        root_component = self.component[self.root]
+        return any(self.component.get(key) == root_component for key in keys)
+
+    def add(self, key):
+        """
+        Adds a hex, joining up whatever groups it touches.
+        Args:
+            key (int): hex key to add.
+        Returns:
+            Dictionary of the hexes whose powered state changed, including the new one, where the value is the new state.
+        """
+        if key in self.component:
+            return {}
+        neighbour_components = {self.component[key + d] for d in key_directions if key + d in self.component}
+        if not neighbour_components:
+            self._new_component({key})
+            return {key: key == self.root}
+        root_component = self.component.get(self.root)
+        # Keep the biggest group's id, so we relabel as little as possible.
+        keep = max(neighbour_components, key=lambda c: len(self.members[c]))
+        kept = self.members[keep]
+        powered = root_component in neighbour_components
+        changed = {}
+        if powered and keep != root_component:
+            changed.update(dict.fromkeys(kept, True))
+        for c in neighbour_components - {keep}:
+            keys = self.members.pop(c)
+            if powered and c != root_component:
+                changed.update(dict.fromkeys(keys, True))
+            for k in keys:
+                self.component[k] = keep
+            kept |= keys
+        kept.add(key)
+        self.component[key] = keep
+        changed[key] = powered
+        return changed
+
+    def remove(self, key):
+        """
+        Removes a hex, splitting its group up if that disconnects it.
+        Args:
+            key (int): hex key to remove.
+        Returns:
+            Dictionary of the hexes whose powered state changed, where the value is the new state. The removed hex isn't included.
+        Raises:
+            ValueError if we try and remove the root.
+        """
+        if key == self.root:
+            raise ValueError("Can't remove the root.")
+        component_id = self.component.pop(key, None)
+        if component_id is None:
+            return {}
+        was_powered = component_id == self.component[self.root]
+        members = self.members[component_id]
+        members.discard(key)
+        if not members:
+            del self.members[component_id]
+            return {}
+        pieces = self._split(key, component_id)
+        changed = {}
+        for piece in pieces:
+            members -= piece
+            new_id = self._new_component(piece)
+            if was_powered and self.component[self.root] != new_id:
+                changed.update(dict.fromkeys(piece, False))
+        if was_powered and self.component[self.root] != component_id and members:
+            # The root split off on its own, everything left behind lost power.
+            changed.update(dict.fromkeys(members, False))
+        return changed
+
+    def _split(self, key, component_id):
+        """
+        Searches out from the removed hex's neighbours, one step from each in turn. Searches that run into each other are joined.
+        As soon as only one search is still going, everything else it hasn't met is a separate piece, and it must be the rest of the group.
+        Returns:
+            List of sets, one per piece that split off. The rest of the group is left as it was.
+        """
+        starts = [key + d for d in key_directions if self.component.get(key + d) == component_id]
+        if len(starts) <= 1:
+            return []
+        # Each search has the hexes it has seen and the ones it still has to look at. Joined searches point at the one they joined.
+        seen = [{s} for s in starts]
+        frontier = [deque([s]) for s in starts]
+        joined = list(range(len(starts)))
+        owner = {s: i for i, s in enumerate(starts)}
+        active = set(range(len(starts)))
+
+        def find(i):
+            while joined[i] != i:
+                joined[i] = joined[joined[i]]
+                i = joined[i]
+            return i
+
+        def join(a, b):
+            # Keep the search that has seen more, so we copy as little as possible.
+            if len(seen[b]) > len(seen[a]):
+                a, b = b, a
+            joined[b] = a
+            seen[a] |= seen[b]
+            frontier[a].extend(frontier[b])
+            seen[b] = frontier[b] = None
+            active.discard(b)
+            return a
+
+        # Neighbours next to each other are already connected.
+        for i, s in enumerate(starts):
+            for d in key_directions:
+                j = owner.get(s + d)
+                if j is not None and find(i) != find(j):
+                    join(find(i), find(j))
+
+        finished = []
+        component = self.component
+        while len(active) > 1:
+            for i in list(active):
+                if len(active) <= 1:
+                    break
+                if i not in active:
+                    continue
+                if not frontier[i]:
+                    active.discard(i)
+                    finished.append(seen[i])
+                    continue
+                current = frontier[i].popleft()
+                for d in key_directions:
+                    n = current + d
+                    if component.get(n) != component_id:
+                        continue
+                    j = owner.get(n)
+                    if j is None:
+                        owner[n] = i
+                        seen[i].add(n)
+                        frontier[i].append(n)
+                        continue
+                    j = find(j)
+                    if j != i:
+                        # Ran into another search, so they're the same piece.
+                        i = join(i, j)
+        return finished
+
+    def __contains__(self, key):
+        return key in self.component
+
+    def __len__(self):
+        return len(self.component)
@@ -0,0 +1,192 @@
+import hex_math
+from hex_keys import HexKeyDict
+
+
+class Coverage:
+    """
+    Counts how many sources cover each hex, where a source covers a disc around its center. Used for vision and safe areas.
+    Every change returns exactly which hexes went from uncovered to covered and back, so whatever draws them only has to touch those.
+    Moving a source only changes the counts where the old and new discs differ.
+    The counts are kept by hex key, and the discs are worked out as key offsets, so nothing in here makes a Hexagon except for the hexes that flip.
+    """
+    def __init__(self):
+        # Key is a hexagon, value is how many sources cover it. Uncovered hexes aren't kept.
+        self.counts = HexKeyDict()
+        # Key is whatever identifies the source, value is a tuple of (center, radius).
+        self.sources = {}
+
+    def covered(self, h):
+        return hex_math.hex_key(h) in self.counts.data
+
+    def covered_keys(self, keys):
+        """
+        Args:
+            keys (iterable): hex keys to check.
+        Returns:
+            List of whether each one is covered, in the same order.
+        """
+        counts = self.counts.data
+        return [k in counts for k in keys]
+
+    def edge_mask(self, h):
+        """
+        Which sides of a covered hex are on the edge of the covered area, for drawing its border.
+        Args:
+            h (Hexagon): hex to check.
+        Returns:
+            Int from 0 to 63, bit n set when neighbour n in hex_math.hex_directions isn't covered. 0 if the hex isn't covered itself.
+        """
+        counts = self.counts.data
+        key = hex_math.hex_key(h)
+        if key not in counts:
+            return 0
+        mask = 0
+        for idx, d in enumerate(hex_math.key_directions):
+            if key + d not in counts:
+                mask |= 1 << idx
+        return mask
+
+    @staticmethod
+    def border(hexes):
+        """
+        The hexes whose edge masks can change when the given hexes flip, which is them and their neighbours.
+        Args:
+            hexes (iterable): hexes that became covered or uncovered.
+        Returns:
+            Set of hexagons.
+        """
+        touched = set(hexes)
+        for h in list(touched):
+            for d in hex_math.hex_directions:
+                touched.add(hex_math.Hexagon(h.q + d.q, h.r + d.r, h.s + d.s))
+        return touched
+
+    def _increment(self, keys):
+        """
+        Returns:
+            Set of the hexagons that became covered.
+        """
+        counts = self.counts.data
+        on = []
+        for k in keys:
+            c = counts.get(k, 0)
+            if c == 0:
+                on.append(k)
+            counts[k] = c + 1
+        return set(map(hex_math.key_to_hex, on))
+
+    def _decrement(self, keys):
+        """
+        Returns:
+            Set of the hexagons that became uncovered.
+        """
+        counts = self.counts.data
+        off = []
+        for k in keys:
+            c = counts[k] - 1
+            if c == 0:
+                del counts[k]
+                off.append(k)
+            else:
+                counts[k] = c
+        return set(map(hex_math.key_to_hex, off))
+
+    # Key is the radius, value is the list of key offsets from the center to every hex in the disc.
+    _discs = {}
+
+    @classmethod
+    def _disc(cls, center, radius):
+        try:
+            offsets = cls._discs[radius]
+        except KeyError:
+            offsets = cls._discs[radius] = [hex_math.hex_key(h) for h in hex_math.get_hex_chunk(hex_math.Hexagon(0, 0, 0), radius)]
+        c = hex_math.hex_key(center)
+        return [c + d for d in offsets]
+
+    # Key is (radius, dq, dr) of the step from one center to the other, value is the list of key offsets in the first disc and not the second.
+    # Units mostly move one hex at a time, so there are only a handful of these and working them out again every move was most of the cost.
+    _offsets = {}
+
+    @classmethod
+    def _disc_minus_offsets(cls, radius, dq, dr):
+        key = (radius, dq, dr)
+        try:
+            return cls._offsets[key]
+        except KeyError:
+            pass
+        offsets = []
+        steps = (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+        # Those can only be in the outer steps rings, so only they get looked at.
+        origin = hex_math.Hexagon(0, 0, 0)
+        for k in range(max(0, radius - steps + 1), radius + 1):
+            for h in hex_math.get_hex_ring(origin, k):
+                q = h.q - dq
+                r = h.r - dr
+                if abs(q) + abs(r) + abs(q + r) > 2 * radius:
+                    offsets += [hex_math.hex_key(h)]
+        # Far apart moves, e.g. a unit being put somewhere new, would fill this up with ones that never come again.
+        if steps <= 2:
+            cls._offsets[key] = offsets
+        return offsets
+
+    @classmethod
+    def _disc_minus(cls, center, other, radius, steps):
+        """
+        The keys of the hexes within radius of center that aren't within radius of other, when other is steps away from center.
+        """
+        if steps > 2 * radius:
+            return cls._disc(center, radius)
+        c = hex_math.hex_key(center)
+        return [c + d for d in cls._disc_minus_offsets(radius, other.q - center.q, other.r - center.r)]
+
+    def add(self, source, center, radius):
+        """
+        Adds a source.
+        Args:
+            source: anything hashable that identifies the source, e.g. the unit.
+            center (Hexagon): center of the source's disc.
+            radius (int): radius of the source's disc.
+        Returns:
+            Tuple of sets of hexagons, (became covered, became uncovered).
+        Raises:
+            KeyError if the source already exists.
+        """
+        if source in self.sources:
+            raise KeyError(f"Source {source} already exists.")
+        self.sources[source] = (center, radius)
+        return self._increment(self._disc(center, radius)), set()
+
+    def remove(self, source):
+        """
+        Removes a source.
+        Args:
+            source: the source to remove.
+        Returns:
+            Tuple of sets of hexagons, (became covered, became uncovered).
+        """
+        center, radius = self.sources.pop(source)
+        return set(), self._decrement(self._disc(center, radius))
+
+    def move(self, source, center):
+        """
+        Moves a source, only changing the counts for the hexes that are in one disc and not the other.
+        Args:
+            source: the source to move.
+            center (Hexagon): new center of the source's disc.
+        Returns:
+            Tuple of sets of hexagons, (became covered, became uncovered).
+        """
+        old, radius = self.sources[source]
+        self.sources[source] = (center, radius)
+        steps = hex_math.hex_distance(old, center)
+        if steps == 0:
+            return set(), set()
+        on = self._increment(self._disc_minus(center, old, radius, steps))
+        off = self._decrement(self._disc_minus(old, center, radius, steps))
+        return on, off
+
+    def __contains__(self, source):
+        return source in self.sources
+
+    def __len__(self):
+        return len(self.sources)
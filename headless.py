@@ -0,0 +1,113 @@
+"""
+Runs the game without a window, so it can be profiled, benchmarked and soak tested on a machine with no display.
+Nothing in here imports cocos2d or pyglet, the same as world and simulation.
+Run from the repo root with: python headless.py --ticks 10000 --units 200
+Add --profile to get the slowest functions from cProfile at the end.
+"""
+import argparse
+import cProfile
+import pstats
+import random
+import time
+
+import hex_math
+from hex_math import Hexagon
+from simulation import Simulation
+from world import Terrain
+
+
+def new_game(random_seed=42, chunk_size=11, map_radius=0):
+    """
+    Sets up a new game the same way cocos2d.py does, the terrain with the friendly core in the middle and the simulation on top of it.
+    Args:
+        random_seed (int): seed for the terrain noise, and so for the simulation too.
+        chunk_size (int): size of the terrain chunks.
+        map_radius (int): chunks covering this many hexes around the core get generated straight away. The window fills in the rest as it scrolls.
+    Returns:
+        The Simulation. Its terrain, network, units and enemies are all set up.
+    """
+    terrain = Terrain(chunk_size, random_seed)
+    anchors = {terrain.find_chunk_parent(h) for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), map_radius)}
+    for anchor in sorted(anchors):
+        terrain.generate_chunk(anchor)
+    terrain.city_cores[Hexagon(0, 0, 0)] = "friendly"
+    return Simulation(terrain)
+
+
+def free_hex(rng, simulation):
+    """
+    A random hex near the core with no unit or building on it. The more units there are, the further out it looks.
+    """
+    spread = max(5, int((len(simulation.units) / 3) ** 0.5) * 2)
+    while True:
+        q = rng.randint(-spread, spread)
+        r = rng.randint(-spread, spread)
+        h = Hexagon(q, r, -q - r)
+        if h not in simulation.units and h not in simulation.terrain.buildings:
+            return h
+
+
+def add_units(simulation, units, rng):
+    """
+    Adds units on free hexes around the core.
+    Args:
+        simulation (Simulation): game to add them to.
+        units (int): how many units to add.
+        rng (random.Random): where they go.
+    """
+    for _ in range(units):
+        simulation.add_unit(free_hex(rng, simulation), 1)
+    simulation.publish()
+
+
+def soak(simulation, ticks, rng, orders_every=20):
+    """
+    Ticks the simulation as fast as it'll go, sending a tenth of the units somewhere new every so often.
+    Args:
+        simulation (Simulation): game to run.
+        ticks (int): how many ticks to run.
+        rng (random.Random): where the units get sent.
+        orders_every (int): ticks between sending units somewhere new.
+    Returns:
+        Tuple of (seconds spent ticking, number of non-empty diffs published).
+    """
+    published = 0
+    start = time.perf_counter()
+    for n in range(ticks):
+        if simulation.units and n % orders_every == 0:
+            for start_cell in rng.sample(sorted(simulation.units.keys()), max(1, len(simulation.units) // 10)):
+                simulation.move_unit(start_cell, free_hex(rng, simulation))
+        simulation.tick()
+        if simulation.publish():
+            published += 1
+    return time.perf_counter() - start, published
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the game headless.")
+    parser.add_argument("--ticks", type=int, default=4000, help="how many simulation ticks to run")
+    parser.add_argument("--units", type=int, default=100, help="how many units to send around")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the terrain, the simulation and the orders")
+    parser.add_argument("--radius", type=int, default=40, help="radius of the map to generate up front, in hexes")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and print the slowest functions")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    simulation = new_game(args.seed, map_radius=args.radius)
+    print(f"{len(simulation.terrain)} hexes generated in {time.perf_counter() - start:.2f}s")
+    rng = random.Random(args.seed)
+    add_units(simulation, args.units, rng)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    elapsed, published = soak(simulation, args.ticks, rng)
+    if profiler:
+        profiler.disable()
+    print(f"{args.ticks} ticks in {elapsed:.2f}s, {args.ticks / elapsed:.0f} ticks per second, {published} diffs published")
+    print(f"{len(simulation.units)} units, {len(simulation.enemies)} enemies, {len(simulation.network)} network nodes, enemy level {simulation.enemy_level}")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
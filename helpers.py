@@ -63,11 +63,76 @@ def find_visible_hexes(sprite_width, layout, scroller, safe=True):
     Returns:
         Set of all of the hexes visible in the current viewport.
     """
-    corners = get_current_viewport_hexes(layout, sprite_width, scroller, safe)
-    top_line = hex_math.hex_linedraw(corners["top_left"], corners["top_right"])
-    bottom_line = hex_math.hex_linedraw(corners["bottom_left"], corners["bottom_right"])
-    visible = []
-    for x in zip(top_line, bottom_line):
-        visible += hex_math.hex_linedraw(*x)
-    #  Use a set to make sure we don't have any duplicates.
-    return {x for x in visible}
+    rows = viewport_rows(layout, sprite_width, scroller, safe)
+    return {h for major, (minor_min, minor_max) in rows.items() for h in hex_math.range_hexes(layout, major, minor_min, minor_max)}
+
+
+def viewport_rows(layout, sprite_width, scroller, safe=True):
+    """
+    Finds the hexes in the current viewport a line at a time, see hex_math.rectangle_hex_ranges.
+    Args:
+        safe (bool): if true, add a safety margin to the edges of the viewport.
+    Returns:
+        Dictionary with the key being the r of a row (or q of a column for flat layouts), and the value being a tuple of the first and last hex in it.
+    """
+    corners = get_current_viewport(layout, sprite_width, scroller, safe)
+    x_min, y_min = corners["bottom_left"]
+    x_max, y_max = corners["top_right"]
+    return {major: (minor_min, minor_max) for major, minor_min, minor_max in hex_math.rectangle_hex_ranges(layout, x_min, y_min, x_max, y_max)}
+
+
+def _row_difference(layout, major, row, other):
+    """
+    The hexes in one row range that aren't in another.
+    Args:
+        layout (Layout): the layout, which decides which way the rows run.
+        major (int): r of the row, or q of the column for flat layouts.
+        row (tuple): (first, last) of the row, or None if the row is empty.
+        other (tuple): (first, last) to take away, or None.
+    Returns:
+        List of hexagons.
+    """
+    if row is None:
+        return []
+    first, last = row
+    if other is None or other[1] < first or other[0] > last:
+        return hex_math.range_hexes(layout, major, first, last)
+    return hex_math.range_hexes(layout, major, first, min(last, other[0] - 1)) + hex_math.range_hexes(layout, major, max(first, other[1] + 1), last)
+
+
+class VisibleHexTracker:
+    """
+    Keeps the set of visible hexes up to date as the view scrolls.
+    A scroll only moves a thin strip of hexes in or out of view, so only those get touched.
+    """
+    def __init__(self, layout, sprite_width, safe=True):
+        self.layout = layout
+        self.sprite_width = sprite_width
+        self.safe = safe
+        # Same format as viewport_rows.
+        self.rows = {}
+        # All of the visible hexes. This is updated in place, so it's fine to hang on to it.
+        self.hexes = set()
+
+    def update(self, scroller):
+        """
+        Updates the visible hexes for the scroller's current position.
+        Args:
+            scroller (ScrollingManager): cocos2d scrolling manager.
+        Returns:
+            Tuple of two sets, the hexes that came into view and the hexes that left it.
+        """
+        rows = viewport_rows(self.layout, self.sprite_width, scroller, self.safe)
+        entering = set()
+        leaving = set()
+        for r in self.rows.keys() | rows.keys():
+            old = self.rows.get(r)
+            new = rows.get(r)
+            if old == new:
+                continue
+            entering.update(_row_difference(self.layout, r, new, old))
+            leaving.update(_row_difference(self.layout, r, old, new))
+        self.rows = rows
+        self.hexes -= leaving
+        self.hexes |= entering
+        return entering, leaving
@@ -0,0 +1,53 @@
+from collections.abc import MutableMapping
+
+from hex_math import key_stride, key_to_hex
+
+
+class HexKeyDict(MutableMapping):
+    """
+    A dictionary keyed by Hexagon that stores its keys packed into ints, see hex_math.hex_key.
+    One small int per hex instead of a namedtuple of three, so big maps take a fraction of the memory, and hashing is quicker too.
+    Everything that takes or hands back Hexagons works the same as a plain dictionary. Hot loops that already have hex keys can skip the packing and unpacking and use .data directly.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, items=None):
+        """
+        Args:
+            items: mapping or iterable of (Hexagon, value) pairs to start with.
+        """
+        # Key is the hex key, value is whatever was stored.
+        self.data = {}
+        if items is not None:
+            self.update(items)
+
+    # hex_math.hex_key inlined, these get called a lot.
+    def __getitem__(self, h):
+        try:
+            return self.data[h.q * key_stride + h.r]
+        except KeyError:
+            raise KeyError(h) from None
+
+    def __setitem__(self, h, value):
+        self.data[h.q * key_stride + h.r] = value
+
+    def __delitem__(self, h):
+        try:
+            del self.data[h.q * key_stride + h.r]
+        except KeyError:
+            raise KeyError(h) from None
+
+    def __contains__(self, h):
+        return h.q * key_stride + h.r in self.data
+
+    def get(self, h, default=None):
+        return self.data.get(h.q * key_stride + h.r, default)
+
+    def __iter__(self):
+        return map(key_to_hex, self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"HexKeyDict({dict(self.items())})"
@@ -40,7 +40,9 @@ def hex_direction(direction):
 
 
 def hex_neighbor(hex, direction):
-    return hex_add(hex, hex_direction(direction))
+    # Straight to the namedtuple, the neighbour of a valid hex is always valid so hexagon()'s check isn't needed.
+    d = hex_directions[direction]
+    return Hexagon(hex.q + d.q, hex.r + d.r, hex.s + d.s)
 
 
 hex_diagonals = [hexagon(2, -1, -1), hexagon(1, -2, 1), hexagon(-1, -1, 2), hexagon(-2, 1, 1), hexagon(-1, 2, -1), hexagon(1, 1, -2)]
@@ -58,6 +60,36 @@ def hex_distance(a, b):
     return hex_length(hex_subtract(a, b))
 
 
+# Hexes packed into a single int, q * key_stride + r, so hot loops can hash and step between hexes without making namedtuples.
+# key_coordinates only gets r back for r in [-2 ** 20, 2 ** 20), and with q in that range too a key fits in 42 bits. Adding keys adds the hexes, e.g. key + key_directions[n] is neighbour n.
+# See hex_keys.HexKeyDict for a dictionary that stores these but takes Hexagons.
+key_stride = 1 << 21
+_key_half = key_stride // 2
+
+
+def hex_key(h):
+    return h.q * key_stride + h.r
+
+
+def key_coordinates(key):
+    """
+    Unpacks a hex key.
+    Returns:
+        Tuple of (q, r).
+    """
+    q = (key + _key_half) // key_stride
+    return q, key - q * key_stride
+
+
+def key_to_hex(key):
+    q, r = key_coordinates(key)
+    return Hexagon(q, r, -q - r)
+
+
+# What to add to a hex key to get the key of each neighbour, in hex_directions order.
+key_directions = [d.q * key_stride + d.r for d in hex_directions]
+
+
 def hex_round(h):
     qi = int(round(h.q))
     ri = int(round(h.r))
@@ -137,6 +169,65 @@ def polygon_corners(layout, h):
         corners.append(Point(center.x + offset.x, center.y + offset.y))
     return corners
 
+def rectangle_hex_ranges(layout, x_min, y_min, x_max, y_max):
+    """
+    Finds every hexagon that overlaps a pixel rectangle. Hexes that only touch its edge or corner don't count.
+    Hexes come out a line at a time as ranges, so there's nothing to allocate per hex. For pointy layouts the lines are rows of the same r, and for flat layouts they're columns of the same q.
+    Args:
+        layout (Layout): the layout to use.
+        x_min, y_min, x_max, y_max (float): the rectangle, in pixels.
+    Returns:
+        List of (major, minor_min, minor_max) tuples. That's (r, q_min, q_max) for pointy layouts, and (q, r_min, r_max) for flat layouts.
+    """
+    m = layout.orientation
+    size = layout.size
+    origin = layout.origin
+    # "along" is the direction the lines run in, "across" is the direction we step from line to line.
+    if m.f2 == 0.0:  # Pointy
+        along_min, along_max, across_min, across_max = x_min, x_max, y_min, y_max
+        along_size, across_size = size.x, size.y
+        along_origin, across_origin = origin.x, origin.y
+        minor_scale, major_scale, across_scale = m.f0, m.f1, m.f3
+    else:  # Flat
+        along_min, along_max, across_min, across_max = y_min, y_max, x_min, x_max
+        along_size, across_size = size.y, size.x
+        along_origin, across_origin = origin.y, origin.x
+        minor_scale, major_scale, across_scale = m.f3, m.f2, m.f0
+    # A hex is half_width wide either side of its center along the line, all the way out to tip / 2 across, then narrows to a point at tip.
+    half_width = along_size * math.sqrt(3.0) / 2.0
+    tip = across_size
+    step = across_scale * across_size
+    first = math.floor((across_min - tip - across_origin) / step) + 1
+    last = math.ceil((across_max + tip - across_origin) / step) - 1
+    ranges = []
+    for major in range(first, last + 1):
+        center = step * major + across_origin
+        distance = max(across_min - center, center - across_max, 0.0)
+        if distance >= tip:
+            continue
+        width = half_width
+        if distance > tip / 2.0:
+            width = half_width * (tip - distance) / (tip / 2.0)
+        low = ((along_min - width - along_origin) / along_size - major_scale * major) / minor_scale
+        high = ((along_max + width - along_origin) / along_size - major_scale * major) / minor_scale
+        minor_min = math.floor(low) + 1
+        minor_max = math.ceil(high) - 1
+        if minor_min <= minor_max:
+            ranges.append((major, minor_min, minor_max))
+    return ranges
+
+
+def range_hexes(layout, major, minor_min, minor_max):
+    """
+    Turns one of the ranges from rectangle_hex_ranges back into hexagons.
+    Returns:
+        List of hexagons.
+    """
+    if layout.orientation.f2 == 0.0:
+        return [Hexagon(q, major, -q - major) for q in range(minor_min, minor_max + 1)]
+    return [Hexagon(major, r, -major - r) for r in range(minor_min, minor_max + 1)]
+
+
 def cube_to_offset(h):
     col = h.q
     row = h.r + (h.q + 1 * (h.q & 1)) // 2
@@ -160,4 +251,27 @@ def get_hex_chunk(center, radius):
         for r in range(r1, r2 + 1):
             h = Hexagon(center.q + q, center.r + r, -(center.q + q) - (center.r + r))
             hexes += [h]
-    return hexes
\ No newline at end of file
+    return hexes
+
+def get_hex_ring(center, radius):
+    """
+    Given a hexagon, returns the hexagons exactly radius away from it.
+    Args:
+        center (Hexagon): center of the ring.
+        radius (int): distance from the center to the ring.
+    Returns:
+        List of hexagons in the ring, going around it in order.
+    """
+    if radius == 0:
+        return [center]
+    hexes = []
+    q = center.q + hex_directions[4].q * radius
+    r = center.r + hex_directions[4].r * radius
+    for direction in range(6):
+        dq = hex_directions[direction].q
+        dr = hex_directions[direction].r
+        for _ in range(radius):
+            hexes += [Hexagon(q, r, -q - r)]
+            q += dq
+            r += dr
+    return hexes
@@ -0,0 +1,190 @@
+"""
+Numpy versions of the hex_math conversions and geometry, for whole arrays of hexes at once.
+Hexes are (N, 3) arrays of q, r, s, or (N, 2) arrays of q, r where s gets worked out. Pixels are (N, 2) arrays of x, y.
+Every function does the same float operations in the same order as its hex_math version, so the results are exactly the same, not just close.
+"""
+import numpy as np
+
+import hex_math
+from hex_math import Hexagon
+
+
+def hex_array(hexes):
+    """
+    Packs hexagons into an array.
+    Args:
+        hexes (iterable): Hexagons.
+    Returns:
+        (N, 3) int64 numpy array of q, r, s.
+    """
+    hexes = list(hexes)
+    return np.array(hexes, dtype=np.int64).reshape(len(hexes), 3)
+
+
+def to_hexagons(hexes):
+    """
+    Unpacks an array back into hexagons.
+    Args:
+        hexes (numpy.ndarray): (N, 3) or (N, 2) array of hexes.
+    Returns:
+        List of Hexagons.
+    """
+    q, r, s = _coordinates(hexes)
+    return [Hexagon(*h) for h in zip(q.tolist(), r.tolist(), s.tolist())]
+
+
+def _coordinates(hexes):
+    """
+    Splits an array of hexes into its q, r and s columns.
+    """
+    hexes = np.asarray(hexes)
+    q = hexes[..., 0]
+    r = hexes[..., 1]
+    if hexes.shape[-1] == 2:
+        s = -q - r
+    else:
+        s = hexes[..., 2]
+    return q, r, s
+
+
+def hex_round(hexes):
+    """
+    Rounds fractional hexes to the hexes they're in, see hex_math.hex_round.
+    Args:
+        hexes (numpy.ndarray): (N, 3) or (N, 2) float array.
+    Returns:
+        (N, 3) int64 array.
+    """
+    q, r, s = _coordinates(hexes)
+    # np.rint rounds halves to even, the same as round().
+    qi = np.rint(q)
+    ri = np.rint(r)
+    si = np.rint(s)
+    q_diff = np.abs(qi - q)
+    r_diff = np.abs(ri - r)
+    s_diff = np.abs(si - s)
+    fix_q = (q_diff > r_diff) & (q_diff > s_diff)
+    fix_r = ~fix_q & (r_diff > s_diff)
+    fix_s = ~fix_q & ~fix_r
+    qi = np.where(fix_q, -ri - si, qi)
+    ri = np.where(fix_r, -qi - si, ri)
+    si = np.where(fix_s, -qi - ri, si)
+    return np.stack((qi, ri, si), axis=-1).astype(np.int64)
+
+
+def hex_to_pixel(layout, hexes, use_origin=True):
+    """
+    Finds the pixel centers of hexes, see hex_math.hex_to_pixel.
+    Args:
+        layout (hex_math.Layout): layout to use.
+        hexes (numpy.ndarray): (N, 3) or (N, 2) array of hexes.
+        use_origin (bool): whether to add the layout's origin.
+    Returns:
+        (N, 2) float64 array of x, y.
+    """
+    m = layout.orientation
+    size = layout.size
+    origin = layout.origin if use_origin else hex_math.Point(0, 0)
+    q, r, _ = _coordinates(hexes)
+    x = (m.f0 * q + m.f1 * r) * size.x
+    y = (m.f2 * q + m.f3 * r) * size.y
+    return np.stack((x + origin.x, y + origin.y), axis=-1)
+
+
+def raw_pixel_to_hex(layout, points):
+    """
+    Finds the fractional hexes pixels are in, see hex_math.raw_pixel_to_hex.
+    Args:
+        layout (hex_math.Layout): layout to use.
+        points (numpy.ndarray): (N, 2) array of x, y.
+    Returns:
+        (N, 3) float64 array.
+    """
+    m = layout.orientation
+    size = layout.size
+    origin = layout.origin
+    points = np.asarray(points, dtype=float)
+    x = (points[..., 0] - origin.x) / size.x
+    y = (points[..., 1] - origin.y) / size.y
+    q = m.b0 * x + m.b1 * y
+    r = m.b2 * x + m.b3 * y
+    return np.stack((q, r, -q - r), axis=-1)
+
+
+def pixel_to_hex(layout, points):
+    """
+    Finds the hexes pixels are in, see hex_math.pixel_to_hex.
+    Args:
+        layout (hex_math.Layout): layout to use.
+        points (numpy.ndarray): (N, 2) array of x, y.
+    Returns:
+        (N, 3) int64 array.
+    """
+    return hex_round(raw_pixel_to_hex(layout, points))
+
+
+def hex_distance(a, b):
+    """
+    Distances between hexes, see hex_math.hex_distance. The arrays broadcast, so one hex against many works too.
+    Args:
+        a (numpy.ndarray): (N, 3) or (N, 2) int array of hexes.
+        b (numpy.ndarray): (N, 3) or (N, 2) int array of hexes.
+    Returns:
+        (N,) int64 array.
+    """
+    aq, ar, a_s = _coordinates(a)
+    bq, br, bs = _coordinates(b)
+    return (np.abs(aq - bq) + np.abs(ar - br) + np.abs(a_s - bs)) // 2
+
+
+def hex_distance_matrix(a, b):
+    """
+    Distance from every hex in a to every hex in b.
+    Args:
+        a (numpy.ndarray): (N, 3) or (N, 2) int array of hexes.
+        b (numpy.ndarray): (M, 3) or (M, 2) int array of hexes.
+    Returns:
+        (N, M) int64 array.
+    """
+    a = np.asarray(a)
+    return hex_distance(a[:, None, :], np.asarray(b)[None, :, :])
+
+
+def hex_linedraw(a, b):
+    """
+    Draws a line from each hex in a to the same hex in b, see hex_math.hex_linedraw.
+    The lines are different lengths, so they all come back in one array, with the offsets saying where each one starts.
+    Args:
+        a (numpy.ndarray): (N, 3) or (N, 2) int array of start hexes.
+        b (numpy.ndarray): (N, 3) or (N, 2) int array of end hexes.
+    Returns:
+        Tuple of ((M, 3) int64 array of hexes, (N + 1,) int64 array of offsets). Line i is hexes[offsets[i]:offsets[i + 1]], start and end included.
+    """
+    aq, ar, a_s = _coordinates(a)
+    bq, br, bs = _coordinates(b)
+    n = hex_distance(a, b)
+    offsets = np.zeros(len(n) + 1, dtype=np.int64)
+    np.cumsum(n + 1, out=offsets[1:])
+    line = np.repeat(np.arange(len(n)), n + 1)
+    i = np.arange(offsets[-1]) - offsets[line]
+    step = 1.0 / np.maximum(n, 1)
+    t = step[line] * i
+    # Nudged the same way as hex_math.hex_linedraw, so lines along edges between hexes fall the same way.
+    a_nudge = (aq + 0.000001, ar + 0.000001, a_s - 0.000002)
+    b_nudge = (bq + 0.000001, br + 0.000001, bs - 0.000002)
+    lerped = [an[line] * (1.0 - t) + bn[line] * t for an, bn in zip(a_nudge, b_nudge)]
+    return hex_round(np.stack(lerped, axis=-1)), offsets
+
+
+def polygon_corners(layout, hexes):
+    """
+    Finds the corners of hexes, see hex_math.polygon_corners.
+    Args:
+        layout (hex_math.Layout): layout to use.
+        hexes (numpy.ndarray): (N, 3) or (N, 2) array of hexes.
+    Returns:
+        (N, 6, 2) float64 array of x, y for each corner.
+    """
+    # The offsets come from hex_math itself, numpy's sin and cos can be a bit off from math's.
+    offsets = np.array([hex_math.hex_corner_offset(layout, i) for i in range(6)])
+    return hex_to_pixel(layout, hexes)[:, None, :] + offsets[None, :, :]
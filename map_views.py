@@ -0,0 +1,117 @@
+"""
+What the overlay layers draw, kept apart from cocos2d so it can run without a window.
+The layers in cocos2d.py hand their drawing to these, with a SpriteReconciler around their batch.
+"""
+
+
+class FogView:
+    """
+    Keeps a fog sprite on every hex in view that has been generated and can't be seen.
+    Only the hexes given to draw get touched, so a vision change or a scroll only costs as much as the hexes it changed.
+    """
+    def __init__(self, sprites, hexagon_map, vision, positions, visible_hexes):
+        """
+        Args:
+            sprites (SpriteReconciler): sprites for the fog.
+            hexagon_map (TerrainStore): the terrain's cells, only hexes in it get fog.
+            vision (Coverage): what can be seen.
+            positions (PixelCache): where hexes go on screen.
+            visible_hexes (set): hexes in view. This is kept and read on every draw, so it should be updated in place, like VisibleHexTracker.hexes.
+        """
+        self.sprites = sprites
+        self.hexagon_map = hexagon_map
+        self.vision = vision
+        self.positions = positions
+        self.visible_hexes = visible_hexes
+
+    def fogged(self, k):
+        """
+        Returns:
+            True if the hex has been generated and can't be seen. Hexes we haven't generated yet don't get fog.
+        """
+        # Going by the vision and not the cell's visible field, so a chunk that's been paged out doesn't get paged back in for it.
+        return k in self.hexagon_map and not self.vision.covered(k)
+
+    def draw(self, hexes=None):
+        """
+        Adds and removes fog sprites. Only the hexes given get touched.
+        Args:
+            hexes (set): hexes that might need redrawing, like the ones that changed visibility or scrolled in or out of view. If None, everything in view gets checked.
+        """
+        if hexes is None:
+            wanted = {}
+            for k in self.visible_hexes:
+                if self.fogged(k):
+                    wanted[f"{k.q}_{k.r}_{k.s}"] = ("fog", self.positions.position(k), -k.r)
+            self.sprites.sync(wanted)
+            return
+        visible_hexes = self.visible_hexes
+        for k in hexes:
+            name = f"{k.q}_{k.r}_{k.s}"
+            if k in visible_hexes and self.fogged(k):
+                self.sprites.show(name, "fog", self.positions.position(k), -k.r)
+            else:
+                self.sprites.hide(name)
+
+
+class SafeEdgeView:
+    """
+    Keeps an edge sprite on every hex in view where the safe area stops, with all of a hex's edges squashed into one image.
+    Like FogView, only the hexes given to draw get touched. When hexes become safe or unsafe their neighbours' edges can change too, so draw them with safety.border.
+    """
+    def __init__(self, sprites, hexagon_map, safety, edge_sprites, positions, visible_hexes):
+        """
+        Args:
+            sprites (SpriteReconciler): sprites for the edges.
+            hexagon_map (TerrainStore): the terrain's cells, only hexes in it get edges.
+            safety (Coverage): the safe areas.
+            edge_sprites (EdgeComposites): makes the sprite for a set of edges.
+            positions (PixelCache): where hexes go on screen.
+            visible_hexes (set): hexes in view, updated in place.
+        """
+        self.sprites = sprites
+        self.hexagon_map = hexagon_map
+        self.safety = safety
+        self.edge_sprites = edge_sprites
+        self.positions = positions
+        self.visible_hexes = visible_hexes
+
+    def safe_sprite(self, k):
+        """
+        What the edge sprite for a hex should look like. An edge gets drawn wherever the safe area stops.
+        Args:
+            k (Hexagon): hex to draw.
+        Returns:
+            Tuple of (sprite_id, position, z), or None if there's no edge to draw or the hex hasn't been generated.
+        """
+        if k not in self.hexagon_map:
+            return None
+        mask = self.safety.edge_mask(k)
+        if not mask:
+            return None
+        return self.edge_sprites.sprite_id("safe", mask), self.positions.position(k), -k.r
+
+    def draw(self, hexes=None):
+        """
+        Adds and removes the safe area edge sprites. Only the hexes given get touched.
+        Args:
+            hexes (set): hexes that might need redrawing, like the ones around a safety change or that scrolled in or out of view. If None, everything in view gets checked.
+        """
+        if hexes is None:
+            wanted = {}
+            for k in self.visible_hexes:
+                sprite = self.safe_sprite(k)
+                if sprite is not None:
+                    wanted[f"{k.q}_{k.r}_{k.s}"] = sprite
+            self.sprites.sync(wanted)
+            return
+        visible_hexes = self.visible_hexes
+        for k in hexes:
+            name = f"{k.q}_{k.r}_{k.s}"
+            sprite = None
+            if k in visible_hexes:
+                sprite = self.safe_sprite(k)
+            if sprite is None:
+                self.sprites.hide(name)
+            else:
+                self.sprites.show(name, *sprite)
@@ -0,0 +1,285 @@
+import itertools
+from heapq import heappush, heappop
+
+import settings
+from hex_math import hex_key, key_coordinates, key_to_hex, key_directions
+
+
+def key_distance(a, b):
+    """
+    hex_math.hex_distance, for hex keys.
+    """
+    aq, ar = key_coordinates(a)
+    bq, br = key_coordinates(b)
+    dq = aq - bq
+    dr = ar - br
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def search(start, goal, passable=None, cost=None, max_expansions=None):
+    """
+    A* over hex keys, with a heapq open list and a closed set.
+    Ties on cost go to the hex closest to the goal, then to the lowest key, so the same map always gives the same path.
+    Args:
+        start (int): hex key to start from.
+        goal (int): hex key we want to get to.
+        passable (callable): takes a hex key and returns False if it can't be walked on. Defaults to everything being passable.
+        cost (callable): takes the hex keys of a step, from and to, and returns what it costs. Has to be at least 1, or the path might not be the shortest. Defaults to 1.
+        max_expansions (int): how many hexes to expand before giving up, defaults to settings.path_max_expansions.
+    Returns:
+        Dictionary where the key is a hex key and the value is the hex key it was reached from, or None if there's no path.
+    """
+    if max_expansions is None:
+        max_expansions = settings.path_max_expansions
+    came_from = {start: None}
+    total_cost = {start: 0}
+    closed = set()
+    goal_q, goal_r = key_coordinates(goal)
+    h = key_distance(start, goal)
+    open_list = [(h, h, start)]
+    expansions = 0
+    while open_list:
+        _, _, current = heappop(open_list)
+        if current == goal:
+            return came_from
+        if current in closed:
+            continue  # Stale entry, we've already found a cheaper way here.
+        closed.add(current)
+        expansions += 1
+        if expansions > max_expansions:
+            return None
+        current_cost = total_cost[current]
+        for direction in key_directions:
+            next_key = current + direction
+            if next_key in closed:
+                continue
+            if passable is not None and not passable(next_key):
+                continue
+            new_cost = current_cost + (1 if cost is None else cost(current, next_key))
+            if new_cost < total_cost.get(next_key, new_cost + 1):
+                total_cost[next_key] = new_cost
+                came_from[next_key] = current
+                # Inlined key_distance, this is the hot bit.
+                dq, dr = key_coordinates(next_key)
+                dq -= goal_q
+                dr -= goal_r
+                h = (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+                heappush(open_list, (new_cost + h, h, next_key))
+    return None
+
+
+def find_path(start_cell, end_cell, passable=None, cost=None, include_start=False, max_expansions=None):
+    """
+    Finds a path between two hexagon cells, see search.
+    Args:
+        start_cell (Hexagon): hex cell that we are starting from.
+        end_cell (Hexagon): hex cell that we want to find a path to.
+        passable (callable): takes a hex key and returns False if it can't be walked on.
+        cost (callable): takes the hex keys of a step, from and to, and returns what it costs.
+        include_start (bool): True if the start cell should be included in the list, false otherwise.
+        max_expansions (int): how many hexes to expand before giving up.
+    Returns:
+        A list of the hexes that need to be traversed, or None if there's no path.
+    """
+    start = hex_key(start_cell)
+    current = hex_key(end_cell)
+    came_from = search(start, current, passable, cost, max_expansions)
+    if came_from is None:
+        return None
+    path = []
+    while current != start:
+        path.append(key_to_hex(current))
+        current = came_from[current]
+    if include_start:
+        path.append(start_cell)
+    path.reverse()
+    return path
+
+
+class FlowField:
+    """
+    Distance to the nearest of a set of targets, for every hex within max_distance of one, from a multi-source Dijkstra.
+    Anything on the field finds its next step by looking at its six neighbours, so a swarm doesn't need a search per creep.
+    Adding and removing targets only redoes the part of the field that changes.
+    """
+    def __init__(self, max_distance=None, passable=None, cost=None):
+        """
+        Args:
+            max_distance (int): how far out from the targets the field goes, defaults to settings.flow_field_radius.
+            passable (callable): takes a hex key and returns False if it can't be walked on.
+            cost (callable): takes the hex keys of a step, from and to, and returns what it costs.
+        """
+        if max_distance is None:
+            max_distance = settings.flow_field_radius
+        self.max_distance = max_distance
+        self.passable = passable
+        self.cost = cost
+        self.sources = set()
+        # Key is a hex key, value is the distance to the nearest source.
+        self.distance = {}
+        # Key is a hex key, value is the key of the source it's nearest to.
+        self.source_of = {}
+        # The other way around, key is a source, value is the set of hex keys nearest to it. So removing a source doesn't have to look through the whole field.
+        self.owned = {}
+
+    def _step_cost(self, a, b):
+        return 1 if self.cost is None else self.cost(a, b)
+
+    def _flood(self, open_list):
+        """
+        Dijkstra out from the entries in open_list, which are (distance, key, source) tuples, only keeping improvements.
+        """
+        distance = self.distance
+        source_of = self.source_of
+        owned = self.owned
+        passable = self.passable
+        cost = self.cost
+        max_distance = self.max_distance
+        while open_list:
+            d, current, source = heappop(open_list)
+            if d > distance.get(current, max_distance + 1):
+                continue  # Stale entry.
+            for direction in key_directions:
+                next_key = current + direction
+                # Most fields cost 1 a step, and this runs for every neighbour of everything the flood reaches.
+                new_d = d + 1 if cost is None else d + cost(current, next_key)
+                if new_d > max_distance or new_d >= distance.get(next_key, max_distance + 1):
+                    continue
+                if passable is not None and not passable(next_key):
+                    continue
+                old_source = source_of.get(next_key)
+                if old_source != source:
+                    if old_source is not None:
+                        owned[old_source].discard(next_key)
+                    owned[source].add(next_key)
+                    source_of[next_key] = source
+                distance[next_key] = new_d
+                heappush(open_list, (new_d, next_key, source))
+
+    def add_sources(self, keys):
+        """
+        Adds targets to the field. Distances can only shrink, so this floods out from the new targets until it stops improving anything.
+        Args:
+            keys (iterable): hex keys of the new targets.
+        """
+        open_list = []
+        for key in keys:
+            if key in self.sources:
+                continue
+            self.sources.add(key)
+            # It might have been on the field already, nearest to another source.
+            old_source = self.source_of.get(key)
+            if old_source is not None:
+                self.owned[old_source].discard(key)
+            self.distance[key] = 0
+            self.source_of[key] = key
+            self.owned[key] = {key}
+            open_list.append((0, key, key))
+        open_list.sort()
+        self._flood(open_list)
+
+    def remove_sources(self, keys):
+        """
+        Removes targets from the field. Only the hexes that were nearest to a removed target can get further away,
+        so those are cleared and refilled from the hexes around them, whose distances are still right.
+        Args:
+            keys (iterable): hex keys of the targets to remove.
+        """
+        removed = {key for key in keys if key in self.sources}
+        if not removed:
+            return
+        self.sources -= removed
+        self._refill([key for source in removed for key in self.owned.pop(source)])
+
+    def refresh(self, keys):
+        """
+        Reworks the field around hexes that have become passable or impassable, like when a building goes up or comes down.
+        A hex that's blocked now could have been on the way to its source for any of the hexes nearest to that source, so they're all cleared and refilled.
+        A hex that's opened up just gets flooded into from around it.
+        Args:
+            keys (iterable): hex keys whose passability has changed. Sources are left alone, they're on the field whatever's on them.
+        """
+        keys = [key for key in keys if key not in self.sources]
+        regions = {self.source_of[key] for key in keys if key in self.source_of}
+        affected = [key for source in regions for key in self.owned[source] if key != source]
+        for source in regions:
+            self.owned[source] = {source}
+        opened = [key for key in keys if key not in self.source_of]
+        self._refill(affected, opened, [(0, source, source) for source in regions])
+
+    def _refill(self, affected, opened=(), seeds=()):
+        """
+        Clears hexes off the field and floods back into them from the hexes around them, whose distances are still right.
+        Args:
+            affected (list): hex keys to clear. They have to be out of owned already.
+            opened (list): hex keys that aren't on the field, to flood into from around them too.
+            seeds (list): more (distance, key, source) entries to flood from.
+        """
+        distance = self.distance
+        source_of = self.source_of
+        for key in affected:
+            del distance[key]
+            del source_of[key]
+        open_list = list(seeds)
+        for key in itertools.chain(affected, opened):
+            for direction in key_directions:
+                n = key - direction  # The neighbour that would step into key.
+                d = distance.get(n)
+                if d is not None:
+                    open_list.append((d, n, source_of[n]))
+        open_list.sort()
+        self._flood(open_list)
+
+    def set_sources(self, keys):
+        """
+        Makes the targets exactly the given keys, adding and removing only what's different.
+        """
+        keys = set(keys)
+        self.remove_sources(self.sources - keys)
+        self.add_sources(keys - self.sources)
+
+    def next_step(self, key):
+        """
+        Where to go next from a hex to get closer to the nearest target.
+        Args:
+            key (int): hex key we're at.
+        Returns:
+            Hex key of the next step, or None if we're on a target or outside the field.
+        """
+        d = self.distance.get(key)
+        if not d:
+            return None
+        best = None
+        for direction in key_directions:
+            n = key + direction
+            nd = self.distance.get(n)
+            if nd is not None and nd < d:
+                nd += self._step_cost(key, n)
+                if best is None or nd < best_d:
+                    best, best_d = n, nd
+        return best
+
+    def path(self, start_cell, include_start=False):
+        """
+        Follows the field from a hex to the nearest target.
+        Args:
+            start_cell (Hexagon): hex cell that we are starting from.
+            include_start (bool): True if the start cell should be included in the list, false otherwise.
+        Returns:
+            A list of the hexes to walk through, ending on the target, or None if the start is outside the field.
+        """
+        key = hex_key(start_cell)
+        if key not in self.distance:
+            return None
+        path = [start_cell] if include_start else []
+        key = self.next_step(key)
+        while key is not None:
+            path.append(key_to_hex(key))
+            key = self.next_step(key)
+        return path
+
+    def __contains__(self, key):
+        return key in self.distance
+
+    def __len__(self):
+        return len(self.distance)
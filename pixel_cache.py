@@ -0,0 +1,121 @@
+import numpy as np
+
+import hex_math_batch
+import settings
+import terrain_generation
+from hex_math import Hexagon, Point
+
+
+class PixelCache:
+    """
+    Remembers where hexes go on screen for one layout, so the layers don't work out hex_to_pixel(layout, h, False) for every hex on every redraw.
+    Positions are worked out a whole chunk at a time with hex_math_batch, on the same chunk tiling as the terrain, and kept or dropped a chunk at a time.
+    When there are more than max_chunks, the chunk that was used longest ago goes. The terrain can also drop chunks itself when it unloads them, see discard_chunk.
+    """
+    def __init__(self, layout, chunk_size, max_chunks=None):
+        """
+        Args:
+            layout (hex_math.Layout): layout to work out positions for. Only its orientation and size matter, positions don't include the origin.
+            chunk_size (int): size of the chunks, the same as the terrain's.
+            max_chunks (int): most chunks to keep positions for. Defaults to settings.pixel_cache_chunks.
+        """
+        self.layout = layout
+        self.chunk_size = chunk_size
+        self.max_chunks = settings.pixel_cache_chunks if max_chunks is None else max_chunks
+        # Key is the chunk's anchor, value is a list of [when it was last used, the hexagons in it].
+        self.chunks = {}
+        # Key is the hexagon, value is a tuple of (position, the chunk's entry in chunks). All the chunks in one dictionary, so a hit is a single lookup.
+        self.positions = {}
+        # Goes up on every lookup. Chunks remember the clock when they were last used, which is all eviction needs.
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def position(self, h):
+        """
+        Where a hex goes, relative to the layout's origin. The same as hex_math.hex_to_pixel(layout, h, False).
+        Args:
+            h (Hexagon): hex to find.
+        Returns:
+            Point.
+        """
+        try:
+            p, chunk = self.positions[h]
+        except KeyError:
+            self.misses += 1
+            p, chunk = self._load(h)
+        else:
+            self.hits += 1
+        self.clock += 1
+        chunk[0] = self.clock
+        return p
+
+    def _load(self, h):
+        """
+        Works out the positions for the chunk a hex is in, and makes room for it.
+        """
+        aq, ar = terrain_generation.chunk_anchor_coordinates(h.q, h.r, self.chunk_size)
+        anchor = Hexagon(aq, ar, -aq - ar)
+        while len(self.chunks) >= self.max_chunks:
+            self._evict()
+        q, r = terrain_generation.chunk_coordinates(anchor, self.chunk_size)
+        xy = hex_math_batch.hex_to_pixel(self.layout, np.stack((q, r), axis=-1), False)
+        hexes = [Hexagon(a, b, -a - b) for a, b in zip(q.tolist(), r.tolist())]
+        chunk = [self.clock, hexes]
+        positions = self.positions
+        for k, (x, y) in zip(hexes, xy.tolist()):
+            positions[k] = (Point(x, y), chunk)
+        self.chunks[anchor] = chunk
+        return positions[h]
+
+    def _evict(self):
+        anchor = min(self.chunks, key=lambda a: self.chunks[a][0])
+        self.discard_chunk(anchor)
+        self.evictions += 1
+
+    def discard_chunk(self, anchor):
+        """
+        Forgets the positions for a chunk, e.g. when the terrain unloads it. Does nothing if they weren't cached.
+        Args:
+            anchor (Hexagon): anchor of the chunk.
+        """
+        chunk = self.chunks.pop(anchor, None)
+        if chunk is None:
+            return
+        positions = self.positions
+        for k in chunk[1]:
+            del positions[k]
+
+    def set_layout(self, layout):
+        """
+        Switches to another layout, e.g. when zooming changes the hex size. Everything cached for the old one is thrown away.
+        Args:
+            layout (hex_math.Layout): the new layout.
+        """
+        if layout == self.layout:
+            return
+        self.layout = layout
+        self.chunks.clear()
+        self.positions.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary of the cache's counters. hit_rate is the fraction of lookups that didn't have to load a chunk.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "chunks": len(self.chunks),
+            "hexes": len(self.positions),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def __len__(self):
+        return len(self.positions)
@@ -8,6 +8,37 @@ core_offset = 2
 noise_damping_factor = 0.025
 # This is used to select a sprite from the output of OpenSimplex noise, normalized between 0 and 1.
 terrain_sprite_bins = [0, 0.2, 0.25, 0.5, 0.55, 0.6, 0.7, 0.8, 0.825, 0.875, 0.9, 0.915, 0.25, 1.0]
+# How many worker processes generate terrain chunks in the background. None uses one per CPU.
+chunk_workers = 2
+# How long, in seconds, we can spend merging generated chunks into the map each frame.
+chunk_merge_budget = 0.004
+# Sprites get packed into atlas textures this many pixels on a side, so batches can draw them all from one texture.
+sprite_atlas_size = 1024
+# Where the packed atlases and their manifest are cached between runs. Rebuilt whenever a sprite changes.
+sprite_atlas_cache = "atlas_cache/"
+# How many hexes pathfinding looks at before it gives up on finding a path.
+path_max_expansions = 20000
+# How far, in hexes, the enemy flow field reaches out from the things enemies attack. Enemies further away than this fall back to A*.
+flow_field_radius = 64
+# Size of the buckets the spatial indexes sort things into, in hexes. Has to be odd.
+spatial_bucket_size = 15
+# Most memory, in MB, the terrain chunks can take before the ones that have been out of view longest get paged out to disk. None keeps them all in memory.
+max_resident_terrain_mb = 64
+# Where the page file for terrain chunks goes. None uses the system's temp directory. It's deleted when the game exits.
+terrain_page_dir = None
+# If True, chunks that go over max_resident_terrain_mb are thrown away instead of paged out, and regenerated from the noise when they're needed.
+# Only the cells that have been changed since the chunk was generated are kept.
+terrain_delta_overlay = True
+# How many chunks' terrain the regenerator remembers, see terrain_generation.CachedChunkGenerator.
+terrain_generator_cache = 64
+# How many chunks' worth of hex pixel positions the layers keep around, see pixel_cache.PixelCache. The view is only a couple dozen chunks.
+pixel_cache_chunks = 256
+# Seconds of game time per simulation tick. The simulation always steps by exactly this much, however fast the frames come.
+simulation_tick = 0.025
+# The most ticks the simulation runs to catch up in one frame. Anything past this is dropped, so a long stall slows the game down instead of freezing it.
+simulation_max_catch_up = 10
+# How often, in seconds, enemies spawn and idle enemies look for something to attack.
+enemy_interval = 1.0
 
 
 """
@@ -0,0 +1,499 @@
+"""
+Runs the game world in fixed ticks, without drawing anything.
+Everything that changes gets collected into a Diff, which is handed to whatever's listening (the layers in cocos2d.py) when the simulation publishes.
+Given the same terrain, seed and commands on the same ticks, it always ends up in the same state, so it can be run headless for soak tests or to check a game on a server.
+"""
+import random
+
+import hex_math
+import pathfinding
+import settings
+import spatial
+from hex_math import Hexagon
+from world import Enemy, Network, Unit
+
+
+class Diff:
+    """
+    Everything that changed since the simulation last published, so the layers only redraw what they have to.
+    """
+    def __init__(self):
+        # Key is the unit or enemy, value is the hex it's on now, or None if it's gone. Added, moved and removed all go in here.
+        self.units = {}
+        self.enemies = {}
+        # Hexes where a building or network node was added or removed, or powered on or off. Network nodes next to those are in too, their edges join up to them.
+        self.buildings = set()
+        self.network = set()
+        # Hexes that became visible or fogged, and safe or unsafe. A hex that flipped and flipped back is in whichever it ended up as.
+        self.seen = set()
+        self.fogged = set()
+        self.safe = set()
+        self.unsafe = set()
+        # How many ticks this covers.
+        self.ticks = 0
+
+    @staticmethod
+    def _flip(on_set, off_set, on, off):
+        on_set -= off
+        on_set |= on
+        off_set -= on
+        off_set |= off
+
+    def __bool__(self):
+        return bool(self.units or self.enemies or self.buildings or self.network or self.seen or self.fogged or self.safe or self.unsafe)
+
+    def __str__(self):
+        return (f"Diff over {self.ticks} ticks: {len(self.units)} units, {len(self.enemies)} enemies, {len(self.buildings)} buildings, "
+                f"{len(self.network)} network nodes, {len(self.seen)}/{len(self.fogged)} seen/fogged, {len(self.safe)}/{len(self.unsafe)} safe/unsafe")
+
+
+class Simulation:
+    """
+    Owns the units, enemies and network on a terrain, and the vision and safe areas that come with them.
+    Commands, like building something or moving a unit, take effect straight away. Movement, spawning and enemies picking targets happen in tick.
+    """
+    def __init__(self, terrain, seed=None, tick_length=None):
+        """
+        Args:
+            terrain (world.Terrain): terrain to run on.
+            seed (int): seed for everything random in the simulation, defaults to the terrain's.
+            tick_length (float): seconds of game time per tick, defaults to settings.simulation_tick.
+        """
+        self.terrain = terrain
+        self.network = Network(terrain)
+        # Key is the hex the unit or enemy is on, value is the unit or enemy.
+        self.units = spatial.SpatialIndex()
+        self.enemies = spatial.SpatialIndex()
+        # Units and enemies that still have somewhere to go. A dictionary so they always move in the same order.
+        self.moving = {}
+        self.tick_length = settings.simulation_tick if tick_length is None else tick_length
+        self.random = random.Random(terrain.random_seed if seed is None else seed)
+        self.ticks = 0
+        # Game time that hasn't made up a whole tick yet, see advance.
+        self.time = 0.0
+        self.enemy_level = 1
+        self.current_level = 0
+        self.enemy_time = 0.0
+        self.next_number = 0
+        # Where the player is looking. Enemies spawn around the enemy core closest to it.
+        self.focus = Hexagon(0, 0, 0)
+        # Hex keys of every building. Units walk around all of them, and enemies around all but the one they're going after.
+        self.building_keys = {hex_math.hex_key(k) for k in terrain.buildings.keys()}
+        building_keys = self.building_keys
+        # Every enemy finds its way to the nearest target by following this, instead of searching on its own.
+        # Targets are on the field whatever's on them, so enemies get the same way around buildings as find_enemy_path gives them.
+        self.flow_field = pathfinding.FlowField(passable=lambda key: key not in building_keys)
+        # Called with a Diff every time the simulation publishes.
+        self.listeners = []
+        self.diff = Diff()
+        terrain.vision_listeners.append(self._vision_changed)
+        terrain.safety_listeners.append(self._safety_changed)
+        terrain.building_listeners.append(self._building_changed)
+        self.update_targets()
+        core = Hexagon(0, 0, 0)
+        terrain.add_safe_area(("core", core), core, 7)
+        terrain.add_vision(("core", core), core, 9)
+
+    def _vision_changed(self, seen, fogged):
+        self.diff._flip(self.diff.seen, self.diff.fogged, seen, fogged)
+
+    def _safety_changed(self, safe, unsafe):
+        self.diff._flip(self.diff.safe, self.diff.unsafe, safe, unsafe)
+
+    def _building_changed(self, cell):
+        key = hex_math.hex_key(cell)
+        if cell in self.terrain.buildings:
+            self.building_keys.add(key)
+        else:
+            self.building_keys.discard(key)
+        # Enemies might have been going through there, or could now.
+        self.flow_field.refresh([key])
+
+    def _number(self):
+        self.next_number += 1
+        return self.next_number
+
+    def advance(self, elapsed):
+        """
+        Runs as many ticks as fit in the time that's passed, keeping the rest for next time, then publishes what changed.
+        Args:
+            elapsed (float): seconds since the last call, e.g. the frame's dt.
+        Returns:
+            The published Diff.
+        """
+        self.time += elapsed
+        ticks = 0
+        while self.time >= self.tick_length:
+            if ticks == settings.simulation_max_catch_up:
+                self.time = 0.0
+                break
+            self.time -= self.tick_length
+            self.tick()
+            ticks += 1
+        return self.publish()
+
+    def publish(self):
+        """
+        Hands the changes since last time to the listeners, and starts a new Diff.
+        Returns:
+            The Diff that was published.
+        """
+        diff = self.diff
+        self.diff = Diff()
+        if diff:
+            for listener in self.listeners:
+                listener(diff)
+        return diff
+
+    def tick(self):
+        """
+        Moves the simulation on by one tick: everything that's moving walks, and every so often enemies spawn and pick targets.
+        """
+        self.ticks += 1
+        self.diff.ticks += 1
+        dt = self.tick_length
+        for mover in list(self.moving):
+            self._walk(mover, dt)
+        self.enemy_time += dt
+        if self.enemy_time >= settings.enemy_interval:
+            self.enemy_time -= settings.enemy_interval
+            self.spawn_enemies()
+            self.move_enemies()
+
+    def _walk(self, mover, dt):
+        """
+        Steps a unit or enemy along its path, a hex every speed seconds.
+        Units find a new way if a building has gone up in the way. Enemies give up on their path if something's in the way, and pick a new one the next time enemies think.
+        """
+        is_unit = isinstance(mover, Unit)
+        mover.time += dt
+        while mover.move_path and mover.time >= mover.speed:
+            next_hex = mover.move_path[0]
+            if is_unit and next_hex in self.terrain.buildings:
+                self._reroute(mover)
+                continue
+            if not is_unit and (next_hex in self.enemies or (next_hex in self.terrain.buildings and next_hex != mover.target)):
+                mover.move_path = []
+                break
+            mover.time -= mover.speed
+            del mover.move_path[0]
+            if is_unit:
+                mover.position = next_hex
+                self.terrain.move_vision(mover, next_hex)
+                self.diff.units[mover] = next_hex
+            else:
+                del self.enemies[mover.position]
+                mover.position = next_hex
+                self.enemies[next_hex] = mover
+                self.diff.enemies[mover] = next_hex
+        if not mover.move_path:
+            mover.time = 0.0
+            del self.moving[mover]
+
+    def _reroute(self, unit):
+        """
+        Finds a new way for a unit whose path has a building on it now.
+        If there isn't one, the unit stops and gets filed under where it is. Unless another unit is stopping there, then it stays filed under where it was going.
+        """
+        destination = unit.move_path[-1]
+        path = None
+        if destination not in self.terrain.buildings:
+            path = self.find_unit_path(unit.position, destination)
+        if path is not None:
+            unit.move_path = path
+            return
+        unit.move_path = []
+        if unit.position not in self.units:
+            del self.units[destination]
+            self.units[unit.position] = unit
+
+    def plop_building(self, cell, building):
+        """
+        Adds a building, on a network sink so it can be powered.
+        Args:
+            cell (Hexagon): where do we want to plop this building?
+            building (Building): building to add.
+        Returns:
+            True if the building was added.
+        """
+        if cell in self.terrain.buildings:
+            print("Building already exists, skipping.")
+            return False
+        self.plop_network(cell, "sink")
+        self.terrain.add_building(cell, building)
+        self.update_target(cell)
+        self.diff.buildings.add(cell)
+        if self.network.network[cell]["powered"]:
+            if building.building_id == 3:
+                self.terrain.add_safe_area(("protection tower", cell), cell, 3)
+            elif building.building_id == 4:
+                self.terrain.add_vision(("sensor tower", cell), cell, 5)
+        return True
+
+    def remove_building(self, cell):
+        """
+        Removes a building. City cores can't be removed.
+        Args:
+            cell (Hexagon): hex to remove the building from.
+        Returns:
+            True if there was a building and it was removed.
+        """
+        if cell not in self.terrain.buildings:
+            print("No building.")
+            return False
+        building_id = self.terrain.buildings[cell].building_id
+        if building_id == 0:
+            print("Can't remove city cores.")
+            return False
+        self.terrain.remove_building(cell)
+        self.update_target(cell)
+        self.diff.buildings.add(cell)
+        if cell in self.network.network and self.network.network[cell]["powered"]:
+            if building_id == 3:
+                self.terrain.remove_safe_area(("protection tower", cell))
+            elif building_id == 4:
+                self.terrain.remove_vision(("sensor tower", cell))
+        return True
+
+    def plop_network(self, cell, network_type="energy"):
+        """
+        Adds a network node. It's powered if it's next to anything that's connected to the core.
+        Args:
+            cell (Hexagon): where the node goes.
+            network_type (str): type of the node, see world.Network.
+        Returns:
+            True if the node was added.
+        """
+        if cell in self.network.network:
+            print("Network already exists, skipping.")
+            return False
+        # Neighbours that this connects up get told by add_node.
+        powered = self.network.is_powered_next_to(cell)
+        self._network_changed({cell} | self.network.add_node(cell, network_type, powered))
+        self.update_target(cell)
+        return True
+
+    def remove_network(self, cell):
+        """
+        Removes a network node, powering down anything that was only connected to the core through it.
+        Args:
+            cell (Hexagon): node to remove.
+        Returns:
+            True if there was a node and it was removed.
+        """
+        if cell not in self.network.network:
+            print("No network.")
+            return False
+        if self.network.network[cell]["type"] == "start":
+            print("Can't remove city core network.")
+            return False
+        self._network_changed({cell} | self.network.remove_node(cell))
+        self.update_target(cell)
+        return True
+
+    def _network_changed(self, cells):
+        # Neighbours' edges join up to a node, and buildings are drawn on or off with it.
+        self.diff.network |= cells
+        self.diff.network.update(hex_math.hex_neighbor(c, idx) for c in cells for idx in range(6))
+        self.diff.buildings |= cells
+
+    def add_unit(self, position, unit_id):
+        """
+        Makes a new unit. Units can be on top of networks, but not on top of buildings or other units.
+        Args:
+            position (Hexagon): where the unit goes.
+            unit_id (int): what kind of unit it is, see world.Unit.
+        Returns:
+            The unit, or None if it couldn't go there.
+        """
+        if position in self.units:
+            print("Unit already exists here.")
+            return None
+        if position in self.terrain.buildings:
+            print("Can't spawn unit on buildings")
+            return None
+        u = Unit(position, unit_id, self._number())
+        self.units[position] = u
+        self.terrain.add_vision(u, position, u.vision_range)
+        self.diff.units[u] = position
+        return u
+
+    def remove_unit(self, position):
+        """
+        Removes the unit at the given hex.
+        Args:
+            position (Hexagon): hex the unit is on, or going to.
+        Returns:
+            True if there was a unit and it was removed.
+        """
+        u = self.units.get(position)
+        if u is None:
+            print("can't remove non-existent unit.")
+            return False
+        del self.units[position]
+        self.moving.pop(u, None)
+        self.terrain.remove_vision(u)
+        self.diff.units[u] = None
+        return True
+
+    def move_unit(self, start_cell, end_cell):
+        """
+        Sends a unit somewhere. It's filed under where it's going straight away, and walks there over the next ticks.
+        Args:
+            start_cell (Hexagon): hex the unit is on, or going to.
+            end_cell (Hexagon): hex to send it to.
+        Returns:
+            True if the unit is on its way.
+        """
+        u = self.units.get(start_cell)
+        if u is None:
+            print("No unit there.")
+            return False
+        if end_cell in self.units or end_cell in self.terrain.buildings:
+            print("Unit move failed.")
+            return False
+        path = self.find_unit_path(u.position, end_cell)
+        if path is None:
+            print("No path to there.")
+            return False
+        del self.units[start_cell]
+        self.units[end_cell] = u
+        u.move_path = path
+        if path:
+            self.moving[u] = None
+        return True
+
+    def find_unit_path(self, start_cell, end_cell):
+        """
+        Finds a path between two hexagon cells. Units go around buildings.
+        Returns:
+            A list of the hexes to walk through, not including the start, or None if there isn't one.
+        """
+        building_keys = self.building_keys
+        return pathfinding.find_path(start_cell, end_cell, lambda key: key not in building_keys)
+
+    def find_enemy_path(self, start_cell, end_cell):
+        """
+        Finds a path between two hexagon cells. Enemies go around buildings, other than the one they're going after.
+        Returns:
+            A list of the hexes to walk through, not including the start, or None if there isn't one.
+        """
+        goal = hex_math.hex_key(end_cell)
+        building_keys = self.building_keys
+        return pathfinding.find_path(start_cell, end_cell, lambda key: key == goal or key not in building_keys)
+
+    def is_target(self, cell):
+        """
+        Returns:
+            True if enemies attack what's on the hex, which is any network node and any building that isn't a core.
+        """
+        if cell in self.network.network:
+            return True
+        building = self.terrain.buildings.get(cell)
+        return building is not None and building.building_id not in (0, 6)
+
+    def update_target(self, cell):
+        """
+        Puts a hex on the flow field's targets or takes it off, after its network node or building changed.
+        Only the part of the field around that hex gets reworked, so a placement doesn't cost more the bigger the network gets.
+        Args:
+            cell (Hexagon): hex that changed.
+        """
+        key = hex_math.hex_key(cell)
+        if self.is_target(cell):
+            self.flow_field.add_sources([key])
+        else:
+            self.flow_field.remove_sources([key])
+
+    def update_targets(self):
+        """
+        Makes the flow field's targets every network node and building enemies attack, going through all of them.
+        Only the targets that were added or removed get reworked, but finding them costs as much as the network is big, so after a single change use update_target.
+        """
+        targets = {hex_math.hex_key(k) for k in self.network.network.keys()}
+        targets.update(hex_math.hex_key(k) for k, v in self.terrain.buildings.items() if v.building_id not in (0, 6))
+        self.flow_field.set_sources(targets)
+
+    def spawn_enemies(self):
+        """
+        Spawns enemies around the enemy core closest to the focus, if there aren't already too many enemies around, as denoted by enemy_level.
+        Only spawns once we've discovered an enemy core, to give the player some time to expand, etc.
+        """
+        if self.current_level >= self.enemy_level:
+            return
+        nearest = self.terrain.city_cores.nearest(self.focus, 1, lambda k, v: v == "enemy")
+        if not nearest:
+            return
+        _, closest = nearest[0]
+        tries = 10
+        while self.current_level < self.enemy_level and tries > 0:
+            self.spawn_single_enemy(closest)
+            tries -= 1
+
+    def spawn_single_enemy(self, core):
+        """
+        Spawns a single enemy.
+        Won't spawn enemies on safe areas, so this could technically result in a situation where enemies won't spawn. This'll need to be fixed.
+        Todo: more complex spawning logic and checks.
+        Args:
+            core (Hexagon): coordinates for the core to spawn around.
+        Returns:
+            False if unable to spawn an enemy, otherwise True
+        """
+        if self.terrain.safety.covered(core) or core not in self.terrain.hexagon_map:
+            return False
+        new_q = self.random.randint(-2, 2) + core.q
+        new_r = self.random.randint(-2, 2) + core.r
+        new_position = Hexagon(new_q, new_r, -new_q - new_r)
+        if new_position in self.terrain.buildings or new_position in self.units or new_position == core:
+            # Don't spawn on building or unit. Energy networks are fine.
+            return False
+        if new_position not in self.enemies:
+            e = Enemy(new_position, 1, self._number())
+            self.enemies[new_position] = e
+            self.current_level += e.level
+            self.diff.enemies[e] = new_position
+        return True
+
+    def move_enemies(self):
+        """
+        Sends every enemy that isn't going anywhere towards a target to attack.
+        Right now, it'll head for the closest network connection or building.
+        """
+        for e in self.enemies.values():
+            if not e.move_path and e.target != e.position:
+                self.find_target(e)
+                if e.move_path:
+                    self.moving[e] = None
+
+    def find_target(self, enemy):
+        """
+        Finds a target, and a path to a target, for a given enemy creep. Enemies in range of the flow field follow it to the nearest target.
+        Further out, flips a coin (50/50 chance) of choosing a building or network connection to go after.
+        Args:
+            enemy (Enemy): enemy creep to find a target for.
+        Returns:
+            Nothing, but updates the move_path and target attributes of the enemy instance.
+        """
+        path = self.flow_field.path(enemy.position)
+        if path:
+            enemy.target = path[-1]
+            enemy.move_path = path
+            return
+        b_or_n = self.random.randint(0, 1)
+        nearest_b = self.terrain.buildings.nearest(enemy.position, 1, lambda k, v: v.building_id not in (0, 6))
+        nearest_n = self.network.network.nearest(enemy.position, 1)
+        enemy.target = None
+        if nearest_n == [] and nearest_b == []:
+            return
+        elif nearest_n != [] and nearest_b == []:
+            enemy.target = nearest_n[0][1]
+        elif nearest_n == [] and nearest_b != []:
+            enemy.target = nearest_b[0][1]
+        else:
+            if b_or_n:
+                enemy.target = nearest_b[0][1]
+            else:
+                enemy.target = nearest_n[0][1]
+        # No path leaves the enemy where it is, it'll try again next time enemies move.
+        enemy.move_path = self.find_enemy_path(enemy.position, enemy.target) or []
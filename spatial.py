@@ -0,0 +1,153 @@
+from collections.abc import MutableMapping
+
+import settings
+
+
+class SpatialIndex(MutableMapping):
+    """
+    A dictionary keyed by Hexagon that can also find the keys nearest to a hex, or within a radius of it, without looking at all of them.
+    Keys are bucketed on the same grid as the terrain chunks, see terrain_generation.chunk_anchor_coordinates, and searches go out ring by ring of buckets.
+    The keys stay Hexagons rather than packed hex keys like hex_keys.HexKeyDict. The layers loop over items() on every redraw, and turning 100k keys back into Hexagons made that ten times slower.
+    """
+    def __init__(self, bucket_size=None):
+        """
+        Args:
+            bucket_size (int): size of the buckets, in hexes. Has to be odd, like chunk sizes. Defaults to settings.spatial_bucket_size.
+        """
+        if bucket_size is None:
+            bucket_size = settings.spatial_bucket_size
+        assert bucket_size % 2 == 1, "bucket_size must be odd, even sized buckets overlap each other"
+        self.bucket_size = bucket_size
+        # Key is the hexagon, value is whatever was stored. Kept separately from the buckets so iterating goes in the order things were added.
+        self.contents = {}
+        # Key is the (column, row) of a bucket, value is the set of hexagons in it.
+        self.buckets = {}
+
+    def bucket(self, h):
+        """
+        Finds the bucket a hexagon goes in. The same tiling as the terrain chunks, numbered by column and row instead of anchor.
+        Returns:
+            Tuple of the bucket's (column, row).
+        """
+        n = self.bucket_size
+        return (h.q + h.r // 2 + n // 2) // n, (h.r + n // 2 + 1) // (n + 1)
+
+    def _ring(self, center, t):
+        """
+        The buckets t steps out from the center bucket, going around a square.
+        """
+        i, j = center
+        if t == 0:
+            yield center
+            return
+        for di in range(-t, t + 1):
+            yield i + di, j - t
+            yield i + di, j + t
+        for dj in range(-t + 1, t):
+            yield i - t, j + dj
+            yield i + t, j + dj
+
+    def _min_distance(self, t):
+        """
+        Every hex in a bucket t rings out is further than this from the center bucket's hexes.
+        A ring out is at least t - 1 whole buckets away, either in rows or in columns, and a bucket is bucket_size wide and bucket_size + 1 tall.
+        """
+        return (t - 1) * self.bucket_size
+
+    def nearest(self, h, k=1, predicate=None):
+        """
+        Finds the k closest keys to a hexagon. Ties are broken on the hexagon, so the answer is always the same.
+        Args:
+            h (Hexagon): hexagon to search around.
+            k (int): how many keys to find.
+            predicate (callable): takes a key and its value, and returns False to skip it. Defaults to keeping everything.
+        Returns:
+            List of up to k (distance, key) tuples, closest first.
+        """
+        found = []
+        if not self.contents:
+            return found
+        center = self.bucket(h)
+        visited = 0
+        t = 0
+        while visited < len(self.buckets):
+            if len(found) >= k and found[k - 1][0] <= self._min_distance(t):
+                break
+            for b in self._ring(center, t):
+                keys = self.buckets.get(b)
+                if keys is None:
+                    continue
+                visited += 1
+                for key in keys:
+                    if predicate is None or predicate(key, self.contents[key]):
+                        # hex_math.hex_distance inlined, it makes a Hexagon for the difference otherwise.
+                        dq = key.q - h.q
+                        dr = key.r - h.r
+                        found.append(((abs(dq) + abs(dr) + abs(dq + dr)) // 2, key))
+            found.sort()
+            del found[k:]
+            t += 1
+        return found
+
+    def within(self, h, radius, predicate=None):
+        """
+        Finds every key within a radius of a hexagon.
+        Args:
+            h (Hexagon): hexagon to search around.
+            radius (int): how far out to look, in hexes. Keys at exactly this distance are included.
+            predicate (callable): takes a key and its value, and returns False to skip it.
+        Returns:
+            List of the keys, in no particular order.
+        """
+        found = []
+        center = self.bucket(h)
+        visited = 0
+        t = 0
+        while visited < len(self.buckets) and self._min_distance(t) <= radius:
+            for b in self._ring(center, t):
+                keys = self.buckets.get(b)
+                if keys is None:
+                    continue
+                visited += 1
+                for key in keys:
+                    dq = key.q - h.q
+                    dr = key.r - h.r
+                    if abs(dq) + abs(dr) + abs(dq + dr) <= 2 * radius and (predicate is None or predicate(key, self.contents[key])):
+                        found.append(key)
+            t += 1
+        return found
+
+    def __setitem__(self, h, value):
+        if h not in self.contents:
+            self.buckets.setdefault(self.bucket(h), set()).add(h)
+        self.contents[h] = value
+
+    def __delitem__(self, h):
+        del self.contents[h]
+        b = self.bucket(h)
+        keys = self.buckets[b]
+        keys.discard(h)
+        if not keys:
+            del self.buckets[b]
+
+    def __getitem__(self, h):
+        return self.contents[h]
+
+    # Hand back the dictionary's own views, they're a lot quicker to loop over than the generic ones.
+    def keys(self):
+        return self.contents.keys()
+
+    def values(self):
+        return self.contents.values()
+
+    def items(self):
+        return self.contents.items()
+
+    def __contains__(self, h):
+        return h in self.contents
+
+    def __iter__(self):
+        return iter(self.contents)
+
+    def __len__(self):
+        return len(self.contents)
@@ -0,0 +1,158 @@
+import json
+import os
+
+import numpy as np
+from pyglet import image
+
+manifest_name = "manifest.json"
+
+
+def _next_power_of_two(n):
+    p = 1
+    while p < n:
+        p *= 2
+    return p
+
+
+def pack_rectangles(sizes, max_size=1024, padding=1):
+    """
+    Packs rectangles into as few atlases as it can, using shelves: rectangles go left to right in rows, tallest first.
+    Our sprites are all much the same size, so this packs just about as tight as anything fancier would.
+    Args:
+        sizes (dict): key is the sprite id, value is a tuple of (width, height).
+        max_size (int): width and maximum height of an atlas.
+        padding (int): empty pixels kept around every rectangle, so filtering doesn't bleed one sprite into the next.
+    Returns:
+        Tuple of (regions, atlas_sizes). Regions is a dictionary where the key is the sprite id and the value is a tuple of (atlas, x, y, width, height).
+        Atlas_sizes is a list of (width, height) for each atlas, with the height rounded up to a power of two.
+    """
+    regions = {}
+    atlas_sizes = []
+    atlas = -1
+    x = y = shelf_height = max_size  # Forces a new atlas for the first rectangle.
+    # Sorting on the id too keeps the layout the same from run to run.
+    for sprite_id, (w, h) in sorted(sizes.items(), key=lambda s: (-s[1][1], -s[1][0], s[0])):
+        if w + 2 * padding > max_size or h + 2 * padding > max_size:
+            raise ValueError(f"Sprite {sprite_id} is {w}x{h}, which doesn't fit in a {max_size}x{max_size} atlas.")
+        if x + w + padding > max_size:
+            # Start a new shelf.
+            x = padding
+            y += shelf_height + padding
+            shelf_height = 0
+        if y + h + padding > max_size:
+            # And a new atlas.
+            atlas += 1
+            atlas_sizes.append(0)
+            x = y = padding
+            shelf_height = 0
+        regions[sprite_id] = (atlas, x, y, w, h)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+        atlas_sizes[atlas] = max(atlas_sizes[atlas], y + h + padding)
+    return regions, [(max_size, _next_power_of_two(height)) for height in atlas_sizes]
+
+
+def _source_files(path):
+    """
+    Returns:
+        Dictionary where the key is the sprite id and the value is the filename, for every image in path.
+    """
+    return {os.path.splitext(f)[0]: f for f in sorted(os.listdir(path)) if os.path.isfile(os.path.join(path, f))}
+
+
+def _source_stamps(path):
+    """
+    What the atlas was built from, so we can tell when the cached one is out of date.
+    Returns:
+        Dictionary where the key is the filename and the value is a list of [size, mtime].
+    """
+    stamps = {}
+    for f in _source_files(path).values():
+        stat = os.stat(os.path.join(path, f))
+        stamps[f] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def _rgba(img):
+    """
+    Returns:
+        Numpy array of shape (height, width, 4) with the image's pixels, bottom row first like pyglet has them.
+    """
+    data = img.get_data("RGBA", img.width * 4)
+    return np.frombuffer(data, dtype=np.uint8).reshape(img.height, img.width, 4)
+
+
+def build_atlas(path, cache_path, max_size=1024, padding=1):
+    """
+    Packs every image in path into atlas images, and writes them to cache_path with a manifest of where each sprite went.
+    This doesn't need a window, it's all done on the CPU.
+    Args:
+        path (str): sprites directory.
+        cache_path (str): directory to write the atlases and manifest to.
+        max_size (int): width and maximum height of an atlas.
+        padding (int): empty pixels around each sprite.
+    Returns:
+        The manifest, as a dictionary.
+    """
+    images = {sprite_id: image.load(os.path.join(path, f)) for sprite_id, f in _source_files(path).items()}
+    regions, atlas_sizes = pack_rectangles({k: (v.width, v.height) for k, v in images.items()}, max_size, padding)
+    atlases = [np.zeros((h, w, 4), dtype=np.uint8) for w, h in atlas_sizes]
+    for sprite_id, (atlas, x, y, w, h) in regions.items():
+        atlases[atlas][y:y + h, x:x + w] = _rgba(images[sprite_id])
+    os.makedirs(cache_path, exist_ok=True)
+    files = []
+    for idx, pixels in enumerate(atlases):
+        name = f"atlas {idx}.png"
+        h, w, _ = pixels.shape
+        image.ImageData(w, h, "RGBA", pixels.tobytes(), pitch=w * 4).save(os.path.join(cache_path, name))
+        files.append(name)
+    manifest = {
+        "sources": _source_stamps(path),
+        "max_size": max_size,
+        "padding": padding,
+        "atlases": files,
+        "regions": regions,
+    }
+    with open(os.path.join(cache_path, manifest_name), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def cached_manifest(path, cache_path, max_size=1024, padding=1):
+    """
+    Reads the cached manifest, if it's there and still matches the sprites.
+    Returns:
+        The manifest as a dictionary, or None if the atlas needs building.
+    """
+    try:
+        with open(os.path.join(cache_path, manifest_name)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("sources") != _source_stamps(path):
+        return None
+    if manifest.get("max_size") != max_size or manifest.get("padding") != padding:
+        return None
+    if not all(os.path.isfile(os.path.join(cache_path, f)) for f in manifest["atlases"]):
+        return None
+    return manifest
+
+
+def load_atlas(path, cache_path, max_size=1024, padding=1):
+    """
+    Loads the sprites as regions of one or a few atlas textures, building the atlas first if the cached one is missing or stale.
+    Sprites that share a texture can be drawn in one go by a BatchNode.
+    Needs a GL context, so call this after director.init.
+    Args:
+        path (str): sprites directory.
+        cache_path (str): directory the atlases and manifest are cached in.
+        max_size (int): width and maximum height of an atlas.
+        padding (int): empty pixels around each sprite.
+    Returns:
+        Dictionary, with the same keys as load_images, where the value is the sprite's TextureRegion.
+    """
+    manifest = cached_manifest(path, cache_path, max_size, padding)
+    if manifest is None:
+        manifest = build_atlas(path, cache_path, max_size, padding)
+    textures = [image.load(os.path.join(cache_path, f)).get_texture() for f in manifest["atlases"]]
+    return {sprite_id: textures[atlas].get_region(x, y, w, h) for sprite_id, (atlas, x, y, w, h) in manifest["regions"].items()}
@@ -0,0 +1,141 @@
+class SpritePool:
+    """
+    Hands out sprites and takes them back when they're done with, so scrolling doesn't make and throw away thousands of sprites.
+    Sprites are kept per image, so a recycled sprite already has the right image on it.
+    """
+    def __init__(self, images, sprite_class):
+        """
+        Args:
+            images (dict): images, with the key being the sprite id.
+            sprite_class (type): class to make new sprites with, normally cocos.sprite.Sprite.
+        """
+        self.images = images
+        self.sprite_class = sprite_class
+        # Key is the sprite id, value is a list of sprites with that image that aren't being used.
+        self.free = {}
+        self.hits = 0
+        self.misses = 0
+        self.live = 0
+
+    def acquire(self, sprite_id, position, anchor, opacity=255):
+        """
+        Gets a sprite, reusing a free one if there is one.
+        Args:
+            sprite_id (str): id of the image for the sprite.
+            position (Point): position of the sprite.
+            anchor (tuple): image anchor of the sprite.
+            opacity (int): opacity of the sprite, 0 to 255.
+        Returns:
+            A sprite.
+        """
+        free = self.free.get(sprite_id)
+        self.live += 1
+        if free:
+            self.hits += 1
+            sprite = free.pop()
+            sprite.position = position
+            sprite.image_anchor = anchor
+            sprite.opacity = opacity
+            return sprite
+        self.misses += 1
+        return self.sprite_class(self.images[sprite_id], position=position, anchor=anchor, opacity=opacity)
+
+    def release(self, sprite_id, sprite):
+        """
+        Takes a sprite back. It should already be out of its batch.
+        Args:
+            sprite_id (str): id of the image that's on the sprite.
+            sprite (Sprite): the sprite.
+        """
+        sprite.stop()  # Don't let actions keep running on a sprite that's sitting in the pool.
+        self.free.setdefault(sprite_id, []).append(sprite)
+        self.live -= 1
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary of the pool's counters.
+        """
+        return {"hits": self.hits, "misses": self.misses, "live": self.live, "free": sum(len(f) for f in self.free.values())}
+
+
+class SpriteReconciler:
+    """
+    Keeps the sprites in a batch in step with what should be on screen.
+    Remembers every sprite it has put in the batch by name, so drawing only creates, changes or removes the sprites that are different from last time.
+    """
+    def __init__(self, batch, pool, anchor, opacity=255):
+        """
+        Args:
+            batch (BatchNode): batch the sprites go in.
+            pool (SpritePool): pool to get sprites from and give them back to.
+            anchor (tuple): image anchor for the sprites.
+            opacity (int): opacity for the sprites, 0 to 255.
+        """
+        self.batch = batch
+        self.pool = pool
+        self.anchor = anchor
+        self.opacity = opacity
+        # Key is the sprite's name in the batch, value is a tuple of the sprite id, the sprite and its z order.
+        self.sprites = {}
+
+    def show(self, name, sprite_id, position, z=0):
+        """
+        Makes sure a sprite is being shown. An existing sprite with the same name gets a new image if it needs one, instead of being replaced.
+        If its z order changed it's taken out of the batch and put back in, a batch only sorts its children when they're added.
+        Args:
+            name (str): name of the sprite in the batch.
+            sprite_id (str): id of the image to show.
+            position (Point): position of the sprite.
+            z (int): z order of the sprite in the batch.
+        Returns:
+            The sprite.
+        """
+        try:
+            current_id, sprite, current_z = self.sprites[name]
+        except KeyError:
+            sprite = self.pool.acquire(sprite_id, position, self.anchor, self.opacity)
+            self.batch.add(sprite, z=z, name=name)
+            self.sprites[name] = (sprite_id, sprite, z)
+            return sprite
+        if current_id != sprite_id:
+            sprite.image = self.pool.images[sprite_id]
+        if current_z != z:
+            self.batch.remove(name)
+            self.batch.add(sprite, z=z, name=name)
+        if current_id != sprite_id or current_z != z:
+            self.sprites[name] = (sprite_id, sprite, z)
+        if tuple(sprite.position) != tuple(position):
+            sprite.position = position
+        return sprite
+
+    def hide(self, name):
+        """
+        Removes a sprite, if it's being shown, and gives it back to the pool.
+        Args:
+            name (str): name of the sprite in the batch.
+        """
+        shown = self.sprites.pop(name, None)
+        if shown is not None:
+            self.batch.remove(name)
+            self.pool.release(shown[0], shown[1])
+
+    def sync(self, wanted):
+        """
+        Makes the batch show exactly the given sprites.
+        Args:
+            wanted (dict): key is the sprite name, value is a tuple of (sprite_id, position, z).
+        """
+        for name in [n for n in self.sprites if n not in wanted]:
+            self.hide(name)
+        for name, (sprite_id, position, z) in wanted.items():
+            self.show(name, sprite_id, position, z)
+
+    def __getitem__(self, name):
+        return self.sprites[name][1]
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def __len__(self):
+        return len(self.sprites)
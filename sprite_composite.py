@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+from pyglet import image
+
+# The edge sprites, in hex_math.hex_directions order. Bit n of an edge mask is the edge towards neighbour n.
+edge_names = ("right", "bottom right", "bottom left", "left", "top left", "top right")
+
+
+def edge_mask(edges):
+    """
+    Packs which edges of a hex are drawn into a 6 bit mask.
+    Args:
+        edges (iterable): one bool per neighbour, in hex_math.hex_directions order.
+    Returns:
+        Int from 0 to 63.
+    """
+    mask = 0
+    for idx, edge in enumerate(edges):
+        if edge:
+            mask |= 1 << idx
+    return mask
+
+
+def alpha_over(top, bottom):
+    """
+    Draws one RGBA image over another, the same as blending them on screen would.
+    Args:
+        top (numpy.ndarray): float array of shape (height, width, 4), values 0 to 1, not premultiplied.
+        bottom (numpy.ndarray): same, for the image underneath.
+    Returns:
+        Float array of the combined image.
+    """
+    top_alpha = top[..., 3:]
+    bottom_alpha = bottom[..., 3:] * (1 - top_alpha)
+    alpha = top_alpha + bottom_alpha
+    colour = top[..., :3] * top_alpha + bottom[..., :3] * bottom_alpha
+    colour = np.divide(colour, alpha, out=np.zeros_like(colour), where=alpha > 0)
+    return np.concatenate((colour, alpha), axis=-1)
+
+
+class EdgeComposites:
+    """
+    Builds one sprite per combination of edges, so a hex needs a single sprite instead of one per edge.
+    Each style has up to 64 of these. They're only made the first time they're asked for, and added to the sprite images so pooled sprites can use them like any other.
+    """
+    def __init__(self, path, styles, images, pack=None):
+        """
+        Args:
+            path (str): sprites directory to read the edge images from.
+            styles (dict): key is the style name, value is a tuple of (center sprite id or None, list of the six edge sprite ids in edge_names order).
+            images (dict): sprite images, the composites get added to it.
+            pack (callable): takes the composite ImageData and returns the image to store, e.g. a TextureBin's add. Defaults to storing the ImageData.
+        """
+        self.path = path
+        self.styles = styles
+        self.images = images
+        self.pack = pack
+        # Key is a source sprite id, value is its pixels as a float array.
+        self.sources = {}
+        # Key is (style, mask), value is the sprite id of the composite.
+        self.built = {}
+
+    def _pixels(self, sprite_id):
+        try:
+            return self.sources[sprite_id]
+        except KeyError:
+            img = image.load(os.path.join(self.path, f"{sprite_id}.png"))
+            data = img.get_data("RGBA", img.width * 4)
+            pixels = np.frombuffer(data, dtype=np.uint8).reshape(img.height, img.width, 4) / 255.0
+            self.sources[sprite_id] = pixels
+            return pixels
+
+    def composite(self, style, mask):
+        """
+        Builds the pixels for a style and edge mask, without caching them. The center goes underneath, then the edges in order.
+        Returns:
+            Numpy uint8 array of shape (height, width, 4).
+        """
+        center, edges = self.styles[style]
+        layers = [self._pixels(edges[idx]) for idx in range(6) if mask & (1 << idx)]
+        if center is not None:
+            layers.insert(0, self._pixels(center))
+        if not layers:
+            raise ValueError(f"Style {style} has nothing to draw for mask {mask}.")
+        pixels = layers[0]
+        for layer in layers[1:]:
+            pixels = alpha_over(layer, pixels)
+        return np.rint(pixels * 255).astype(np.uint8)
+
+    def sprite_id(self, style, mask):
+        """
+        Finds the sprite id for a style and edge mask, building the composite if this is the first time it's been asked for.
+        Args:
+            style (str): name of the style, a key of styles.
+            mask (int): edge mask, see edge_mask.
+        Returns:
+            Sprite id of the composite, a key in images.
+        """
+        try:
+            return self.built[(style, mask)]
+        except KeyError:
+            pass
+        sprite_id = f"{style} {mask}"
+        pixels = self.composite(style, mask)
+        h, w, _ = pixels.shape
+        img = image.ImageData(w, h, "RGBA", pixels.tobytes(), pitch=w * 4)
+        self.images[sprite_id] = img if self.pack is None else self.pack(img)
+        self.built[(style, mask)] = sprite_id
+        return sprite_id
+
+    def __len__(self):
+        return len(self.built)
@@ -0,0 +1,295 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from opensimplex import OpenSimplex
+
+import hex_math
+import settings
+from hex_math import Hexagon
+
+
+def chunk_coordinates(center, chunk_size):
+    """
+    Finds the axial coordinates of every hex in a chunk, in the same order TerrainChunk has always generated them (row by row).
+    Args:
+        center (Hexagon): anchor hexagon of the chunk.
+        chunk_size (int): size of the chunk.
+    Returns:
+        Tuple of two numpy arrays, (q, r).
+    """
+    half = chunk_size // 2
+    rows = np.arange(-chunk_size // 2, half + 1)
+    columns = np.arange(-half, half + 1)
+    r = np.repeat(rows, len(columns))
+    q = np.tile(columns, len(rows)) - r // 2
+    return q + center.q, r + center.r
+
+
+def chunk_anchor_coordinates(q, r, chunk_size):
+    """
+    Finds the anchor of the chunk that owns the given coordinates, in closed form. Works on ints or numpy arrays.
+    Chunks tile the map in rows chunk_size + 1 hexes tall, and chunk_size hexes wide when measured in q + r // 2, which is what Terrain.chunk_get_next walks.
+    That only tiles when chunk_size is odd, even sized chunks overlap their neighbours by a column.
+    Args:
+        q (int): q coordinate.
+        r (int): r coordinate.
+        chunk_size (int): size of the chunks.
+    Returns:
+        Tuple of the anchor's (q, r) coordinates.
+    """
+    half = chunk_size // 2
+    rows = chunk_size + 1
+    anchor_r = (r + half + 1) // rows * rows
+    column = q + r // 2
+    anchor_column = (column + half) // chunk_size * chunk_size
+    return anchor_column - anchor_r // 2, anchor_r
+
+
+def chunk_anchor(h, chunk_size):
+    """
+    Finds the anchor of the chunk that owns a hexagon, see chunk_anchor_coordinates.
+    Args:
+        h (Hexagon): hexagon we want the chunk of.
+        chunk_size (int): size of the chunks.
+    Returns:
+        Hexagon of the chunk's anchor.
+    """
+    q, r = chunk_anchor_coordinates(h.q, h.r, chunk_size)
+    return Hexagon(q, r, -q - r)
+
+
+def cube_to_offset(q, r):
+    """
+    Array version of hex_math.cube_to_offset.
+    Returns:
+        Tuple of two numpy arrays, (col, row).
+    """
+    return q, r + (q + (q & 1)) // 2
+
+
+def _sorted_bins(bins):
+    """
+    Sorts the terrain bins and drops duplicates, remembering where each bin came from.
+    Duplicates keep the lowest index, which is what the old min() based lookup would pick.
+    Returns:
+        Tuple of the sorted bin values and their indices in the original list.
+    """
+    values = np.asarray(bins, dtype=float)
+    order = np.argsort(values, kind="stable")
+    sorted_values, first = np.unique(values[order], return_index=True)
+    return sorted_values, order[first]
+
+
+def bin_noise(noise_values, bins=None):
+    """
+    Finds the closest bin to each noise value. Ties go to the bin earlier in the list, the same as the scalar lookup.
+    Args:
+        noise_values (numpy.ndarray): noise values, normalized between 0 and 1.
+        bins (list): bins to sort into, defaults to settings.terrain_sprite_bins.
+    Returns:
+        Numpy array of bin indices.
+    """
+    if bins is None:
+        bins = settings.terrain_sprite_bins
+    sorted_values, original = _sorted_bins(bins)
+    # The closest bin has to be one of the two either side of where the value would be inserted.
+    hi = np.searchsorted(sorted_values, noise_values).clip(1, len(sorted_values) - 1)
+    lo = hi - 1
+    d_lo = np.abs(sorted_values[lo] - noise_values)
+    d_hi = np.abs(sorted_values[hi] - noise_values)
+    pick_hi = (d_hi < d_lo) | ((d_hi == d_lo) & (original[hi] < original[lo]))
+    return np.where(pick_hi, original[hi], original[lo])
+
+
+def sample_noise(noise, x, y):
+    """
+    Samples the noise at every point in the given arrays. Opensimplex doesn't have an array API, so this is one tight loop.
+    Args:
+        noise (OpenSimplex): noise generator.
+        x (numpy.ndarray): x coordinates.
+        y (numpy.ndarray): y coordinates.
+    Returns:
+        Numpy array of noise values, rescaled to 0.0 to 1.0.
+    """
+    noise2d = noise.noise2d
+    values = np.fromiter((noise2d(a, b) for a, b in zip(x.tolist(), y.tolist())), dtype=float, count=len(x))
+    return values / 2.0 + 0.5
+
+
+def chunk_terrain(center, chunk_size, noise):
+    """
+    Generates the terrain types for a whole chunk at once.
+    Args:
+        center (Hexagon): anchor hexagon of the chunk.
+        chunk_size (int): size of the chunk.
+        noise (OpenSimplex): terrain noise generator.
+    Returns:
+        Tuple of three numpy arrays, (q, r, terrain_type).
+    """
+    q, r = chunk_coordinates(center, chunk_size)
+    # Normalize to offset grid coordinates, because we want to sample the noise at points right next to each other.
+    col, row = cube_to_offset(q, r)
+    damp = settings.noise_damping_factor
+    noise_values = sample_noise(noise, col * damp, row * damp)
+    return q, r, bin_noise(noise_values)
+
+
+def chunk_terrain_scalar(center, chunk_size, noise):
+    """
+    The original one hex at a time terrain generation. Kept as the reference for chunk_terrain.
+    Returns:
+        Dictionary where the key is the Hexagon and the value is the terrain type as a string.
+    """
+    n_bins = settings.terrain_sprite_bins
+    x_dim, y_dim = (chunk_size, chunk_size)
+    cells = {}
+    r_min = -x_dim // 2
+    r_max = x_dim // 2
+    for r in range(r_min, r_max + 1):
+        r_offset = r // 2
+        q_min = -(y_dim // 2) - r_offset
+        q_max = y_dim // 2 - r_offset
+        for q in range(q_min, q_max + 1):
+            qq = center.q + q
+            rr = center.r + r
+            h = Hexagon(qq, rr, -qq - rr)
+            xy = hex_math.cube_to_offset(h)
+            damp = settings.noise_damping_factor
+            noise_val = noise.noise2d(xy.x * damp, xy.y * damp) / 2.0 + 0.5
+            t = min(range(len(n_bins)), key=lambda i: abs(n_bins[i] - noise_val))
+            cells[h] = str(t)
+    return cells
+
+
+# Noise generators for generate_chunk_data, one per seed per worker process. They take a while to build.
+_worker_noise = {}
+
+
+def generate_chunk_data(random_seed, q, r, chunk_size):
+    """
+    Generates the terrain of a chunk in a worker process.
+    Coordinates are passed as plain ints, because the Hexagon namedtuples don't pickle.
+    Args:
+        random_seed (int): seed for the terrain noise, the same as Terrain.random_seed.
+        q (int): q coordinate of the chunk anchor.
+        r (int): r coordinate of the chunk anchor.
+        chunk_size (int): size of the chunk.
+    Returns:
+        Numpy array of terrain types, in chunk_coordinates order. Compact, so it's cheap to send back.
+    """
+    if random_seed not in _worker_noise:
+        _worker_noise[random_seed] = OpenSimplex(seed=random_seed)
+    _, _, terrain_types = chunk_terrain(Hexagon(q, r, -q - r), chunk_size, _worker_noise[random_seed])
+    return terrain_types.astype(np.uint8)
+
+
+class ChunkPipeline:
+    """
+    Generates chunks in a pool of worker processes, so scrolling doesn't have to wait on the noise.
+    Finished chunks are handed back in the order they were requested, so merging them is deterministic for a given seed and scroll.
+    """
+    def __init__(self, random_seed, chunk_size, workers=None):
+        self.random_seed = random_seed
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.executor = None
+        # Key is the chunk anchor, value is the future for its terrain. Kept in the order the chunks were requested.
+        self.pending = OrderedDict()
+
+    def request(self, anchors):
+        """
+        Queues chunks to be generated. Chunks that are already queued are skipped.
+        Args:
+            anchors (iterable): anchor hexagons of the chunks to generate.
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for anchor in anchors:
+            if anchor not in self.pending:
+                self.pending[anchor] = self.executor.submit(generate_chunk_data, self.random_seed, anchor.q, anchor.r, self.chunk_size)
+
+    def ready(self, budget=None, wait=False):
+        """
+        Finished chunks, in the order they were requested. Stops at the first chunk that isn't done yet, so the order holds.
+        Args:
+            budget (float): seconds to spend handing out chunks, None for no limit.
+            wait (bool): if True, wait for unfinished chunks instead of stopping.
+        Returns:
+            Generator of (anchor, terrain_types) tuples.
+        """
+        start = time.perf_counter()
+        while self.pending:
+            anchor, future = next(iter(self.pending.items()))
+            if not wait and not future.done():
+                break
+            del self.pending[anchor]
+            yield anchor, future.result()
+            if budget is not None and time.perf_counter() - start >= budget:
+                break
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        self.pending.clear()
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class CachedChunkGenerator:
+    """
+    Regenerates the terrain types of chunks from the noise, for chunks that were dropped from memory, see terrain_store.TerrainStore.
+    Chunks come back exactly as they were first generated, because the terrain only depends on the seed, the anchor and settings.
+    The last few chunks are remembered, since a chunk that was just dropped is often needed again straight away.
+    """
+    def __init__(self, chunk_size, noise, cache_size=None):
+        """
+        Args:
+            chunk_size (int): size of the chunks.
+            noise (OpenSimplex): terrain noise generator, the same one the chunks were first generated with.
+            cache_size (int): how many chunks to remember. Defaults to settings.terrain_generator_cache.
+        """
+        self.chunk_size = chunk_size
+        self.noise = noise
+        self.cache_size = settings.terrain_generator_cache if cache_size is None else cache_size
+        # Key is the anchor, value is the chunk's terrain types. Most recently used last.
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, anchor, terrain_types):
+        """
+        Remembers the terrain types of a chunk that's just been generated, so they don't have to be generated again if it's dropped soon.
+        """
+        self.cache[anchor] = terrain_types
+        self.cache.move_to_end(anchor)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def __call__(self, anchor):
+        """
+        Args:
+            anchor (Hexagon): anchor of the chunk.
+        Returns:
+            Numpy uint8 array of the chunk's terrain types, in chunk_coordinates order. Don't change it, it's shared with the cache.
+        """
+        try:
+            terrain_types = self.cache[anchor]
+        except KeyError:
+            self.misses += 1
+            _, _, terrain_types = chunk_terrain(anchor, self.chunk_size, self.noise)
+            terrain_types = terrain_types.astype(np.uint8)
+        else:
+            self.hits += 1
+        self.remember(anchor, terrain_types)
+        return terrain_types
+
+    def __contains__(self, anchor):
+        """
+        Returns:
+            True if the chunk's terrain types are remembered, so getting them doesn't need the noise.
+        """
+        return anchor in self.cache
@@ -0,0 +1,459 @@
+import heapq
+import sys
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+
+import hex_math
+import settings
+import terrain_generation
+from hex_math import Hexagon
+
+# One record per terrain cell.
+# sprite_id is an index into sprite_ids, building is the building_id of the building on the cell, or -1 if there isn't one.
+cell_dtype = np.dtype([
+    ("terrain_type", np.uint8),
+    ("sprite_id", np.uint8),
+    ("safe", np.int16),
+    ("visible", np.int16),
+    ("building", np.int8),
+])
+
+# Terrain sprites go first, so a freshly generated cell's sprite index is the same as its terrain type.
+sprite_ids = [str(t) for t in range(len(settings.terrain_sprite_bins))]
+_sprite_indices = {s: i for i, s in enumerate(sprite_ids)}
+
+
+def sprite_index(sprite_id):
+    """
+    Finds the index for a sprite id, adding it to sprite_ids if we haven't seen it before.
+    Args:
+        sprite_id (str): sprite id, the same as the sprite's filename without extension.
+    Returns:
+        Index of the sprite in sprite_ids.
+    """
+    try:
+        return _sprite_indices[sprite_id]
+    except KeyError:
+        sprite_ids.append(sprite_id)
+        _sprite_indices[sprite_id] = len(sprite_ids) - 1
+        return _sprite_indices[sprite_id]
+
+
+# What numpy adds on top of the cells themselves for each chunk's array.
+_array_overhead = sys.getsizeof(np.zeros(0, dtype=cell_dtype))
+
+
+def new_cells(terrain_types):
+    """
+    Makes the cell array for a new chunk.
+    Args:
+        terrain_types (numpy.ndarray): terrain type for each cell, in terrain_generation.chunk_coordinates order.
+    Returns:
+        Structured numpy array of cell_dtype.
+    """
+    cells = np.zeros(len(terrain_types), dtype=cell_dtype)
+    cells["terrain_type"] = terrain_types
+    cells["sprite_id"] = terrain_types
+    cells["building"] = -1
+    return cells
+
+
+class TerrainCell:
+    """
+    A single terrain cell. This doesn't hold anything itself, reads and writes go straight through to the chunk's cell array.
+    That way hexagon_map[h].visible = 1 and friends work the same as when every cell was its own object.
+    The array is looked up in the store every time, so it's fine to hold on to one while its chunk gets paged out and back in, see TerrainStore.
+    """
+    __slots__ = ("store", "anchor", "index", "hexagon")
+
+    def __init__(self, store, anchor, index, hexagon):
+        self.store = store
+        self.anchor = anchor
+        self.index = index
+        self.hexagon = hexagon
+
+    @property
+    def cells(self):
+        return self.store.chunk_cells(self.anchor)
+
+    @property
+    def terrain_type(self):
+        return str(self.cells["terrain_type"][self.index])
+
+    @terrain_type.setter
+    def terrain_type(self, value):
+        self.store.chunk_cells(self.anchor, write="terrain_type")["terrain_type"][self.index] = int(value)
+
+    @property
+    def sprite_id(self):
+        return sprite_ids[self.cells["sprite_id"][self.index]]
+
+    @sprite_id.setter
+    def sprite_id(self, value):
+        self.store.chunk_cells(self.anchor, write="sprite_id")["sprite_id"][self.index] = sprite_index(value)
+
+    @property
+    def safe(self):
+        return int(self.cells["safe"][self.index])
+
+    @safe.setter
+    def safe(self, value):
+        self.store.chunk_cells(self.anchor, write="safe")["safe"][self.index] = value
+
+    @property
+    def visible(self):
+        return int(self.cells["visible"][self.index])
+
+    @visible.setter
+    def visible(self, value):
+        self.store.chunk_cells(self.anchor, write="visible")["visible"][self.index] = value
+
+    @property
+    def building(self):
+        return self.store.buildings.get(self.hexagon)
+
+    @building.setter
+    def building(self, building):
+        self.store.chunk_cells(self.anchor, write="building")["building"][self.index] = -1 if building is None else building.building_id
+
+    def __str__(self):
+        return f"Terrain: {self.terrain_type}, id: {self.sprite_id}, building: {self.building}, safe: {self.safe}, visible: {self.visible}"
+
+
+class PageFile:
+    """
+    Keeps chunks that have been paged out of memory on disk, one fixed size record of cells per chunk, through a numpy memmap.
+    A chunk keeps its record once it has one, so paging it out again just writes over it.
+    The file is a temporary one, it goes away when the game exits.
+    """
+    def __init__(self, record_length, directory=None):
+        """
+        Args:
+            record_length (int): cells per chunk.
+            directory (str): where to put the file. None uses the system's temp directory.
+        """
+        self.record_length = record_length
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.records = None
+        self.capacity = 0
+        # Key is the anchor of the chunk, value is its record number.
+        self.slots = {}
+
+    def write(self, anchor, cells):
+        """
+        Writes a chunk's cells to its record, giving it one if it hasn't got one yet.
+        Args:
+            anchor (Hexagon): anchor of the chunk.
+            cells (numpy.ndarray): the chunk's cells.
+        """
+        slot = self.slots.get(anchor)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == self.capacity:
+                self._grow()
+            self.slots[anchor] = slot
+        self.records[slot] = cells
+
+    def read(self, anchor):
+        """
+        Returns:
+            A copy in memory of the chunk's cells.
+        Raises:
+            KeyError if the chunk was never written.
+        """
+        return np.array(self.records[self.slots[anchor]])
+
+    def _grow(self):
+        # Doubling, so growing the file and mapping it again doesn't happen often.
+        self.capacity = max(64, self.capacity * 2)
+        if self.records is not None:
+            self.records.flush()
+        self.file.truncate(self.capacity * self.record_length * cell_dtype.itemsize)
+        self.records = np.memmap(self.file, dtype=cell_dtype, mode="r+", shape=(self.capacity, self.record_length))
+
+    def __len__(self):
+        return len(self.slots)
+
+
+class TerrainStore(Mapping):
+    """
+    Stores the terrain as one structured array per chunk, instead of an object per hex.
+    Works like a dictionary where the key is a Hexagon and the value is a TerrainCell.
+    Only so many chunks are kept in memory, see max_resident_mb. The ones that have been out of view longest get paged out to a PageFile, and paged back in when anything touches them,
+    with everything on them (buildings, safe, visible) just as it was.
+    With a generator, chunks aren't paged out at all. They're thrown away and regenerated from the noise, and only the cells that changed since they were generated are kept, in deltas.
+    Chunks that haven't changed since they were generated cost nothing to throw away, so they go as soon as they leave the view instead of waiting for the limit.
+    Fields that mirror a Coverage, see coverage, are set from it whenever a chunk comes in, so they don't count as changes.
+    """
+    def __init__(self, chunk_size, buildings, max_resident_mb=None, page_dir=None, generator=None, coverage=None):
+        """
+        Args:
+            chunk_size (int): size of the chunks being stored.
+            buildings (dict): the terrain's buildings, so cells can find the building on them.
+            max_resident_mb (float): most memory, in MB, the chunks in memory can take. Defaults to settings.max_resident_terrain_mb, None there means no limit.
+            page_dir (str): where the page file goes, defaults to settings.terrain_page_dir.
+            generator (terrain_generation.CachedChunkGenerator): regenerates chunks that were thrown away. If None, they're paged out to disk instead.
+            coverage (dict): key is a cell field, like "visible", value is the Coverage it mirrors. Chunks get those fields set from it when they're added or paged back in,
+                so whoever keeps them in step only has to write to the chunks in memory.
+        """
+        self.chunk_size = chunk_size
+        self.buildings = buildings
+        # Key is the anchor hexagon of a chunk, value is the chunk's cell array, or None if it's been paged out.
+        # Paged out chunks are still here, so checking whether a chunk exists doesn't have to care where it is.
+        self.chunks = {}
+        self.cells_per_chunk = len(terrain_generation.chunk_coordinates(Hexagon(0, 0, 0), chunk_size)[0])
+        self.chunk_bytes = self.cells_per_chunk * cell_dtype.itemsize + _array_overhead
+        self.max_resident_mb = settings.max_resident_terrain_mb if max_resident_mb is None else max_resident_mb
+        self.page_dir = settings.terrain_page_dir if page_dir is None else page_dir
+        # Made the first time a chunk is paged out.
+        self.page_file = None
+        self.generator = generator
+        self.coverage = {} if coverage is None else coverage
+        # The fields that get kept in deltas. The coverage fields are worked out again anyway.
+        self.delta_fields = [f for f in cell_dtype.names if f not in self.coverage]
+        # Key is the anchor of a chunk that was thrown away, value is a tuple of (indices, cells) for the cells that differ from a freshly generated chunk.
+        # Chunks with nothing changed aren't in here at all, they're just generated again.
+        self.deltas = {}
+        # Indices into a chunk's cells, small enough for every cell in a chunk.
+        self.delta_dtype = np.min_scalar_type(self.cells_per_chunk - 1)
+        # Anchors of the chunks in memory that nothing has been written to since they were generated, with a generator.
+        self.pristine = set()
+        # Anchors of the chunks in view at the last touch.
+        self.in_view = set()
+        # Key is the anchor of a chunk in memory, value is the clock when it was last in view or paged in.
+        self.last_used = {}
+        # Goes up every time the view tells us which chunks it can see, see touch.
+        self.clock = 0
+        self.page_ins = 0
+        self.page_outs = 0
+        # Called with the anchor of every chunk that gets paged out, e.g. so the pixel cache can drop it too.
+        self.eviction_listeners = []
+
+    def anchor(self, h):
+        """
+        Finds the anchor of the chunk a hexagon belongs to, whether or not that chunk exists yet.
+        Args:
+            h (Hexagon): hexagon to find the chunk of.
+        Returns:
+            Hexagon of the chunk's anchor.
+        """
+        return terrain_generation.chunk_anchor(h, self.chunk_size)
+
+    def add_chunk(self, anchor, cells):
+        """
+        Adds a chunk's cells to the store.
+        Args:
+            anchor (Hexagon): anchor hexagon of the chunk.
+            cells (numpy.ndarray): the chunk's cells, see new_cells.
+        Raises:
+            ValueError if the chunk would overlap a chunk we already have.
+        """
+        if self.anchor(anchor) != anchor:
+            raise ValueError(f"Chunk at {anchor} isn't on the chunk grid, it would overlap its neighbours.")
+        if anchor in self.chunks:
+            raise ValueError(f"Chunk at {anchor} already exists.")
+        self._cover(anchor, cells)
+        self.chunks[anchor] = cells
+        self.last_used[anchor] = self.clock
+        if self.generator is not None:
+            # So the generator doesn't have to work it out again to compare against when this chunk gets thrown away.
+            self.generator.remember(anchor, cells["terrain_type"].copy())
+            self.pristine.add(anchor)
+        # Whoever added it is probably about to write to it, so it stays for now even if it's out of view.
+        self._shrink(keep=anchor)
+
+    def touch(self, anchors):
+        """
+        Marks chunks as in view. Chunks in view at the last touch never get paged out, and the rest get paged out if there are too many.
+        With a generator and a limit, chunks that just left the view and haven't changed since they were generated get thrown away straight away.
+        Args:
+            anchors (iterable): anchors of the chunks in view. Ones that don't exist or aren't in memory are skipped.
+        """
+        self.clock += 1
+        last_used = self.last_used
+        in_view = set(anchors)
+        for anchor in in_view:
+            if anchor in last_used:
+                last_used[anchor] = self.clock
+        left = self.in_view - in_view
+        self.in_view = in_view
+        # With no limit everything stays in memory, the same as without a generator.
+        if self.generator is not None and self.max_resident_mb is not None:
+            for anchor in left:
+                if anchor in last_used and self._is_pristine(anchor):
+                    self._page_out(anchor)
+        self._shrink()
+
+    def _is_pristine(self, anchor):
+        """
+        True if a chunk in memory is the same as it was generated, so throwing it away doesn't need a delta.
+        Chunks that have been written to get compared, but only if the generator remembers them, generating a chunk just to find out isn't worth it.
+        """
+        if anchor in self.pristine:
+            return True
+        if anchor not in self.generator:
+            return False
+        if not self._changed(self.chunks[anchor], new_cells(self.generator(anchor))).any():
+            self.pristine.add(anchor)
+            return True
+        return False
+
+    def _changed(self, cells, fresh):
+        """
+        Returns:
+            Boolean array, True for the cells that differ from a freshly generated chunk in anything but the coverage fields.
+        """
+        if not self.coverage:
+            return cells != fresh
+        changed = np.zeros(len(cells), dtype=bool)
+        for field in self.delta_fields:
+            changed |= cells[field] != fresh[field]
+        return changed
+
+    def _cover(self, anchor, cells):
+        """
+        Sets a chunk's coverage fields from the coverage, 1 where it's covered and 0 where it isn't.
+        """
+        if not self.coverage:
+            return
+        q, r = terrain_generation.chunk_coordinates(anchor, self.chunk_size)
+        keys = (q * hex_math.key_stride + r).tolist()
+        for field, covers in self.coverage.items():
+            cells[field] = covers.covered_keys(keys)
+
+    def _page_in(self, anchor):
+        if self.generator is None:
+            cells = self.page_file.read(anchor)
+        else:
+            cells = new_cells(self.generator(anchor))
+            # The chunk in memory is the only copy of the changes now, they get worked out again if it's thrown away again.
+            delta = self.deltas.pop(anchor, None)
+            if delta is None:
+                self.pristine.add(anchor)
+            else:
+                indices, changed = delta
+                cells[indices] = changed
+        # The coverage may have changed while it was out, and nothing writes to chunks that aren't in memory.
+        self._cover(anchor, cells)
+        self.chunks[anchor] = cells
+        self.last_used[anchor] = self.clock
+        self.page_ins += 1
+        # Not this one though, it was paged in to be read or written.
+        self._shrink(keep=anchor)
+        return cells
+
+    def _page_out(self, anchor):
+        cells = self.chunks[anchor]
+        if self.generator is not None:
+            # Nothing to keep for a chunk that's still the way it was generated.
+            if anchor not in self.pristine:
+                indices = np.flatnonzero(self._changed(cells, new_cells(self.generator(anchor))))
+                if len(indices):
+                    self.deltas[anchor] = (indices.astype(self.delta_dtype), cells[indices])
+        else:
+            if self.page_file is None:
+                self.page_file = PageFile(self.cells_per_chunk, self.page_dir)
+            self.page_file.write(anchor, cells)
+        self.chunks[anchor] = None
+        del self.last_used[anchor]
+        self.pristine.discard(anchor)
+        self.page_outs += 1
+        for listener in self.eviction_listeners:
+            listener(anchor)
+
+    def _shrink(self, keep=None):
+        """
+        Pages chunks out if there are more in memory than max_resident_mb allows, oldest first. Chunks in view stay, even if that leaves us over the limit.
+        Goes a tenth under the limit, so it isn't paging one chunk out for every chunk that comes in.
+        Args:
+            keep (Hexagon): anchor of a chunk that has to stay in memory as well, like one that was just paged in.
+        """
+        if self.max_resident_mb is None:
+            return
+        limit = int(self.max_resident_mb * 2 ** 20 // self.chunk_bytes)
+        if len(self.last_used) <= limit:
+            return
+        excess = len(self.last_used) - limit * 9 // 10
+        in_view = self.in_view
+        # Going by in_view and not the clock, so this works the same when nothing calls touch, like a headless game.
+        out_of_view = [item for item in self.last_used.items() if item[0] not in in_view and item[0] != keep]
+        for anchor, _ in heapq.nsmallest(excess, out_of_view, key=lambda item: item[1]):
+            self._page_out(anchor)
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary of how many chunks are in memory and paged out, how much memory they take, and how much paging there's been.
+        """
+        resident = len(self.last_used)
+        return {
+            "resident": resident,
+            "paged": len(self.chunks) - resident,
+            "resident_mb": resident * self.chunk_bytes / 2 ** 20,
+            "page_file_mb": 0 if self.page_file is None else len(self.page_file) * self.cells_per_chunk * cell_dtype.itemsize / 2 ** 20,
+            "page_ins": self.page_ins,
+            "page_outs": self.page_outs,
+            "deltas": len(self.deltas),
+            "delta_cells": sum(len(indices) for indices, _ in self.deltas.values()),
+        }
+
+    def chunk_hexes(self, anchor):
+        """
+        Returns:
+            List of the hexagons in the chunk with the given anchor, in the same order as its cells.
+        """
+        q, r = terrain_generation.chunk_coordinates(anchor, self.chunk_size)
+        return [Hexagon(qq, rr, -qq - rr) for qq, rr in zip(q.tolist(), r.tolist())]
+
+    def cell_index(self, h, anchor):
+        """
+        Where a hexagon is in its chunk's cell array. The inverse of terrain_generation.chunk_coordinates.
+        Args:
+            h (Hexagon): hexagon to find.
+            anchor (Hexagon): anchor of the chunk the hexagon is in.
+        Returns:
+            Index into the chunk's cell array.
+        """
+        half = self.chunk_size // 2
+        r = h.r - anchor.r
+        row = r - (-self.chunk_size // 2)
+        column = h.q - anchor.q + r // 2 + half
+        return row * (2 * half + 1) + column
+
+    def chunk_cells(self, anchor, write=None):
+        """
+        Gets a chunk's cell array, paging it back in if it's out.
+        Args:
+            anchor (Hexagon): anchor of the chunk.
+            write (str): the field about to be changed, None if the cells are only being read. Changing anything but a coverage field means the chunk can't be thrown away for free any more.
+        Returns:
+            The chunk's cells, see new_cells.
+        Raises:
+            KeyError if there's no chunk there.
+        """
+        cells = self.chunks[anchor]
+        if cells is None:
+            cells = self._page_in(anchor)
+        if write is not None and write not in self.coverage:
+            self.pristine.discard(anchor)
+        return cells
+
+    def __getitem__(self, h):
+        anchor = self.anchor(h)
+        try:
+            self.chunk_cells(anchor)
+        except KeyError:
+            raise KeyError(h) from None
+        return TerrainCell(self, anchor, self.cell_index(h, anchor), h)
+
+    def __contains__(self, h):
+        return self.anchor(h) in self.chunks
+
+    def __iter__(self):
+        for anchor in list(self.chunks):
+            yield from self.chunk_hexes(anchor)
+
+    def __len__(self):
+        return len(self.chunks) * self.cells_per_chunk
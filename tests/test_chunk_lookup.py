@@ -0,0 +1,64 @@
+"""
+Properties of terrain_generation.chunk_anchor, the closed form hex to chunk lookup, over a million random hexes per chunk size.
+"""
+import numpy as np
+import pytest
+
+import terrain_generation
+import terrain_store
+from hex_math import Hexagon
+from world import Terrain
+
+chunk_sizes = (1, 3, 11, 31, 63)
+samples = 1_000_000
+coordinate_range = 10 ** 6
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(42)
+
+
+@pytest.mark.parametrize("chunk_size", chunk_sizes)
+def test_every_hex_is_inside_its_chunk(chunk_size, rng):
+    q = rng.integers(-coordinate_range, coordinate_range, size=samples)
+    r = rng.integers(-coordinate_range, coordinate_range, size=samples)
+    anchor_q, anchor_r = terrain_generation.chunk_anchor_coordinates(q, r, chunk_size)
+    # The same rows and columns chunk_coordinates makes.
+    dr = r - anchor_r
+    dc = q - anchor_q + dr // 2
+    assert np.all((dr >= -chunk_size // 2) & (dr <= chunk_size // 2))
+    assert np.all((dc >= -(chunk_size // 2)) & (dc <= chunk_size // 2))
+    # Anchors are their own anchors.
+    again_q, again_r = terrain_generation.chunk_anchor_coordinates(anchor_q, anchor_r, chunk_size)
+    assert np.array_equal(again_q, anchor_q)
+    assert np.array_equal(again_r, anchor_r)
+
+
+@pytest.mark.parametrize("chunk_size", chunk_sizes)
+def test_chunks_tile_without_overlapping(chunk_size, rng):
+    for q, r in rng.integers(-coordinate_range, coordinate_range, size=(200, 2)).tolist():
+        anchor = terrain_generation.chunk_anchor(Hexagon(q, r, -q - r), chunk_size)
+        cq, cr = terrain_generation.chunk_coordinates(anchor, chunk_size)
+        assert len(set(zip(cq.tolist(), cr.tolist()))) == len(cq)
+        aq, ar = terrain_generation.chunk_anchor_coordinates(cq, cr, chunk_size)
+        assert np.all(aq == anchor.q) and np.all(ar == anchor.r)
+
+
+@pytest.mark.parametrize("chunk_size", [11, 31])
+def test_walking_the_chunks_stays_on_the_grid(chunk_size):
+    terrain = Terrain(chunk_size)
+    anchor = Hexagon(0, 0, 0)
+    for direction in ("up", "right", "down", "down", "left", "left", "up", "up") * 10:
+        anchor = terrain.chunk_get_next(anchor, direction)
+        assert terrain_generation.chunk_anchor(anchor, chunk_size) == anchor
+
+
+def test_store_refuses_overlapping_chunks():
+    store = terrain_store.TerrainStore(11, {}, max_resident_mb=None)
+    cells = terrain_store.new_cells(np.zeros(store.cells_per_chunk, dtype=np.uint8))
+    store.add_chunk(Hexagon(0, 0, 0), cells)
+    with pytest.raises(ValueError):
+        store.add_chunk(Hexagon(0, 0, 0), cells.copy())
+    with pytest.raises(ValueError):
+        store.add_chunk(Hexagon(3, 0, -3), cells.copy())
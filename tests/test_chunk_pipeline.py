@@ -0,0 +1,64 @@
+"""
+The background chunk pipeline has to give the same terrain as generating chunks on the spot, in the order they were asked for.
+"""
+import numpy as np
+import pytest
+from opensimplex import OpenSimplex
+
+import hex_math
+import terrain_generation
+from hex_math import Hexagon
+from world import Terrain
+
+seed = 42
+chunk_size = 11
+
+
+def anchor(i, j):
+    r = j * (chunk_size + 1)
+    q = i * chunk_size - r // 2
+    return Hexagon(q, r, -q - r)
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = terrain_generation.ChunkPipeline(seed, chunk_size, workers=1)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_pipeline_matches_generating_in_process(pipeline):
+    noise = OpenSimplex(seed=seed)
+    anchors = [anchor(i, j) for i, j in ((0, 0), (3, -2), (-4, 1), (1, 5), (-2, -3))]
+    pipeline.request(anchors)
+    ready = list(pipeline.ready(wait=True))
+    assert [a for a, _ in ready] == anchors
+    for a, terrain_types in ready:
+        _, _, expected = terrain_generation.chunk_terrain(a, chunk_size, noise)
+        assert terrain_types.dtype == np.uint8
+        assert np.array_equal(terrain_types, expected)
+    assert len(pipeline) == 0
+
+
+def test_pipeline_skips_chunks_already_queued(pipeline):
+    pipeline.request([anchor(0, 0), anchor(1, 0)])
+    pipeline.request([anchor(1, 0), anchor(0, 0), anchor(2, 0)])
+    assert list(pipeline.pending) == [anchor(0, 0), anchor(1, 0), anchor(2, 0)]
+
+
+def test_filling_the_viewport_is_deterministic():
+    visible_hexes = set(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 20))
+    filled = Terrain(chunk_size, seed)
+    filled.chunk_pipeline.workers = 1
+    try:
+        filled.fill_viewport_chunks(Hexagon(0, 0, 0), visible_hexes, direction="right", wait=True)
+    finally:
+        filled.chunk_pipeline.shutdown()
+    direct = Terrain(chunk_size, seed)
+    for a in sorted(filled.chunk_list):
+        direct.generate_chunk(a)
+    assert len(filled.chunk_list) > 1
+    assert filled.chunk_list.keys() == direct.chunk_list.keys()
+    for a, cells in direct.chunk_list.items():
+        assert np.array_equal(filled.chunk_list[a], cells)
+    assert dict(filled.city_cores.items()) == dict(direct.city_cores.items())
@@ -0,0 +1,110 @@
+"""
+connectivity.Connectivity against flooding the whole network from the root, on small random networks and on 100k node ones.
+"""
+import random
+
+import pytest
+
+import hex_math
+import headless
+from connectivity import Connectivity
+from hex_math import Hexagon, hex_key, key_directions
+from world import Building
+
+
+def flood(network, root):
+    """
+    Everything connected to the root, the slow and obvious way.
+    """
+    seen = {root}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        for d in key_directions:
+            n = current + d
+            if n in network and n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return seen
+
+
+def edit_and_check(c, network, keys, rng, edits, check_every):
+    """
+    Adds and removes random nodes, keeping every node's powered state up to date from the reported changes alone.
+    Every change reported has to be a real one, and every check_every edits the states have to match a flood.
+    """
+    root = c.root
+    connected = flood(network, root)
+    powered = {key: key in connected for key in network}
+    for n in range(edits):
+        key = rng.choice(keys)
+        if key == root:
+            continue
+        if key in network:
+            changed = c.remove(key)
+            network.discard(key)
+            powered.pop(key)
+            assert key not in changed
+        else:
+            changed = c.add(key)
+            network.add(key)
+            # The new node is always reported, whether it's powered or not.
+            assert key in changed
+        for k, state in changed.items():
+            assert powered.get(k) != state, "Reported a node that didn't change."
+            powered[k] = state
+        if n % check_every == 0:
+            connected = flood(network, root)
+            assert powered == {k: k in connected for k in network}
+            assert all(c.powered(k) == powered[k] for k in network)
+
+
+def test_random_networks_match_a_flood():
+    rng = random.Random(1)
+    keys = [hex_key(h) for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), 10)]
+    root = hex_key(Hexagon(0, 0, 0))
+    c = Connectivity(root)
+    network = {root}
+    edit_and_check(c, network, keys, rng, 3000, 1)
+
+
+def line(nodes):
+    return [hex_key(Hexagon(q, 0, -q)) for q in range(nodes)]
+
+
+def filled_hexagon(nodes):
+    radius = 1
+    while 3 * radius * (radius + 1) + 1 < nodes:
+        radius += 1
+    return [hex_key(h) for h in sorted(hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius), key=hex_math.hex_length)]
+
+
+@pytest.mark.parametrize("shape", [line, filled_hexagon])
+def test_100k_node_networks(shape):
+    keys = shape(100_000)
+    c = Connectivity(keys[0])
+    for k in keys[1:]:
+        assert c.add(k) == {k: True}
+    network = set(keys)
+    assert all(c.powered(k) for k in keys)
+    edit_and_check(c, network, keys, random.Random(2), 40, 8)
+
+
+def test_towers_follow_their_power():
+    simulation = headless.new_game(42, 11, 20)
+    terrain = simulation.terrain
+    for q in range(1, 10):
+        simulation.plop_network(Hexagon(q, 0, -q))
+    tower = Hexagon(10, 0, -10)
+    simulation.plop_building(tower, Building(3))
+    sensor = Hexagon(10, 1, -11)
+    simulation.plop_building(sensor, Building(4))
+    assert ("protection tower", tower) in terrain.safety.sources
+    assert ("sensor tower", sensor) in terrain.vision.sources
+    # Cutting the line powers everything past it down, and only that.
+    flipped = simulation.network.remove_node(Hexagon(5, 0, -5))
+    assert flipped == {Hexagon(q, 0, -q) for q in range(6, 11)} | {sensor}
+    assert ("protection tower", tower) not in terrain.safety.sources
+    assert ("sensor tower", sensor) not in terrain.vision.sources
+    assert simulation.network.add_node(Hexagon(5, 0, -5), "energy", True) == flipped
+    assert ("protection tower", tower) in terrain.safety.sources
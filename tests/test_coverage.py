@@ -0,0 +1,90 @@
+"""
+coverage.Coverage against recounting every disc from scratch.
+"""
+import random
+
+import pytest
+
+import hex_math
+from coverage import Coverage
+from hex_math import Hexagon
+
+
+def recount(sources):
+    counts = {}
+    for center, radius in sources.values():
+        for h in hex_math.get_hex_chunk(center, radius):
+            counts[h] = counts.get(h, 0) + 1
+    return counts
+
+
+def covered(vision):
+    return set(map(hex_math.key_to_hex, vision.counts.data))
+
+
+def random_hex(rng, spread):
+    q = rng.randint(-spread, spread)
+    r = rng.randint(-spread, spread)
+    return Hexagon(q, r, -q - r)
+
+
+@pytest.mark.parametrize("radius", [0, 1, 3, 9])
+def test_moves_match_a_recount(radius):
+    rng = random.Random(radius)
+    vision = Coverage()
+    for i in range(20):
+        vision.add(i, random_hex(rng, 15), radius)
+    for n in range(500):
+        i = rng.randrange(20)
+        center = vision.sources[i][0]
+        # Mostly a step at a time like a unit walking, sometimes a jump, sometimes staying put.
+        roll = rng.random()
+        if roll < 0.8:
+            new = hex_math.hex_neighbor(center, rng.randrange(6))
+        elif roll < 0.95:
+            new = random_hex(rng, 15)
+        else:
+            new = center
+        before = covered(vision)
+        on, off = vision.move(i, new)
+        after = covered(vision)
+        assert on == after - before
+        assert off == before - after
+        if n % 25 == 0:
+            expected = recount(vision.sources)
+            assert {hex_math.key_to_hex(k): c for k, c in vision.counts.data.items()} == expected
+
+
+def test_add_and_remove_flips():
+    rng = random.Random(5)
+    vision = Coverage()
+    for n in range(300):
+        source = rng.randrange(20)
+        before = covered(vision)
+        if source in vision:
+            on, off = vision.remove(source)
+        else:
+            on, off = vision.add(source, random_hex(rng, 10), rng.randrange(5))
+        after = covered(vision)
+        assert on == after - before
+        assert off == before - after
+    expected = recount(vision.sources)
+    assert {hex_math.key_to_hex(k): c for k, c in vision.counts.data.items()} == expected
+    with pytest.raises(KeyError):
+        source = next(iter(vision.sources))
+        vision.add(source, Hexagon(0, 0, 0), 1)
+
+
+def test_edge_masks():
+    vision = Coverage()
+    vision.add("a", Hexagon(0, 0, 0), 2)
+    vision.add("b", Hexagon(4, -1, -3), 1)
+    area = covered(vision)
+    for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), 7):
+        expected = 0
+        if h in area:
+            for idx in range(6):
+                if hex_math.hex_neighbor(h, idx) not in area:
+                    expected |= 1 << idx
+        assert vision.edge_mask(h) == expected
+        assert vision.covered(h) == (h in area)
@@ -0,0 +1,135 @@
+"""
+pathfinding.FlowField: shortest distances to the nearest target around obstacles, and incremental changes that end up where a rebuild would.
+"""
+import random
+
+import hex_math
+import headless
+import pathfinding
+from hex_math import Hexagon, hex_key, key_directions
+from world import Building
+
+radius = 25
+
+
+def brute_force_distances(sources, blocked, max_distance):
+    """
+    Plain breadth first search out from every source at once.
+    """
+    distance = {s: 0 for s in sources}
+    frontier = list(sources)
+    while frontier:
+        next_frontier = []
+        for key in frontier:
+            d = distance[key] + 1
+            if d > max_distance:
+                continue
+            for direction in key_directions:
+                n = key + direction
+                if n not in distance and n not in blocked:
+                    distance[n] = d
+                    next_frontier.append(n)
+        frontier = next_frontier
+    return distance
+
+
+def check_owned(field):
+    owned = {}
+    for key, source in field.source_of.items():
+        owned.setdefault(source, set()).add(key)
+    assert owned == {s: keys for s, keys in field.owned.items() if keys}
+    assert set(field.owned) == field.sources
+
+
+def random_keys(rng, count):
+    return [hex_key(h) for h in rng.sample(hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius), count)]
+
+
+def test_distances_go_around_obstacles():
+    rng = random.Random(1)
+    blocked = set(random_keys(rng, 500))
+    sources = [k for k in random_keys(rng, 8) if k not in blocked]
+    field = pathfinding.FlowField(max_distance=20, passable=lambda key: key not in blocked)
+    field.add_sources(sources)
+    assert field.distance == brute_force_distances(sources, blocked, 20)
+    check_owned(field)
+    for key in field.distance:
+        path = field.path(hex_math.key_to_hex(key), include_start=True)
+        assert len(path) - 1 == field.distance[key]
+        assert hex_key(path[-1]) in field.sources
+        assert not any(hex_key(h) in blocked for h in path[1:-1])
+
+
+def test_incremental_changes_match_a_rebuild():
+    rng = random.Random(2)
+    blocked = set()
+    field = pathfinding.FlowField(max_distance=15, passable=lambda key: key not in blocked)
+    field.add_sources(random_keys(rng, 5))
+    spots = random_keys(rng, 400)
+    for n in range(300):
+        key = rng.choice(spots)
+        roll = rng.random()
+        if roll < 0.3:
+            field.add_sources([key])
+        elif roll < 0.5 and len(field.sources) > 1:
+            field.remove_sources([rng.choice(sorted(field.sources))])
+        else:
+            # A building going up or coming down.
+            if key in blocked:
+                blocked.discard(key)
+            else:
+                blocked.add(key)
+            field.refresh([key])
+        if n % 10 == 0:
+            fresh = pathfinding.FlowField(max_distance=15, passable=lambda key: key not in blocked)
+            fresh.add_sources(field.sources)
+            assert field.distance == fresh.distance
+            check_owned(field)
+
+
+def test_enemies_go_around_cores_to_their_target():
+    simulation = headless.new_game(42, 11, 30)
+    terrain = simulation.terrain
+    # A wall of enemy cores between the enemy and the friendly core, with a gap at the end. Cores aren't targets, so nobody can walk through them.
+    wall = [Hexagon(5, r, -5 - r) for r in range(-12, 12)]
+    assert not set(wall) & set(terrain.buildings)
+    for h in wall:
+        terrain.add_building(h, Building(6))
+    start = Hexagon(10, 0, -10)
+    path = simulation.flow_field.path(start)
+    assert path is not None
+    assert path[-1] == Hexagon(0, 0, 0)
+    assert not set(path) & set(wall)
+    for a, b in zip([start] + path, path):
+        assert hex_math.hex_distance(a, b) == 1
+    # Taking the wall down lets them straight through again.
+    for h in wall:
+        terrain.remove_building(h)
+    assert len(simulation.flow_field.path(start)) == 10
+
+
+def test_placements_keep_the_targets_in_step():
+    simulation = headless.new_game(42, 11, 20)
+    rng = random.Random(3)
+    spots = [h for h in hex_math.get_hex_chunk(Hexagon(0, 0, 0), 12) if h not in simulation.terrain.buildings]
+    for n in range(300):
+        cell = rng.choice(spots)
+        roll = rng.random()
+        if roll < 0.35:
+            simulation.plop_network(cell)
+        elif roll < 0.55:
+            simulation.plop_building(cell, Building(rng.choice((1, 3, 4))))
+        elif roll < 0.8:
+            simulation.remove_network(cell)
+        else:
+            simulation.remove_building(cell)
+        # Nodes, and buildings with their node taken out from under them, are targets. Cores never are.
+        expected = {hex_key(k) for k in simulation.network.network}
+        expected.update(hex_key(k) for k, v in simulation.terrain.buildings.items() if v.building_id not in (0, 6))
+        assert simulation.flow_field.sources == expected
+        if n % 20 == 0:
+            building_keys = simulation.building_keys
+            fresh = pathfinding.FlowField(passable=lambda key: key not in building_keys)
+            fresh.add_sources(expected)
+            assert simulation.flow_field.distance == fresh.distance
+            check_owned(simulation.flow_field)
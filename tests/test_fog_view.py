@@ -0,0 +1,74 @@
+"""
+map_views.FogView redrawing only the hexes that changed, against drawing everything in view from scratch.
+"""
+import random
+
+import helpers
+import hex_math
+from benchmarks.terrain_sprites import FakeScroller, StubBatch, StubSprite, layout, sprite_height, sprite_width
+from coverage import Coverage
+from hex_math import Hexagon
+from map_views import FogView
+from pixel_cache import PixelCache
+from sprite_cache import SpritePool, SpriteReconciler
+
+
+def make_view(hexagon_map, vision, positions, visible_hexes):
+    batch = StubBatch()
+    sprites = SpriteReconciler(batch, SpritePool({"fog": "fog"}, StubSprite), (sprite_width / 2, sprite_height / 2), opacity=223)
+    return batch, FogView(sprites, hexagon_map, vision, positions, visible_hexes)
+
+
+def on_screen(batch):
+    return {name: tuple(sprite.position) for name, sprite in batch.children.items()}
+
+
+def test_incremental_fog_matches_a_full_redraw():
+    rng = random.Random(4)
+    # Some of the map in view hasn't been generated, and gets no fog.
+    # Only membership matters to FogView, a set does for the generated hexes.
+    hexagon_map = set(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 30))
+    area = sorted(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 15))
+    vision = Coverage()
+    for i in range(30):
+        vision.add(i, rng.choice(area), 3)
+    scroller = FakeScroller()
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    tracker.update(scroller)
+    positions = PixelCache(layout, 11)
+    batch, view = make_view(hexagon_map, vision, positions, tracker.hexes)
+    view.draw()
+    assert batch.children
+    for frame in range(60):
+        for i in rng.sample(range(30), 10):
+            center = vision.sources[i][0]
+            seen, fogged = vision.move(i, hex_math.hex_neighbor(center, rng.randrange(6)))
+            view.draw(seen | fogged)
+        if frame % 5 == 0:
+            scroller.fx += rng.choice((-64, 64))
+            scroller.fy += rng.choice((-48, 48))
+            entering, leaving = tracker.update(scroller)
+            view.draw(entering | leaving)
+        full_batch, full = make_view(hexagon_map, vision, positions, tracker.hexes)
+        full.draw()
+        assert on_screen(batch) == on_screen(full_batch)
+    # A full draw over the top of incremental ones changes nothing.
+    before = on_screen(batch)
+    view.draw()
+    assert on_screen(batch) == before
+
+
+def test_fog_positions_and_cells():
+    hexagon_map = {Hexagon(0, 0, 0), Hexagon(1, -1, 0)}
+    vision = Coverage()
+    vision.add("scout", Hexagon(1, -1, 0), 0)
+    visible = {Hexagon(0, 0, 0), Hexagon(1, -1, 0), Hexagon(0, 1, -1)}
+    batch, view = make_view(hexagon_map, vision, PixelCache(layout, 11), visible)
+    view.draw()
+    # Fogged, visible and not generated.
+    assert on_screen(batch) == {"0_0_0": tuple(hex_math.hex_to_pixel(layout, Hexagon(0, 0, 0), False))}
+    assert not view.fogged(Hexagon(0, 1, -1))
+    # Leaving the view takes the fog away, even though the hex is still fogged.
+    visible.discard(Hexagon(0, 0, 0))
+    view.draw({Hexagon(0, 0, 0)})
+    assert not batch.children
@@ -0,0 +1,52 @@
+"""
+Packed hex keys and hex_keys.HexKeyDict.
+"""
+import random
+
+import hex_math
+from hex_keys import HexKeyDict
+from hex_math import Hexagon, hex_key, key_coordinates, key_directions, key_to_hex
+
+
+def test_keys_round_trip():
+    rng = random.Random(7)
+    limit = 2 ** 20
+    edges = [-limit, -limit + 1, -1, 0, 1, limit - 2, limit - 1]
+    pairs = [(q, r) for q in edges for r in edges] + [(rng.randrange(-limit, limit), rng.randrange(-limit, limit)) for _ in range(10_000)]
+    for q, r in pairs:
+        h = Hexagon(q, r, -q - r)
+        key = hex_key(h)
+        assert key_coordinates(key) == (q, r)
+        assert key_to_hex(key) == h
+        assert abs(key) < 2 ** 42
+
+
+def test_key_order_is_hexagon_order():
+    rng = random.Random(8)
+    hexes = [Hexagon(q, r, -q - r) for q, r in ((rng.randint(-50, 50), rng.randint(-50, 50)) for _ in range(2000))]
+    assert sorted(hexes) == [key_to_hex(k) for k in sorted(map(hex_key, hexes))]
+
+
+def test_key_directions():
+    for h in hex_math.get_hex_chunk(Hexagon(3, -7, 4), 2):
+        for idx, d in enumerate(key_directions):
+            assert key_to_hex(hex_key(h) + d) == hex_math.hex_neighbor(h, idx)
+
+
+def test_hex_key_dict_acts_like_a_dict():
+    rng = random.Random(9)
+    plain = {}
+    packed = HexKeyDict()
+    for n in range(3000):
+        q, r = rng.randint(-20, 20), rng.randint(-20, 20)
+        h = Hexagon(q, r, -q - r)
+        if h in plain and rng.random() < 0.5:
+            del plain[h]
+            del packed[h]
+        else:
+            plain[h] = packed[h] = n
+        assert (h in packed) == (h in plain)
+    assert dict(packed.items()) == plain
+    assert set(packed) == plain.keys()
+    assert len(packed) == len(plain)
+    assert packed.get(Hexagon(100, 0, -100), "missing") == "missing"
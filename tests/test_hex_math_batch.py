@@ -0,0 +1,112 @@
+"""
+hex_math_batch against hex_math, which it has to match exactly, on inputs that land on the ties and edges where rounding could go either way.
+"""
+import math
+
+import numpy as np
+import pytest
+
+import hex_math
+import hex_math_batch
+from hex_math import Hexagon, Point
+
+layouts = [
+    hex_math.Layout(hex_math.layout_pointy, Point(round(64 / math.sqrt(3)), 32), Point(960, 600)),
+    hex_math.Layout(hex_math.layout_flat, Point(32, round(64 / math.sqrt(3))), Point(-17.5, 3)),
+]
+layout_ids = ["pointy", "flat"]
+
+
+def rows(a):
+    return [tuple(h) for h in a.tolist()]
+
+
+def drop_s(hexes):
+    """
+    The same hexes as an (N, 2) array, for the functions that work s out themselves.
+    """
+    return np.ascontiguousarray(hexes[:, :2])
+
+
+def grid_hexes(radius):
+    return hex_math_batch.hex_array(hex_math.get_hex_chunk(Hexagon(0, 0, 0), radius))
+
+
+def quarter_hexes():
+    # Every quarter step around the middle, so there are halves for np.rint and three way ties between q, r and s.
+    q, r = np.mgrid[-12:12.25:0.25, -12:12.25:0.25]
+    q = q.ravel()
+    r = r.ravel()
+    return np.column_stack((q, r, -q - r))
+
+
+@pytest.mark.parametrize("columns", [3, 2])
+def test_hex_round(columns):
+    fractional = quarter_hexes()
+    expected = [tuple(hex_math.hex_round(Hexagon(*h))) for h in fractional.tolist()]
+    hexes = fractional if columns == 3 else drop_s(fractional)
+    assert rows(hex_math_batch.hex_round(hexes)) == expected
+
+
+@pytest.mark.parametrize("layout", layouts, ids=layout_ids)
+def test_pixel_to_hex(layout):
+    # Every half pixel over a few hexes, plenty of which are right on the edges and corners between them.
+    x, y = np.mgrid[-80:80:0.5, -70:70:0.5]
+    points = np.column_stack((x.ravel() + layout.origin.x, y.ravel() + layout.origin.y))
+    as_points = [Point(*p) for p in points.tolist()]
+    assert rows(hex_math_batch.raw_pixel_to_hex(layout, points)) == [tuple(hex_math.raw_pixel_to_hex(layout, p)) for p in as_points]
+    assert rows(hex_math_batch.pixel_to_hex(layout, points)) == [tuple(hex_math.pixel_to_hex(layout, p)) for p in as_points]
+
+
+@pytest.mark.parametrize("layout", layouts, ids=layout_ids)
+@pytest.mark.parametrize("columns", [3, 2])
+def test_hex_to_pixel_and_corners(layout, columns):
+    hexes = grid_hexes(20)
+    scalar = [Hexagon(*h) for h in hexes.tolist()]
+    if columns == 2:
+        hexes = drop_s(hexes)
+    for use_origin in (True, False):
+        assert rows(hex_math_batch.hex_to_pixel(layout, hexes, use_origin)) == [tuple(hex_math.hex_to_pixel(layout, h, use_origin)) for h in scalar]
+    corners = hex_math_batch.polygon_corners(layout, hexes)
+    assert [tuple(map(tuple, c)) for c in corners.tolist()] == [tuple(map(tuple, hex_math.polygon_corners(layout, h))) for h in scalar]
+
+
+@pytest.mark.parametrize("columns", [3, 2])
+def test_hex_distance(columns):
+    rng = np.random.default_rng(3)
+    a = grid_hexes(15)
+    b = a[rng.permutation(len(a))]
+    expected = [hex_math.hex_distance(Hexagon(*x), Hexagon(*y)) for x, y in zip(a.tolist(), b.tolist())]
+    expected_matrix = [[hex_math.hex_distance(Hexagon(*x), Hexagon(*y)) for y in b[:40].tolist()] for x in a[:50].tolist()]
+    if columns == 2:
+        a, b = drop_s(a), drop_s(b)
+    assert hex_math_batch.hex_distance(a, b).tolist() == expected
+    assert hex_math_batch.hex_distance_matrix(a[:50], b[:40]).tolist() == expected_matrix
+
+
+@pytest.mark.parametrize("columns", [3, 2])
+def test_hex_linedraw(columns):
+    starts = []
+    ends = []
+    for start in hex_math.get_hex_chunk(Hexagon(0, 0, 0), 3):
+        # Diagonal lines run along the edges between hexes, straight ones through their middles, the rest cross edges at odd places.
+        for step in hex_math.hex_diagonals + hex_math.hex_directions + [Hexagon(3, -1, -2), Hexagon(-1, 4, -3)]:
+            for k in (0, 1, 2, 5):
+                starts.append(start)
+                ends.append(hex_math.hex_add(start, hex_math.hex_scale(step, k)))
+    expected = [[tuple(h) for h in hex_math.hex_linedraw(a, b)] for a, b in zip(starts, ends)]
+    a = hex_math_batch.hex_array(starts)
+    b = hex_math_batch.hex_array(ends)
+    if columns == 2:
+        a, b = drop_s(a), drop_s(b)
+    hexes, offsets = hex_math_batch.hex_linedraw(a, b)
+    assert [rows(hexes[offsets[i]:offsets[i + 1]]) for i in range(len(starts))] == expected
+
+
+def test_hex_array_round_trip():
+    hexes = hex_math.get_hex_chunk(Hexagon(4, -9, 5), 6)
+    packed = hex_math_batch.hex_array(hexes)
+    assert packed.shape == (len(hexes), 3)
+    assert hex_math_batch.to_hexagons(packed) == hexes
+    assert hex_math_batch.to_hexagons(drop_s(packed)) == hexes
+    assert hex_math_batch.hex_array([]).shape == (0, 3)
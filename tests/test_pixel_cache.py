@@ -0,0 +1,64 @@
+"""
+pixel_cache.PixelCache against working out hex_to_pixel every time.
+"""
+import random
+
+import hex_math
+from benchmarks.terrain_sprites import layout
+from hex_math import Hexagon, Point
+from pixel_cache import PixelCache
+
+
+def random_hexes(rng, n, spread=200):
+    return [Hexagon(q, r, -q - r) for q, r in ((rng.randint(-spread, spread), rng.randint(-spread, spread)) for _ in range(n))]
+
+
+def test_positions_match_hex_to_pixel():
+    rng = random.Random(10)
+    # Small enough that it evicts the whole way through.
+    cache = PixelCache(layout, 11, max_chunks=8)
+    for h in random_hexes(rng, 5000):
+        assert cache.position(h) == hex_math.hex_to_pixel(layout, h, False)
+        assert len(cache.chunks) <= 8
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["hexes"] == len(cache) == sum(len(c[1]) for c in cache.chunks.values())
+
+
+def test_least_recently_used_chunk_goes():
+    cache = PixelCache(layout, 11, max_chunks=2)
+    a, b, c = Hexagon(0, 0, 0), Hexagon(40, 0, -40), Hexagon(80, 0, -80)
+    cache.position(a)
+    cache.position(b)
+    # a has been used since b, so b goes when c needs room.
+    cache.position(a)
+    cache.position(c)
+    assert a in cache.positions and c in cache.positions and b not in cache.positions
+    assert cache.stats()["evictions"] == 1
+
+
+def test_discard_chunk():
+    cache = PixelCache(layout, 11)
+    h = Hexagon(3, 2, -5)
+    cache.position(h)
+    anchor = next(iter(cache.chunks))
+    cache.discard_chunk(anchor)
+    assert not cache.chunks and not cache.positions
+    # Discarding one that isn't cached does nothing.
+    cache.discard_chunk(anchor)
+    assert cache.position(h) == hex_math.hex_to_pixel(layout, h, False)
+
+
+def test_set_layout_throws_the_old_positions_away():
+    rng = random.Random(11)
+    hexes = random_hexes(rng, 500, 30)
+    cache = PixelCache(layout, 11)
+    for h in hexes:
+        cache.position(h)
+    cache.set_layout(layout)
+    assert cache.stats()["invalidations"] == 0
+    zoomed = hex_math.Layout(layout.orientation, Point(layout.size.x * 2, layout.size.y * 2), layout.origin)
+    cache.set_layout(zoomed)
+    assert cache.stats()["invalidations"] == 1 and not cache.positions
+    for h in hexes:
+        assert cache.position(h) == hex_math.hex_to_pixel(zoomed, h, False)
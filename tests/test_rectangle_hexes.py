@@ -0,0 +1,115 @@
+"""
+hex_math.rectangle_hex_ranges against brute force pixel_to_hex sampling, and against the exact overlap area of each hex with the rectangle.
+"""
+import math
+import random
+
+import pytest
+
+import hex_math
+from hex_math import Point
+
+layouts = [
+    hex_math.Layout(hex_math.layout_pointy, Point(37, 32), Point(960, 600)),
+    hex_math.Layout(hex_math.layout_flat, Point(37, 32), Point(960, 600)),
+    hex_math.Layout(hex_math.layout_pointy, Point(10, 10), Point(3.5, -7.25)),
+    hex_math.Layout(hex_math.layout_flat, Point(13.5, 9), Point(-21, 4)),
+]
+rectangles_per_layout = 60
+# Samples per pixel along each axis. Offset by half a step so we never sample right on a rectangle edge.
+sample_step = 0.5
+# Hexes that overlap the rectangle by less than this many square pixels could slip between the samples.
+area_tolerance = 0.5
+
+
+def clip(polygon, inside, intersect):
+    """
+    One step of Sutherland-Hodgman clipping.
+    """
+    clipped = []
+    for i, current in enumerate(polygon):
+        previous = polygon[i - 1]
+        if inside(current):
+            if not inside(previous):
+                clipped.append(intersect(previous, current))
+            clipped.append(current)
+        elif inside(previous):
+            clipped.append(intersect(previous, current))
+    return clipped
+
+
+def overlap_area(polygon, x_min, y_min, x_max, y_max):
+    """
+    Area of a convex polygon inside a rectangle.
+    """
+    def at_x(x):
+        return lambda a, b: Point(x, a.y + (b.y - a.y) * (x - a.x) / (b.x - a.x))
+
+    def at_y(y):
+        return lambda a, b: Point(a.x + (b.x - a.x) * (y - a.y) / (b.y - a.y), y)
+
+    polygon = clip(polygon, lambda p: p.x >= x_min, at_x(x_min))
+    polygon = clip(polygon, lambda p: p.x <= x_max, at_x(x_max))
+    polygon = clip(polygon, lambda p: p.y >= y_min, at_y(y_min))
+    polygon = clip(polygon, lambda p: p.y <= y_max, at_y(y_max))
+    area = 0.0
+    for i, p in enumerate(polygon):
+        q = polygon[i - 1]
+        area += q.x * p.y - p.x * q.y
+    return abs(area) / 2.0
+
+
+def sampled_hexes(layout, x_min, y_min, x_max, y_max):
+    hexes = set()
+    y = y_min + sample_step / 2
+    while y < y_max:
+        x = x_min + sample_step / 2
+        while x < x_max:
+            hexes.add(hex_math.pixel_to_hex(layout, Point(x, y)))
+            x += sample_step
+        y += sample_step
+    return hexes
+
+
+def check_rectangle(layout, x_min, y_min, x_max, y_max):
+    ranges = hex_math.rectangle_hex_ranges(layout, x_min, y_min, x_max, y_max)
+    found = [h for r in ranges for h in hex_math.range_hexes(layout, *r)]
+    assert len(found) == len(set(found)), "Ranges overlap."
+    found = set(found)
+    sampled = sampled_hexes(layout, x_min, y_min, x_max, y_max)
+    assert sampled <= found, f"Missed {sampled - found} in {x_min, y_min, x_max, y_max}."
+    # Anything found that the samples didn't hit has to actually overlap the rectangle.
+    for h in found - sampled:
+        area = overlap_area(hex_math.polygon_corners(layout, h), x_min, y_min, x_max, y_max)
+        assert area > 0.0, f"{h} doesn't overlap {x_min, y_min, x_max, y_max}."
+    # And every hex with a decent overlap has to be found, whether or not the samples hit it.
+    corner = hex_math.pixel_to_hex(layout, Point(x_min, y_min))
+    reach = int(max(x_max - x_min, y_max - y_min) / min(layout.size)) + 3
+    for h in hex_math.get_hex_chunk(corner, reach):
+        if h not in found:
+            area = overlap_area(hex_math.polygon_corners(layout, h), x_min, y_min, x_max, y_max)
+            assert area < area_tolerance, f"{h} overlaps {x_min, y_min, x_max, y_max} by {area} but wasn't found."
+
+
+@pytest.mark.parametrize("layout", layouts, ids=["pointy", "flat", "pointy small", "flat squashed"])
+def test_rectangles_match_brute_force(layout):
+    rng = random.Random(42)
+    for n in range(rectangles_per_layout):
+        x_min = rng.uniform(-300, 1200)
+        y_min = rng.uniform(-300, 1200)
+        # Include some thin slivers and some rectangles lined up on whole pixels.
+        width = rng.choice([rng.uniform(0.3, 3), rng.uniform(1, 80)])
+        height = rng.choice([rng.uniform(0.3, 3), rng.uniform(1, 80)])
+        if n % 5 == 0:
+            x_min, y_min, width, height = round(x_min), round(y_min), math.ceil(width), math.ceil(height)
+        check_rectangle(layout, x_min, y_min, x_min + width, y_min + height)
+
+
+@pytest.mark.parametrize("layout", layouts[:2], ids=["pointy", "flat"])
+def test_whole_screen(layout):
+    ranges = hex_math.rectangle_hex_ranges(layout, 0, 0, 1920, 1080)
+    found = {h for r in ranges for h in hex_math.range_hexes(layout, *r)}
+    # Every pixel centre on a coarse grid is in a hex that was found.
+    for y in range(0, 1080, 7):
+        for x in range(0, 1920, 7):
+            assert hex_math.pixel_to_hex(layout, Point(x + 0.5, y + 0.5)) in found
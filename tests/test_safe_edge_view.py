@@ -0,0 +1,86 @@
+"""
+map_views.SafeEdgeView redrawing only around the hexes that changed, against drawing everything in view from scratch.
+"""
+import random
+
+import helpers
+import hex_math
+from benchmarks.terrain_sprites import FakeScroller, StubBatch, StubSprite, layout, sprite_height, sprite_width
+from coverage import Coverage
+from hex_math import Hexagon
+from map_views import SafeEdgeView
+from pixel_cache import PixelCache
+from sprite_cache import SpritePool, SpriteReconciler
+
+
+class EdgeSprites:
+    """
+    Stands in for sprite_composite.EdgeComposites, which needs the images loaded.
+    """
+    images = {f"safe {mask}": f"safe {mask}" for mask in range(64)}
+
+    @staticmethod
+    def sprite_id(style, mask):
+        return f"{style} {mask}"
+
+
+def make_view(hexagon_map, safety, positions, visible_hexes):
+    batch = StubBatch()
+    sprites = SpriteReconciler(batch, SpritePool(EdgeSprites.images, StubSprite), (sprite_width / 2, sprite_height / 2))
+    return batch, SafeEdgeView(sprites, hexagon_map, safety, EdgeSprites, positions, visible_hexes)
+
+
+def on_screen(batch):
+    return {name: (sprite.image, tuple(sprite.position)) for name, sprite in batch.children.items()}
+
+
+def test_incremental_edges_match_a_full_redraw():
+    rng = random.Random(6)
+    # Safe areas reach past the generated hexes, which get no edges.
+    hexagon_map = set(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 14))
+    sites = sorted(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 18))
+    safety = Coverage()
+    safety.add("core", Hexagon(0, 0, 0), 5)
+    scroller = FakeScroller()
+    tracker = helpers.VisibleHexTracker(layout, sprite_width)
+    tracker.update(scroller)
+    positions = PixelCache(layout, 11)
+    batch, view = make_view(hexagon_map, safety, positions, tracker.hexes)
+    view.draw()
+    assert batch.children
+    for frame in range(150):
+        site = rng.choice(sites)
+        if ("tower", site) in safety:
+            flips = safety.remove(("tower", site))
+        else:
+            flips = safety.add(("tower", site), site, rng.randrange(4))
+        view.draw(safety.border(flips[0] | flips[1]))
+        if frame % 10 == 0:
+            scroller.fx += rng.choice((-64, 64))
+            scroller.fy += rng.choice((-48, 48))
+            entering, leaving = tracker.update(scroller)
+            view.draw(entering | leaving)
+        full_batch, full = make_view(hexagon_map, safety, positions, tracker.hexes)
+        full.draw()
+        assert on_screen(batch) == on_screen(full_batch)
+
+
+def test_edge_sprites():
+    safety = Coverage()
+    safety.add("core", Hexagon(0, 0, 0), 1)
+    hexagon_map = set(hex_math.get_hex_chunk(Hexagon(0, 0, 0), 3))
+    batch, view = make_view(hexagon_map, safety, PixelCache(layout, 11), set(hexagon_map))
+    view.draw()
+    # The middle of the area has no edges, and each hex around it has the three edges facing out.
+    assert "0_0_0" not in batch.children
+    assert len(batch.children) == 6
+    for idx in range(6):
+        h = hex_math.hex_neighbor(Hexagon(0, 0, 0), idx)
+        image, position = on_screen(batch)[f"{h.q}_{h.r}_{h.s}"]
+        assert image == f"safe {safety.edge_mask(h)}"
+        assert bin(safety.edge_mask(h)).count("1") == 3
+        assert position == tuple(hex_math.hex_to_pixel(layout, h, False))
+    # Hexes that haven't been generated don't get an edge, even when they're safe.
+    hexagon_map.discard(Hexagon(1, -1, 0))
+    view.draw({Hexagon(1, -1, 0)})
+    assert "1_-1_0" not in batch.children
@@ -0,0 +1,72 @@
+"""
+The headless simulation: the same game played twice comes out the same, and units, enemies and vision agree with each other.
+"""
+import random
+
+import headless
+from hex_math import Hexagon
+from world import Building
+
+seed = 42
+
+
+def play(ticks=600):
+    """
+    A small base with towers, units being sent around and the network being cut now and then, with the same orders every time.
+    """
+    sim = headless.new_game(seed, 11, 25)
+    for q in range(1, 12):
+        sim.plop_network(Hexagon(q, 0, -q))
+    sim.plop_building(Hexagon(4, -1, -3), Building(3))
+    sim.plop_building(Hexagon(8, -1, -7), Building(4))
+    sim.plop_building(Hexagon(12, 0, -12), Building(5))
+    rng = random.Random(seed)
+    headless.add_units(sim, 60, rng)
+    diffs = []
+    for n in range(ticks):
+        if n % 20 == 0:
+            cut = Hexagon(6, 0, -6)
+            if cut in sim.network.network:
+                sim.remove_network(cut)
+            else:
+                sim.plop_network(cut)
+            for start in rng.sample(sorted(sim.units.keys()), 6):
+                sim.move_unit(start, headless.free_hex(rng, sim))
+        sim.tick()
+        diff = sim.publish()
+        diffs.append((len(diff.seen), len(diff.fogged), len(diff.safe), len(diff.unsafe)))
+    return sim, diffs
+
+
+def state(sim):
+    """
+    Everything that should come out the same when the same game is played twice.
+    """
+    return (
+        sim.ticks,
+        sorted((u.number, tuple(u.position), tuple(map(tuple, u.move_path))) for u in sim.units.values()),
+        sorted((e.number, tuple(e.position), e.target and tuple(e.target)) for e in sim.enemies.values()),
+        sorted((tuple(k), v["powered"]) for k, v in sim.network.network.items()),
+        sorted(map(tuple, sim.terrain.vision.counts)),
+        sorted(map(tuple, sim.terrain.safety.counts)),
+    )
+
+
+def test_same_game_same_outcome():
+    first, first_diffs = play()
+    second, second_diffs = play()
+    assert state(first) == state(second)
+    assert first_diffs == second_diffs
+    assert first.enemies, "No enemies turned up, so they weren't tested."
+
+
+def test_everything_agrees():
+    sim, _ = play(300)
+    for k, u in sim.units.items():
+        assert k == (u.move_path[-1] if u.move_path else u.position), "Unit is filed under the wrong hex."
+        assert sim.terrain.vision.sources[u] == (u.position, u.vision_range), "Unit's vision isn't where the unit is."
+    for k, e in sim.enemies.items():
+        assert e.position == k, "Enemy is filed under the wrong hex."
+    for h in sim.terrain.vision.counts:
+        if h in sim.terrain.hexagon_map:
+            assert sim.terrain.hexagon_map[h].visible == 1, "Visible field doesn't match vision."
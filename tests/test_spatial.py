@@ -0,0 +1,44 @@
+"""
+spatial.SpatialIndex queries against scanning everything.
+"""
+import random
+
+import pytest
+
+import hex_math
+from hex_math import Hexagon
+from spatial import SpatialIndex
+
+
+def random_hex(rng, radius):
+    q = rng.randint(-radius, radius)
+    r = rng.randint(max(-radius, -q - radius), min(radius, -q + radius))
+    return Hexagon(q, r, -q - r)
+
+
+def linear_nearest(contents, h, k, predicate=None):
+    found = sorted((hex_math.hex_distance(h, key), key) for key, v in contents.items() if predicate is None or predicate(key, v))
+    return found[:k]
+
+
+@pytest.mark.parametrize("bucket_size", (1, 5, 15))
+def test_queries_match_a_scan(bucket_size):
+    rng = random.Random(11)
+    index = SpatialIndex(bucket_size)
+    contents = {}
+    for _ in range(3000):
+        h = random_hex(rng, 60)
+        if h in contents and rng.random() < 0.4:
+            del index[h]
+            del contents[h]
+        else:
+            index[h] = contents[h] = rng.randrange(3)
+    assert dict(index.items()) == contents
+    for _ in range(300):
+        h = random_hex(rng, 90)
+        k = rng.randint(1, 8)
+        predicate = (lambda key, v: v != 0) if rng.random() < 0.5 else None
+        assert index.nearest(h, k, predicate) == linear_nearest(contents, h, k, predicate)
+        radius = rng.randint(0, 30)
+        expected = {key for key in contents if hex_math.hex_distance(h, key) <= radius}
+        assert set(index.within(h, radius)) == expected
@@ -0,0 +1,79 @@
+"""
+The packed sprite atlas, checked headlessly. Every region has to be inside its atlas, clear of every other region and its padding, and hold exactly the pixels of the sprite it came from.
+"""
+import os
+import shutil
+
+import numpy as np
+import pyglet
+import pytest
+
+pyglet.options["shadow_window"] = False  # No window here, the atlas is packed on the CPU.
+
+import settings
+import sprite_atlas
+
+sprite_path = "sprites/"
+
+
+def load_separately(path):
+    return {os.path.splitext(f)[0]: pyglet.image.load(os.path.join(path, f)) for f in os.listdir(path)}
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    cache_path = str(tmp_path_factory.mktemp("atlas"))
+    return sprite_atlas.build_atlas(sprite_path, cache_path, settings.sprite_atlas_size), cache_path
+
+
+def test_regions_are_inside_their_atlas_and_hold_their_sprite(built):
+    manifest, cache_path = built
+    padding = manifest["padding"]
+    atlases = [sprite_atlas._rgba(pyglet.image.load(os.path.join(cache_path, f))) for f in manifest["atlases"]]
+    used = [np.zeros(a.shape[:2], dtype=bool) for a in atlases]
+    originals = load_separately(sprite_path)
+    assert set(manifest["regions"]) == set(originals)
+    for sprite_id, (atlas, x, y, w, h) in manifest["regions"].items():
+        pixels = atlases[atlas]
+        height, width, _ = pixels.shape
+        assert (w, h) == (originals[sprite_id].width, originals[sprite_id].height)
+        assert padding <= x and x + w + padding <= width, f"{sprite_id} is outside its atlas horizontally."
+        assert padding <= y and y + h + padding <= height, f"{sprite_id} is outside its atlas vertically."
+        # The region and its padding can't be shared with anything else.
+        assert not used[atlas][y - padding:y + h + padding, x - padding:x + w + padding].any(), f"{sprite_id} overlaps another sprite."
+        used[atlas][y:y + h, x:x + w] = True
+        assert np.array_equal(pixels[y:y + h, x:x + w], sprite_atlas._rgba(originals[sprite_id])), f"{sprite_id} pixels differ."
+    for pixels, mask in zip(atlases, used):
+        assert not pixels[~mask].any(), "Pixels outside the sprites should be transparent."
+
+
+def test_cached_atlas_is_used_until_a_sprite_changes(tmp_path):
+    sprites = tmp_path / "sprites"
+    shutil.copytree(sprite_path, sprites)
+    cache_path = str(tmp_path / "atlas")
+    sprite_atlas.build_atlas(str(sprites), cache_path, settings.sprite_atlas_size)
+    assert sprite_atlas.cached_manifest(str(sprites), cache_path, settings.sprite_atlas_size) is not None
+    # A different atlas size can't use it either.
+    assert sprite_atlas.cached_manifest(str(sprites), cache_path, settings.sprite_atlas_size * 2) is None
+    fog = sprites / "fog.png"
+    stat = os.stat(fog)
+    os.utime(fog, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert sprite_atlas.cached_manifest(str(sprites), cache_path, settings.sprite_atlas_size) is None
+
+
+def test_packing_keeps_rectangles_apart():
+    sizes = {f"s{n}": (10 + n % 7 * 9, 8 + n % 5 * 11) for n in range(300)}
+    regions, atlas_sizes = sprite_atlas.pack_rectangles(sizes, max_size=256, padding=1)
+    assert len(atlas_sizes) > 1
+    for atlas, (width, height) in enumerate(atlas_sizes):
+        assert width == 256 and height <= 256 and height & (height - 1) == 0
+        boxes = [(x, y, w, h) for a, x, y, w, h in regions.values() if a == atlas]
+        for i, (x, y, w, h) in enumerate(boxes):
+            assert x >= 1 and y >= 1 and x + w + 1 <= width and y + h + 1 <= height
+            for x2, y2, w2, h2 in boxes[i + 1:]:
+                assert x + w + 1 <= x2 or x2 + w2 + 1 <= x or y + h + 1 <= y2 or y2 + h2 + 1 <= y
+
+
+def test_packing_refuses_sprites_bigger_than_an_atlas():
+    with pytest.raises(ValueError):
+        sprite_atlas.pack_rectangles({"huge": (300, 10)}, max_size=256)
@@ -0,0 +1,73 @@
+"""
+sprite_cache.SpritePool recycling sprites, and SpriteReconciler keeping a stub batch in step with what should be shown.
+"""
+from benchmarks.terrain_sprites import StubBatch, StubSprite
+from sprite_cache import SpritePool, SpriteReconciler
+
+
+def make_reconciler():
+    batch = StubBatch()
+    pool = SpritePool({"unit": "unit image", "enemy": "enemy image"}, StubSprite)
+    return batch, pool, SpriteReconciler(batch, pool, (32, 16))
+
+
+def test_pool_resets_recycled_sprites():
+    pool = SpritePool({"unit": "unit image", "enemy": "enemy image"}, StubSprite)
+    sprite = pool.acquire("unit", (5, 6), (32, 16), opacity=100)
+    assert (sprite.image, tuple(sprite.position), sprite.image_anchor, sprite.opacity) == ("unit image", (5, 6), (32, 16), 100)
+    # Whatever was done to it while it was out doesn't come back with it.
+    sprite.position = (-40, 90)
+    sprite.image_anchor = (0, 0)
+    sprite.opacity = 7
+    pool.release("unit", sprite)
+    again = pool.acquire("unit", (1, 2), (10, 20))
+    assert again is sprite
+    assert (again.image, tuple(again.position), again.image_anchor, again.opacity) == ("unit image", (1, 2), (10, 20), 255)
+
+
+def test_pool_counters():
+    pool = SpritePool({"unit": "unit image", "enemy": "enemy image"}, StubSprite)
+    first = pool.acquire("unit", (0, 0), (0, 0))
+    second = pool.acquire("unit", (1, 1), (0, 0))
+    assert pool.stats() == {"hits": 0, "misses": 2, "live": 2, "free": 0}
+    pool.release("unit", first)
+    pool.release("unit", second)
+    assert pool.stats() == {"hits": 0, "misses": 2, "live": 0, "free": 2}
+    # Free sprites are kept per image, so an enemy can't have one of them.
+    enemy = pool.acquire("enemy", (0, 0), (0, 0))
+    assert enemy is not first and enemy is not second
+    assert pool.stats() == {"hits": 0, "misses": 3, "live": 1, "free": 2}
+    assert {id(pool.acquire("unit", (0, 0), (0, 0))) for _ in range(2)} == {id(first), id(second)}
+    assert pool.stats() == {"hits": 2, "misses": 3, "live": 3, "free": 0}
+    # Run dry, it makes new ones again.
+    pool.acquire("unit", (0, 0), (0, 0))
+    assert pool.stats() == {"hits": 2, "misses": 4, "live": 4, "free": 0}
+
+
+def test_show_updates_image_position_and_z():
+    batch, pool, sprites = make_reconciler()
+    sprite = sprites.show("1", "unit", (0, 0), z=0)
+    assert batch.children["1"] is sprite and batch.z["1"] == 0
+    # A unit walking down the screen gets drawn over the hexes above it, so its z has to follow it.
+    assert sprites.show("1", "unit", (10, -20), z=1) is sprite
+    assert batch.z["1"] == 1
+    assert tuple(sprite.position) == (10, -20)
+    assert sprites.show("1", "enemy", (10, -20), z=1) is sprite
+    assert sprite.image == "enemy image" and batch.z["1"] == 1
+    sprites.hide("1")
+    assert not batch.children and not batch.z
+    assert pool.stats()["free"] == 1
+    # The pooled sprite comes back under a new name.
+    assert sprites.show("2", "enemy", (0, 0), z=-3) is sprite
+    assert batch.z["2"] == -3
+
+
+def test_sync():
+    batch, pool, sprites = make_reconciler()
+    sprites.sync({"a": ("unit", (0, 0), 0), "b": ("unit", (1, 1), 1)})
+    sprites.sync({"b": ("enemy", (2, 2), 2), "c": ("unit", (3, 3), 3)})
+    assert batch.children.keys() == {"b", "c"}
+    assert batch.z == {"b": 2, "c": 3}
+    assert sprites["b"].image == "enemy image"
+    assert len(sprites) == 2 and "a" not in sprites
+    assert pool.stats() == {"hits": 1, "misses": 2, "live": 2, "free": 0}
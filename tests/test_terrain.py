@@ -0,0 +1,25 @@
+"""
+Cores that come with new chunks.
+"""
+import pytest
+
+from hex_math import Hexagon
+from world import Terrain
+
+origin = Hexagon(0, 0, 0)
+test_core = Hexagon(19, -11, -8)
+
+
+@pytest.mark.parametrize("chunk_size", [11, 31])
+def test_test_core_leaves_the_friendly_core_alone(chunk_size):
+    terrain = Terrain(chunk_size)
+    terrain.generate_chunk(origin)
+    terrain.generate_chunk(terrain.find_chunk_parent(test_core))
+    assert terrain.buildings[origin].building_id == 0
+    assert terrain.city_cores[origin] == "friendly"
+    assert terrain.hexagon_map[origin].terrain_type == "15"
+    # The building, the cell and the core index all agree on where the test core is.
+    assert terrain.buildings[test_core].building_id == 6
+    assert terrain.city_cores[test_core] == "enemy"
+    assert terrain.hexagon_map[test_core].terrain_type == "16"
+    assert terrain.hexagon_map[test_core].building is terrain.buildings[test_core]
@@ -0,0 +1,241 @@
+"""
+Paging terrain chunks out of memory and back, to the page file or regenerating them with deltas, against a terrain that keeps everything in memory.
+"""
+import numpy as np
+import pytest
+
+import terrain_store
+from hex_math import Hexagon
+from world import Building, Terrain
+
+seed = 42
+chunk_size = 11
+frames = 40
+# Ten chunks' worth, one more than the view, so most of the map is paged out by the end.
+max_resident_mb = 0.01
+
+
+def anchor(i, j):
+    r = j * (chunk_size + 1)
+    q = i * chunk_size - r // 2
+    return Hexagon(q, r, -q - r)
+
+
+def play(limit, delta):
+    """
+    Scrolls a 3x3 chunk view right and back, with a scout following it and towers left along the way, some taken away again on the way back.
+    """
+    terrain = Terrain(chunk_size, seed)
+    store = terrain.hexagon_map
+    store.max_resident_mb = limit
+    if not delta:
+        store.generator = None
+    for n, column in enumerate(list(range(frames)) + list(range(frames, -1, -1))):
+        chunks = {anchor(i, j) for i in range(column - 1, column + 2) for j in range(-1, 2)}
+        store.touch(chunks)
+        for c in sorted(chunks):
+            terrain.generate_chunk(c)
+        center = anchor(column, 0)
+        if n == 0:
+            terrain.add_vision("scout", center, 9)
+        else:
+            terrain.move_vision("scout", center)
+        site = Hexagon(center.q + 2, center.r + 3, -center.q - center.r - 5)
+        if n < frames and n % 3 == 0:
+            terrain.add_building(site, Building(3))
+            terrain.add_safe_area(("tower", site), site, 3)
+        elif n > frames and column % 6 == 0 and site in terrain.buildings:
+            terrain.remove_building(site)
+            terrain.remove_safe_area(("tower", site))
+    return terrain
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_round_trip(delta):
+    reference = play(None, False)
+    terrain = play(max_resident_mb, delta)
+    stats = terrain.hexagon_map.stats()
+    assert stats["page_outs"] > 0
+    # Only one way of keeping paged out chunks gets used.
+    assert (stats["page_file_mb"] > 0) != delta
+    assert (stats["deltas"] > 0) == delta
+    assert terrain.chunk_list.keys() == reference.chunk_list.keys()
+    for c in reference.chunk_list:
+        assert np.array_equal(terrain.hexagon_map.chunk_cells(c), reference.chunk_list[c])
+    # Reading them back is what brought them in, with delta nothing during play writes to a chunk that's out.
+    assert terrain.hexagon_map.page_ins > 0
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_held_cell_survives_paging(delta):
+    terrain = Terrain(chunk_size, seed)
+    store = terrain.hexagon_map
+    store.max_resident_mb = 0
+    if not delta:
+        store.generator = None
+    terrain.generate_chunk(anchor(0, 0))
+    cell = store[Hexagon(1, 1, -2)]
+    # Nothing's in view, so making the next chunk pages this one out.
+    store.touch(())
+    terrain.generate_chunk(anchor(5, 0))
+    assert store.chunks[anchor(0, 0)] is None
+    cell.sprite_id = "9"
+    cell.terrain_type = 5
+    store.touch(())
+    terrain.generate_chunk(anchor(10, 0))
+    assert store[Hexagon(1, 1, -2)].sprite_id == "9"
+    assert store[Hexagon(1, 1, -2)].terrain_type == "5"
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_coverage_changes_leave_paged_out_chunks_alone(delta):
+    terrain = Terrain(chunk_size, seed)
+    store = terrain.hexagon_map
+    store.max_resident_mb = 0
+    if not delta:
+        store.generator = None
+    # Away from the friendly core, which is a real change.
+    out = anchor(3, 0)
+    terrain.generate_chunk(out)
+    terrain.generate_chunk(anchor(5, 0))
+    assert store.chunks[out] is None
+    page_ins = store.page_ins
+    terrain.add_vision("scout", out, 3)
+    terrain.move_vision("scout", Hexagon(out.q + 2, out.r, out.s - 2))
+    terrain.add_safe_area("tower", out, 2)
+    terrain.remove_safe_area("tower")
+    terrain.add_safe_area("core", out, 1)
+    assert store.page_ins == page_ins
+    assert store.chunks[out] is None
+    assert store.deltas == {}
+    # Coming back in, it's in step with the coverage anyway.
+    cells = store.chunk_cells(out)
+    hexes = store.chunk_hexes(out)
+    assert cells["visible"].tolist() == [int(terrain.vision.covered(h)) for h in hexes]
+    assert cells["safe"].tolist() == [int(terrain.safety.covered(h)) for h in hexes]
+    assert cells["visible"].any() and cells["safe"].any()
+    if delta:
+        # Only coverage on it, so it can still go for free.
+        assert out in store.pristine
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_limit_holds_without_touch(delta):
+    # Like a headless game, nothing ever says what's in view.
+    terrain = Terrain(chunk_size, seed)
+    store = terrain.hexagon_map
+    store.max_resident_mb = 10 * store.chunk_bytes / 2 ** 20
+    if not delta:
+        store.generator = None
+    for i in range(10):
+        for j in range(6):
+            terrain.generate_chunk(anchor(i, j))
+        terrain.add_vision(("scout", i), anchor(i, 2), 9)
+    assert len(terrain.chunk_list) == 60
+    assert store.stats()["resident"] <= 10
+    assert store.stats()["page_outs"] > 0
+
+
+def test_touch_enforces_the_limit():
+    terrain = Terrain(chunk_size, seed)
+    store = terrain.hexagon_map
+    store.generator = None
+    store.max_resident_mb = None
+    for i in range(6):
+        terrain.generate_chunk(anchor(i, 0))
+    store.max_resident_mb = 2 * store.chunk_bytes / 2 ** 20
+    view = {anchor(0, 0), anchor(1, 0), anchor(2, 0)}
+    # Over the limit with what's in view alone, so only those stay.
+    store.touch(view)
+    assert set(store.last_used) == view
+    # A chunk paged in by a write off screen doesn't count as in view, it's the first to go at the next touch.
+    store[anchor(5, 0)].sprite_id = "7"
+    assert anchor(5, 0) in store.last_used
+    store.touch(view)
+    assert set(store.last_used) == view
+    assert store[anchor(5, 0)].sprite_id == "7"
+
+
+def test_page_file_records():
+    rng = np.random.default_rng(1)
+    page_file = terrain_store.PageFile(50)
+    chunks = {}
+    # Past the first 64 records, so the file has to grow.
+    for n in range(100):
+        cells = terrain_store.new_cells(rng.integers(0, 14, 50, dtype=np.uint8))
+        cells["visible"] = rng.integers(0, 3, 50)
+        chunks[Hexagon(n, 0, -n)] = cells
+        page_file.write(Hexagon(n, 0, -n), cells)
+    # Writing a chunk again goes over its old record.
+    chunks[Hexagon(3, 0, -3)]["safe"] = 7
+    page_file.write(Hexagon(3, 0, -3), chunks[Hexagon(3, 0, -3)])
+    assert len(page_file) == 100
+    for a, cells in chunks.items():
+        assert np.array_equal(page_file.read(a), cells)
+    with pytest.raises(KeyError):
+        page_file.read(Hexagon(0, 1, -1))
+
+
+class FlatGenerator:
+    """
+    Stands in for terrain_generation.CachedChunkGenerator, every chunk is all terrain type 0 and always remembered.
+    """
+    def __init__(self, cells_per_chunk):
+        self.terrain_types = np.zeros(cells_per_chunk, dtype=np.uint8)
+
+    def remember(self, anchor, terrain_types):
+        pass
+
+    def __call__(self, anchor):
+        return self.terrain_types
+
+    def __contains__(self, anchor):
+        return True
+
+
+def flat_store(size, limit=64):
+    store = terrain_store.TerrainStore(size, {})
+    # Set after, passing None to the store means the default limit.
+    store.max_resident_mb = limit
+    store.generator = FlatGenerator(store.cells_per_chunk)
+    return store
+
+
+def test_pristine_chunks_go_when_they_leave_view():
+    store = flat_store(11)
+    untouched, changed, changed_back = anchor(0, 0), anchor(1, 0), anchor(2, 0)
+    for a in (untouched, changed, changed_back):
+        store.add_chunk(a, terrain_store.new_cells(np.zeros(store.cells_per_chunk, dtype=np.uint8)))
+    store.touch((untouched, changed, changed_back))
+    store[changed].visible = 1
+    store[changed_back].visible = 1
+    store[changed_back].visible = 0
+    # Still in view, nothing goes.
+    store.touch((untouched, changed, changed_back))
+    assert len(store.last_used) == 3
+    store.touch(())
+    # Way under the limit, but the two that are the same as generated go anyway, and with nothing kept for them.
+    assert list(store.last_used) == [changed]
+    assert store.deltas == {}
+    assert store[changed].visible == 1 and store[untouched].visible == 0
+    # With no limit, everything stays.
+    unlimited = flat_store(11, None)
+    unlimited.add_chunk(untouched, terrain_store.new_cells(np.zeros(unlimited.cells_per_chunk, dtype=np.uint8)))
+    unlimited.touch((untouched,))
+    unlimited.touch(())
+    assert list(unlimited.last_used) == [untouched]
+
+
+@pytest.mark.parametrize("size", [11, 255, 257])
+def test_delta_indices_cover_the_whole_chunk(size):
+    store = flat_store(size, 0)
+    assert np.iinfo(store.delta_dtype).max >= store.cells_per_chunk - 1
+    a = Hexagon(0, 0, 0)
+    store.add_chunk(a, terrain_store.new_cells(np.zeros(store.cells_per_chunk, dtype=np.uint8)))
+    last = store.chunk_hexes(a)[-1]
+    store[last].safe = 3
+    store.touch(())
+    store._shrink()
+    assert store.chunks[a] is None
+    assert store[last].safe == 3
+    assert store.chunk_cells(a)["safe"].sum() == 3
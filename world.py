@@ -0,0 +1,564 @@
+"""
+The game world: terrain, buildings, the network, units and enemies. Nothing in here draws anything, so it works without a window.
+The layers in cocos2d.py draw it, and simulation.Simulation runs it.
+"""
+from opensimplex import OpenSimplex
+
+import hex_math
+import settings
+import terrain_generation
+import terrain_store
+import connectivity
+import spatial
+import coverage
+from hex_math import Hexagon
+
+
+class Terrain:
+    """
+    A class to store the terrain.
+    """
+    def __init__(self, chunk_size=31, random_seed=42):
+        assert chunk_size % 2 == 1, "chunk_size must be odd, even sized chunks overlap each other"
+        # Key is the core's hexagon, value is "friendly" or "enemy". A spatial index, so we can find the nearest cores quickly.
+        self.city_cores = spatial.SpatialIndex()
+        self.random_seed = random_seed
+        self.chunk_size = chunk_size
+        # Dictionary where the key is the hexagon the building pertains to, and the value is a Building instance.
+        # It's a spatial index too, for finding the nearest buildings.
+        self.buildings = spatial.SpatialIndex()
+        self.terrain_noise = OpenSimplex(seed=self.random_seed)
+        self.random_noise = OpenSimplex(seed=self.random_seed ** self.random_seed)
+        # What can be seen, counted per hex from every core, sensor tower and unit. Mirrored into the cells' visible field.
+        self.vision = coverage.Coverage()
+        # Which hexes are safe, counted per hex from every core and powered protection tower. Mirrored into the cells' safe field.
+        self.safety = coverage.Coverage()
+        # The terrain is stored one array per chunk, see terrain_store. hexagon_map works like a dictionary of hexagon to TerrainCell.
+        # Chunk list has a key of the center of a chunk, and the values are the arrays of cells inside that chunk, or None if it's been paged out or thrown away.
+        # Chunks far out of view get thrown away and regenerated from the noise, with just the cells we've changed kept, see settings.terrain_delta_overlay.
+        # The store fills in visible and safe from the coverage when a chunk comes in, so they're never kept for chunks that are out.
+        generator = terrain_generation.CachedChunkGenerator(self.chunk_size, self.terrain_noise) if settings.terrain_delta_overlay else None
+        self.hexagon_map = terrain_store.TerrainStore(self.chunk_size, self.buildings, generator=generator,
+                                                      coverage={"visible": self.vision, "safe": self.safety})
+        self.chunk_list = self.hexagon_map.chunks
+        # Called with the (became visible, became fogged) sets whenever they change, including when a chunk is added. See FogLayer.
+        self.vision_listeners = []
+        # Called with the (became safe, became unsafe) sets whenever they change, including when a chunk is added. See OverlayLayer.
+        self.safety_listeners = []
+        # Called with the hexagon whenever a building goes up or comes down, including the cores that come with new chunks.
+        self.building_listeners = []
+        # Chunks are generated in worker processes and merged in a few at a time, see merge_chunks.
+        self.chunk_pipeline = terrain_generation.ChunkPipeline(self.random_seed, self.chunk_size, settings.chunk_workers)
+
+    def fill_viewport_chunks(self, screen_center, visible_hexes, direction=None, wait=False):
+        """
+        Fills the viewport with hex chunks.
+        Chunks are assumed to be larger than the viewport. Note: This will cause issues with resizing.
+        Missing chunks are queued on the chunk pipeline, and get added to the map by merge_chunks once they're done.
+        Args:
+            screen_center (Hexagon): hex in the middle of the window.
+            visible_hexes (set): hexes in view, see helpers.VisibleHexTracker.
+            direction (str): one of up, down, left or right, the way we're scrolling. The next chunks that way get queued too, so they're ready in time.
+            wait (bool): if True, wait for the chunks and merge them right away.
+        """
+        chunks = self.find_visible_chunks(screen_center, visible_hexes)
+        # The chunks furthest out of view are the ones that get paged out when there are too many.
+        self.hexagon_map.touch(chunks)
+        missing = sorted(c for c in chunks if c not in self.chunk_list)
+        if direction is not None:
+            ahead = {self.chunk_get_next(c, direction) for c in chunks}
+            missing += sorted(c for c in ahead - chunks if c not in self.chunk_list)
+        if missing:
+            self.chunk_pipeline.request(missing)
+        if wait:
+            self.merge_chunks(wait=True)
+
+    def merge_chunks(self, budget=None, wait=False):
+        """
+        Adds chunks that the chunk pipeline has finished to the map. Whatever draws the map should redraw it if anything was added.
+        Args:
+            budget (float): seconds we can spend merging chunks, None for no limit.
+            wait (bool): if True, wait for all the queued chunks.
+        Returns:
+            How many chunks were added.
+        """
+        added = 0
+        for center, terrain_types in self.chunk_pipeline.ready(budget, wait):
+            if center not in self.chunk_list:
+                self.add_chunk(TerrainChunk(center, self.chunk_size, self.terrain_noise, terrain_types))
+                added += 1
+        return added
+
+    def find_visible_chunks(self, screen_center, visible_hexes):
+        """
+        Used to find the visible chunks in a viewport. May return chunks that aren't quite visible to be safe.
+        Args:
+            screen_center (Hexagon): hex in the middle of the window.
+            visible_hexes (set): hexes in view.
+        Returns:
+            A list of TerrainChunk objects that are visible in the current viewport.
+        """
+        center = self.find_chunk_parent(screen_center)
+        return self.find_chunks(center, visible_hexes)
+
+    def chunk_get_next(self, center, direction="up"):
+        """
+        Given a current chunk's anchor hexagon, find the next chunk's anchor hexagon.
+        Currently doesn't support diagonals.
+        Args:
+            center (Hexagon): the anchor hexagon for this chunk.
+            direction (str): One up up, down, left or right for the direction to get the next chunk from.
+        Returns:
+            A hexagon with the desired chunk's anchor.
+        """
+        q_offset = self.chunk_size // 2
+        directions = {
+            "up": (center.q + q_offset + 1,
+                   center.r - self.chunk_size - 1,
+                   -(center.q + q_offset + 1) - (center.r - self.chunk_size - 1)),
+            "down": (center.q - q_offset - 1,
+                     center.r + self.chunk_size + 1,
+                     -(center.q - q_offset - 1) - (center.r + self.chunk_size + 1)),
+            "left": (center.q - self.chunk_size,
+                     center.r,
+                     -(center.q - self.chunk_size) - center.r),
+            "right": (center.q + self.chunk_size,
+                      center.r,
+                      -(center.q + self.chunk_size) - center.r),
+        }
+        return Hexagon(*directions[direction])
+
+    def find_chunks(self, center, visible_hexes):
+        """
+        Finds all of the chunks in the viewport.
+        Args:
+            center (Hexagon): hexagon representing the center of the viewport.
+            visible_hexes (set): hexes in view.
+        Returns:
+            A set of all the chunk anchors visible in the viewport (and then some that aren't to make sure we've filled past the edge of the viewport).
+        """
+        # First generate all of the chunks in a vertical strip centered on the center chunk to the top and bottom of viewport, plus a little extra for safety.
+        all_visible_hexes = visible_hexes
+        ups = [center]
+        while True:
+            ups += [self.chunk_get_next(ups[-1], "up")]
+            if ups[-1] not in all_visible_hexes:
+                break
+        downs = [center]
+        while True:
+            downs += [self.chunk_get_next(downs[-1], "down")]
+            if downs[-1] not in all_visible_hexes:
+                break
+        vertical_strip = ups + downs
+        horizontal_strips = []
+        # With the vertical strip down, generate a horizontal strip for each chunk in it, to cover the viewpor.
+        for c in vertical_strip:
+            lefts = [c]
+            rights = [c]
+            while True:
+                lefts += [self.chunk_get_next(lefts[-1], "left")]
+                if lefts[-1] not in all_visible_hexes:
+                    break
+            while True:
+                rights += [self.chunk_get_next(rights[-1], "right")]
+                if rights[-1] not in all_visible_hexes:
+                    break
+            horizontal_strips += lefts + rights
+        chunks = set()
+        for x in ups + downs:
+            chunks.add(x)
+        for x in horizontal_strips:
+            chunks.add(x)
+        return chunks
+
+    def find_chunk_parent(self, cell):
+        """
+        Given a cell, which chunk does it belong to?
+        Args:
+            cell (Hexagon): cell we're interested in knowing the chunk of.
+        Returns:
+            Hexagon pointing to the center of the chunk. The chunk might not have been generated yet.
+        """
+        return self.hexagon_map.anchor(cell)
+
+    def generate_chunk(self, center):
+        """
+        Generates a chunk. See note in init function about how hacky this is.
+        Args:
+            center (Hexagon): hexagon representing the center of the chunk.
+            chunk_hash (int): hash value used to determine things about this chunk.
+        """
+        if center not in self.chunk_list.keys():
+            self.add_chunk(TerrainChunk(center, self.chunk_size, self.terrain_noise))
+
+    def add_chunk(self, chunk):
+        """
+        Adds a generated chunk to the map, and places any city cores in it.
+        Args:
+            chunk (TerrainChunk): chunk to add.
+        """
+        center = chunk.center
+        if center not in self.chunk_list.keys():
+            new_city_core = False
+            xy = hex_math.cube_to_offset(center)
+            noise_val = self.random_noise.noise2d(xy.x, xy.y) / 2.0 + 0.5  # Rescale to 0.0 to 1.0
+            if noise_val >= 0.85:
+                new_city_core = True
+            self.hexagon_map.add_chunk(center, chunk.cells)
+            # Anything that can already see into, or protect, the new chunk. The rest of it starts out fogged and unsafe.
+            chunk_hexes = self.hexagon_map.chunk_hexes(center)
+            self._notify(self.vision_listeners, self._seed(self.vision, chunk_hexes))
+            self._notify(self.safety_listeners, self._seed(self.safety, chunk_hexes))
+            if center == Hexagon(0, 0, 0):
+                self.hexagon_map[center].terrain_type = 15
+                self.hexagon_map[center].sprite_id = '15'
+                self.add_building(center, Building(0))
+                self.city_cores[center] = "friendly"
+            # Add an enemy city core, not on a water tile.
+            elif new_city_core and int(self.hexagon_map[center].terrain_type) > 2:
+                if self.add_core(center):
+                    print(f"Enemy core added at: {center}.")
+                    self.hexagon_map[center].terrain_type = 16
+                    self.hexagon_map[center].sprite_id = '16'
+                    self.add_building(center, Building(6))
+                    self.city_cores[center] = "enemy"
+            # temporary, for testing
+            # The test core goes on its own hex, which shares the origin's chunk when chunks are big, so it mustn't land on the friendly core.
+            test_core = Hexagon(19, -11, -8)
+            if self.find_chunk_parent(test_core) == center and test_core != Hexagon(0, 0, 0) and test_core not in self.buildings:
+                self.hexagon_map[test_core].terrain_type = 16
+                self.hexagon_map[test_core].sprite_id = '16'
+                self.add_building(test_core, Building(6))
+                self.city_cores[test_core] = "enemy"
+
+    def add_safe_area(self, source, center, radius):
+        """
+        Adds something that makes the hexes around it safe, like a core or a protection tower.
+        A hex stays safe as long as anything covers it, so overlapping areas can come and go in any order.
+        Args:
+            source: anything hashable that identifies what's protecting, e.g. ("protection tower", cell).
+            center (Hexagon): center of the area to be made safe.
+            radius (int): radius of the safe area.
+        Returns:
+            Tuple of sets of hexagons, (became safe, became unsafe).
+        """
+        return self._notify(self.safety_listeners, self._mirror("safe", self.safety.add(source, center, radius)))
+
+    def remove_safe_area(self, source):
+        """
+        Removes something that makes hexes safe.
+        Returns:
+            Tuple of sets of hexagons, (became safe, became unsafe).
+        """
+        return self._notify(self.safety_listeners, self._mirror("safe", self.safety.remove(source)))
+
+    def _mirror(self, field, flips):
+        """
+        Copies coverage changes into the terrain cells, for the chunks in memory.
+        Chunks that haven't been generated yet, or are paged out, get the field set from the coverage when they come in, see TerrainStore.
+        Args:
+            field (str): which field of the cells to set, e.g. "visible".
+            flips (tuple): sets of hexagons, (became covered, became uncovered).
+        Returns:
+            flips, unchanged.
+        """
+        hexagon_map = self.hexagon_map
+        chunks = hexagon_map.chunks
+        for value, hexes in zip((1, 0), flips):
+            for h in hexes:
+                # Looking the cell up would page its chunk back in, just to change something that gets worked out again anyway.
+                if chunks.get(hexagon_map.anchor(h)) is not None:
+                    setattr(hexagon_map[h], field, value)
+        return flips
+
+    @staticmethod
+    def _seed(covers, hexes):
+        """
+        Splits a newly generated chunk's hexes by coverage that was added before they existed. The store has already set the cells from it.
+        Args:
+            covers (Coverage): coverage to read from.
+            hexes (iterable): the new cells.
+        Returns:
+            Tuple of sets of hexagons, (covered, not covered).
+        """
+        on = set()
+        off = set()
+        for h in hexes:
+            if covers.covered(h):
+                on.add(h)
+            else:
+                off.add(h)
+        return on, off
+
+    @staticmethod
+    def _notify(listeners, flips):
+        for listener in listeners:
+            listener(*flips)
+        return flips
+
+    def add_vision(self, source, center, radius):
+        """
+        Adds something that can see, like a core, a sensor tower or a unit.
+        Args:
+            source: anything hashable that identifies what's seeing, e.g. the unit.
+            center (Hexagon): where it is.
+            radius (int): how far it can see.
+        Returns:
+            Tuple of sets of hexagons, (became visible, became fogged).
+        """
+        return self._notify(self.vision_listeners, self._mirror("visible", self.vision.add(source, center, radius)))
+
+    def move_vision(self, source, center):
+        """
+        Moves something that can see. Only the hexes that come into or go out of its view change.
+        Returns:
+            Tuple of sets of hexagons, (became visible, became fogged).
+        """
+        return self._notify(self.vision_listeners, self._mirror("visible", self.vision.move(source, center)))
+
+    def remove_vision(self, source):
+        """
+        Removes something that can see.
+        Returns:
+            Tuple of sets of hexagons, (became visible, became fogged).
+        """
+        return self._notify(self.vision_listeners, self._mirror("visible", self.vision.remove(source)))
+
+    def add_building(self, hex_coords, building):
+        """
+        Adds a building to the terrain.
+        Args:
+            building (Building): building object to add to the terrain map.
+            hex_coords (Hexagon): coordinates for the building.
+        Returns:
+            The building that was added.
+        """
+        self.buildings[hex_coords] = building
+        self.hexagon_map[hex_coords].building = building
+        for listener in self.building_listeners:
+            listener(hex_coords)
+
+    def remove_building(self, hex_coords):
+        """
+        Removes the building from a cell.
+        Args:
+            hex_coords (Hexagon): coordinates of cell to modify.
+        """
+        del self.buildings[hex_coords]
+        self.hexagon_map[hex_coords].building = None
+        for listener in self.building_listeners:
+            listener(hex_coords)
+
+    def add_core(self, center):
+        """
+        Attempts to add a core to this chunk. Minimum distance from another core determined in settings file.
+        Args:
+            center (Hexagon): hexagon to attempt to add the new city core at.
+        Returns:
+            True if this is a good chunk to add a core in, False if it isn't.
+        """
+        minimum = settings.minimum_core_distance
+        # If we're less than the minimum to any core, we're done.
+        return not self.city_cores.within(center, minimum - 1)
+
+    def __len__(self):
+        return len(self.chunk_list) * self.chunk_size * self.chunk_size
+
+
+class TerrainChunk:
+    """
+    Stores metadata and data related to a terrain chunk.
+    """
+    def __init__(self, center, chunk_size, noise, terrain_types=None):
+        self.center = center
+        self.chunk_size = chunk_size
+        self.cells = self.generate(self.center, noise, terrain_types)
+
+    def generate(self, center, noise, terrain_types=None):
+        """
+        Generates a chunk, sized as given. Current algorithm is to generate a "rectangle". Why a rectangle? Because that's the shape of a window, and it allows chunks to be accessed as x/y coordinates of their centers.
+        Args:
+            center (Hexagon): the q, r, and s coordinates for the center of the chunk.
+            terrain_types (numpy.ndarray): terrain that's already been generated, e.g. by the chunk pipeline. Generated from the noise if None.
+        Returns:
+            A structured array of the terrain cells, see terrain_store.cell_dtype. They're in the order of terrain_generation.chunk_coordinates.
+        """
+        # Why all this futzing around with dimensions // 2? Because I wanted the start of the chunk to be centered in the middle of the chunk.
+        # The whole chunk is generated in one go, see terrain_generation.chunk_terrain.
+        if terrain_types is None:
+            _, _, terrain_types = terrain_generation.chunk_terrain(center, self.chunk_size, noise)
+        return terrain_store.new_cells(terrain_types)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __str__(self):
+        return f"Chunk at {self.center} contains {len(self)} hexes"
+
+
+class Building:
+    """
+    A class to store the different buildings in.
+    """
+    _sprite_to_building = {0: "core claimed", 1: "RB", 2: "HR", 3: "protection tower", 4: "sensor tower", 5: "energy tower", 6: "core enemy"}
+
+    def __init__(self, building_id):
+        self.building_id = building_id
+        self.sprite_id = self._sprite_to_building[building_id]
+
+    def __str__(self):
+        return f"Building with id: {self.building_id} and sprite: {self.sprite_id }"
+
+
+class Network:
+    """
+    Class to store the data structures related to the networks.
+    I've split these from the terrain because I think there's going to be some significant complexity here.
+    """
+    def __init__(self, terrain):
+        """
+        Dictionary will be of the form {Hexagon(q, r, s): {"type": "network type", "powered": True/False}, ...}
+        Possible values for network type are "energy", "control" and "sink". Energy means this network transports energy, control means it transports control signals and sink means it needs energy and control signals.
+        Powered indicated that this network node is recieving energy.
+        Args:
+            terrain (Terrain): terrain the network is built on. Towers on it change its safe and visible areas when they're powered on or off.
+        """
+        self.terrain = terrain
+        self.network = spatial.SpatialIndex()
+        self.network[Hexagon(0, 0, 0)] = {"type": "start", "powered": True}
+        # Which nodes are connected to the core. Kept up to date as nodes come and go, so nothing has to flood the whole network.
+        self.connectivity = connectivity.Connectivity(hex_math.hex_key(Hexagon(0, 0, 0)))
+
+    def add_node(self, cell, network_type, powered):
+        """
+        Adds a node to the network, and powers up anything it connects to the core.
+        Args:
+            cell (Hexagon): where the node goes.
+            network_type (str): type of the node, see __init__.
+            powered (bool): whether the node is powered.
+        Returns:
+            Set of the other nodes that were powered on or off.
+        """
+        self.network[cell] = {"type": network_type, "powered": powered}
+        return self.update_powered(self.connectivity.add(hex_math.hex_key(cell)))
+
+    def remove_node(self, cell):
+        """
+        Removes a node from the network, and powers down anything that was only connected to the core through it.
+        Args:
+            cell (Hexagon): node to remove.
+        Returns:
+            Set of the other nodes that were powered on or off.
+        """
+        del self.network[cell]
+        return self.update_powered(self.connectivity.remove(hex_math.hex_key(cell)))
+
+    def update_powered(self, changed):
+        """
+        Updates the nodes whose powered state changed, and the safe and visible areas of towers on them.
+        Args:
+            changed (dict): key is the hex key of a node, value is whether it's powered now. See Connectivity.add and Connectivity.remove.
+        Returns:
+            Set of the nodes that were actually powered on or off.
+        """
+        terrain = self.terrain
+        flipped = set()
+        for key, powered in changed.items():
+            n = hex_math.key_to_hex(key)
+            previous_powered = self.network[n]["powered"]
+            self.network[n]["powered"] = powered
+            if powered == previous_powered:
+                continue
+            # Transitioning from unpowered to powered, or the other way around.
+            flipped.add(n)
+            try:
+                building_id = terrain.buildings[n].building_id
+            except KeyError:
+                continue
+            if building_id == 3:
+                if powered:
+                    terrain.add_safe_area(("protection tower", n), n, 3)
+                else:
+                    terrain.remove_safe_area(("protection tower", n))
+            elif building_id == 4:
+                if powered:
+                    terrain.add_vision(("sensor tower", n), n, 5)
+                else:
+                    terrain.remove_vision(("sensor tower", n))
+        return flipped
+
+    def is_powered_next_to(self, cell):
+        """
+        Checks whether a node at the given cell would be powered, by looking for a neighbour that's connected to the core.
+        Args:
+            cell (Hexagon): cell to check.
+        Returns:
+            True if any of the cell's neighbours is connected to the core.
+        """
+        key = hex_math.hex_key(cell)
+        return self.connectivity.touches_root(key + d for d in hex_math.key_directions)
+
+    def __len__(self):
+        return len(self.network)
+
+
+class Unit:
+    """
+    Store information about a specific unit.
+    """
+    # Probably move this into a data file at some point.
+    _unit_stats = {1: {"name": "hover tank", "speed": .25, "sprite_id": "tank", "vision": 3}}
+
+    def __init__(self, position, unit_id, number=0):
+        """
+        Args:
+            position (Hexagon): where the unit is.
+            unit_id (int): what kind of unit it is, a key of _unit_stats.
+            number (int): tells this unit apart from all the others, e.g. for naming its sprite.
+        """
+        self.position = position
+        self.unit_id = unit_id
+        self.number = number
+        self.unit_stats = self._unit_stats[unit_id]
+        self.sprite_id = self.unit_stats["sprite_id"]
+        self.speed = self.unit_stats["speed"]
+        self.name = self.unit_stats["name"]
+        self.vision_range = self.unit_stats["vision"]
+        # Hexes still to walk through, not including where the unit is.
+        self.move_path = []
+        # Seconds since the last step, see simulation.Simulation.tick.
+        self.time = 0.0
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+
+class Enemy:
+    """
+    Class to store information related to enemy creeps.
+    """
+    _enemy_stats = settings.enemy_stats
+
+    def __init__(self, position, enemy_id, number=0):
+        """
+        Args:
+            position (Hexagon): where the enemy is.
+            enemy_id (int): what kind of enemy it is, a key of settings.enemy_stats.
+            number (int): tells this enemy apart from all the others.
+        """
+        self.position = position
+        self.enemy_id = enemy_id
+        self.number = number
+        self.name = self._enemy_stats[enemy_id]["name"]
+        self.speed = self._enemy_stats[enemy_id]["speed"]
+        self.sprite_id = self._enemy_stats[enemy_id]["sprite_id"]
+        self.health = self._enemy_stats[enemy_id]["health"]
+        self.level = self._enemy_stats[enemy_id]["level"]
+        # Hexes still to walk through, not including where the enemy is.
+        self.move_path = []
+        # Seconds since the last step, see simulation.Simulation.tick.
+        self.time = 0.0
+        self.target = None
+
+    def __str__(self):
+        return f"{self.name} at {self.position} has health {self.health} and is attacking {self.target}"